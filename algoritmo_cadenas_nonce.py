@@ -0,0 +1,101 @@
+import time
+import numpy as np
+from tx_batch import TxBatch
+from cadenas_nonce import CadenasNonce
+from registro_builders import registrar_builder
+from perfilado import fase
+
+@registrar_builder("cadenas_nonce")
+def construir_bloque(df, T_simulado, gas_limit=30_000_000):
+    """
+    Construye un bloque empaquetando prefijos de cadenas de nonce por remitente.
+
+    Cada prefijo de una cadena (ver CadenasNonce) es un ítem con gas y fee acumulados.
+    Un único barrido en orden de densidad de prefijos decide cuánto de cada cadena
+    entra: tomar un prefijo más largo de una cadena ya elegida solo agrega las
+    transacciones que faltan. Así las dependencias del mismo remitente salen en orden
+    sin enumerar pares ni tríos. Entre remitentes distintos se aplica la regla de
+    conflicto por 'to' de greedy_clasico; dentro de una cadena no, porque sus
+    transacciones se ejecutan en secuencia.
+
+    Parámetros:
+        df (pd.DataFrame | TxBatch): Transacciones con 'from', 'to', 'gas', 'gas_fee_cap' y 'nonce'.
+        T_simulado (int): Timestamp simulado de inclusión del bloque.
+        gas_limit (int): Límite de gas del bloque (default: 30_000_000).
+    Retorna:
+        tuple: Resumen de la construcción del bloque y DataFrame con las transacciones incluidas.
+    """
+    inicio = time.perf_counter()
+    with fase("cargar_batch"):
+        batch = df if isinstance(df, TxBatch) else TxBatch.desde_df(df)
+    with fase("cadenas"):
+        cadenas = CadenasNonce(batch)
+        prefijos = cadenas.prefijos_por_densidad().tolist()
+
+    with fase("seleccion"):
+        orden = cadenas.orden.tolist()
+        cadena = cadenas.cadena.tolist()
+        inicio_cadena = cadenas.inicio.tolist()
+        gas_acum = cadenas.gas_acum.tolist()
+        to_id = batch.to_id.tolist()
+
+        tomado = [0] * len(cadenas)   # largo del prefijo elegido por cadena
+        duenio_to = {}                # to_id -> cadena que lo usa
+        elegidas = []                 # cadenas en orden de aceptación
+        gas_usado = 0
+
+        for e in prefijos:
+            c = cadena[e]
+            k = e - inicio_cadena[c] + 1
+            if k <= tomado[c]:
+                continue
+            previo = gas_acum[inicio_cadena[c] + tomado[c] - 1] if tomado[c] else 0
+            extra_gas = gas_acum[e] - previo
+            if gas_usado + extra_gas > gas_limit:
+                continue
+            nuevas = orden[inicio_cadena[c] + tomado[c]:e + 1]
+            if any(to_id[p] >= 0 and duenio_to.get(to_id[p], c) != c for p in nuevas):
+                continue
+
+            for p in nuevas:
+                if to_id[p] >= 0:
+                    duenio_to[to_id[p]] = c
+            if not tomado[c]:
+                elegidas.append(c)
+            tomado[c] = k
+            gas_usado += extra_gas
+
+        seleccion = [p for c in elegidas for p in orden[inicio_cadena[c]:inicio_cadena[c] + tomado[c]]]
+
+    with fase("armar_bloque"):
+        bloque_df = batch.a_dataframe(seleccion)
+
+        if not bloque_df.empty:
+            timestamps = batch.timestamp_ms[seleccion]
+            if timestamps.dtype.kind == "f":
+                timestamps = np.where(np.isnan(timestamps), T_simulado, timestamps)
+            bloque_df["lead_time_ms"] = T_simulado - timestamps
+            utilidad_total = batch.suma("fee", seleccion)
+            lead_time_prom = round(float(bloque_df["lead_time_ms"].mean()) / 1000, 3)
+            gas_usado_total = batch.suma("gas", seleccion)
+        else:
+            utilidad_total = 0
+            lead_time_prom = 0.0
+            gas_usado_total = 0
+
+    fin = time.perf_counter()
+
+    resumen = {
+        "algoritmo": "cadenas_nonce",
+        "timestamp_simulado": T_simulado,
+        "total_transacciones": len(batch),
+        "tx_incluidas": len(bloque_df),
+        "gas_usado": gas_usado_total,
+        "utilidad_total": utilidad_total,
+        "fragmentacion": gas_limit - gas_usado_total,
+        "lead_time_promedio_s": lead_time_prom,
+        "tiempo_ejecucion_s": round(fin - inicio, 4),
+        "cadenas_incluidas": len(elegidas),
+    }
+
+    return resumen, bloque_df
@@ -0,0 +1,366 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from tx_batch import TxBatch
+from registro_builders import registrar_builder
+from algoritmo_knapsack import dp_escalado, resolver_knapsack, _greedy
+from runner_paralelo import ejecutar_en_paralelo
+from perfilado import fase
+
+# Opciones (las de mayor densidad) que entran en la mochila final de gas escalado
+_MAX_DP = 2000
+# Transacciones por componente que entran en el branch-and-bound (las de mayor densidad)
+_MAX_BB = 2000
+# Capacidades (gas_limit / divisor) a las que se resuelve cada componente compuesta
+_DIVISORES_DP = (1, 2, 4, 8, 16)
+# Por debajo de esta cantidad de transacciones en componentes compuestas no se abre el pool
+_MIN_PARALELO = 20_000
+
+
+class _UnionFind:
+    """Union-find con compresión de caminos y unión por tamaño."""
+
+    def __init__(self, n):
+        self.padre = list(range(n))
+        self.tamano = [1] * n
+
+    def raiz(self, x):
+        padre = self.padre
+        while padre[x] != x:
+            padre[x] = padre[padre[x]]
+            x = padre[x]
+        return x
+
+    def unir(self, a, b):
+        a, b = self.raiz(a), self.raiz(b)
+        if a == b:
+            return
+        if self.tamano[a] < self.tamano[b]:
+            a, b = b, a
+        self.padre[b] = a
+        self.tamano[a] += self.tamano[b]
+
+
+def grupos_conflicto(to_id, from_id, nonce):
+    """
+    Índices invertidos de la regla de conflicto de greedy_clasico: id de grupo por
+    destino y por par (from, nonce). Las tx sin 'to' forman un grupo de destino propio
+    cada una; sin 'from' o con nonce -1 no tienen grupo (from, nonce) (-1).
+
+    Retorna:
+        tuple: (grupo de destino, grupo (from, nonce)) por transacción.
+    """
+    n = len(to_id)
+    clave_to = np.where(to_id >= 0, to_id.astype(np.int64), -1 - np.arange(n, dtype=np.int64))
+    _, grupo_to = np.unique(clave_to, return_inverse=True)
+
+    grupo_fn = np.full(n, -1, dtype=np.int64)
+    con_nonce = np.flatnonzero((from_id >= 0) & (nonce >= 0))
+    if con_nonce.size:
+        # Clave entera del par: id de 'from' por cantidad de nonces distintos más el código del nonce
+        codigo_nonce, nonces = pd.factorize(nonce[con_nonce])
+        clave = from_id[con_nonce].astype(np.int64) * len(nonces) + codigo_nonce
+        grupo_fn[con_nonce] = pd.factorize(clave)[0]
+    return grupo_to.astype(np.int64), grupo_fn
+
+
+def dominadas(gas, valor, grupo_to, grupo_fn):
+    """
+    Máscara de las transacciones que nunca hacen falta: las que tienen, en su mismo
+    destino, otra con menos o igual gas, más o igual valor y sin pares (from, nonce)
+    repetidos. Cualquier bloque que use la dominada puede cambiarla por esa sin
+    perder valor ni generar conflictos, y al sacarlas se cortan muchos de los pares
+    repetidos que unen destinos en una misma componente.
+    """
+    n = len(gas)
+    libre = np.ones(n, dtype=bool)
+    con_nonce = grupo_fn >= 0
+    libre[con_nonce] = np.bincount(grupo_fn[con_nonce])[grupo_fn[con_nonce]] == 1
+
+    if valor.dtype.kind in "iu":
+        valor, vacio = valor.astype(np.int64), np.iinfo(np.int64).min
+    else:
+        valor, vacio = valor.astype(np.float64), -np.inf
+    orden = np.lexsort((-valor, gas, grupo_to))
+    grupo = grupo_to[orden]
+    # Mejor valor de una tx libre anterior (menos gas, o igual gas y más valor) del mismo destino
+    previo = (
+        pd.Series(np.where(libre[orden], valor[orden], vacio)).groupby(grupo).cummax()
+        .groupby(grupo).shift(fill_value=vacio).to_numpy()
+    )
+    mascara = np.zeros(n, dtype=bool)
+    mascara[orden] = valor[orden] <= previo
+    return mascara
+
+
+def componentes_conflicto(grupo_to, grupo_fn):
+    """
+    Componentes conexas del grafo de conflictos sin enumerar pares.
+
+    Cada destino es un índice invertido de sus transacciones, así que todas quedan en
+    la misma componente de entrada; el union-find solo une grupos de destino a través
+    de los pares (from, nonce) repetidos, que son pocos.
+
+    Retorna:
+        tuple: (componente por transacción, cantidad de componentes)
+    """
+    n_grupos_to = int(grupo_to.max(initial=-1)) + 1
+    uf = _UnionFind(n_grupos_to)
+    con_nonce = np.flatnonzero(grupo_fn >= 0)
+    repetidos = con_nonce[pd.Series(grupo_fn[con_nonce]).duplicated(keep=False).to_numpy()]
+    primero = {}
+    for fn, gt in zip(grupo_fn[repetidos].tolist(), grupo_to[repetidos].tolist()):
+        uf.unir(primero.setdefault(fn, gt), gt)
+
+    raices = np.array([uf.raiz(g) for g in range(n_grupos_to)], dtype=np.int64)
+    _, componente = np.unique(raices[grupo_to], return_inverse=True)
+    return componente, int(componente.max(initial=-1)) + 1
+
+
+def _pareto(gas, valor):
+    """Posiciones del frente de Pareto (más valor con menos gas), ordenadas por gas."""
+    frente, mejor = [], None
+    for t in sorted(range(len(gas)), key=lambda t: (gas[t], -valor[t])):
+        if mejor is None or valor[t] > mejor:
+            frente.append(t)
+            mejor = valor[t]
+    return frente
+
+
+def _compactar(grupos):
+    ids = {}
+    return [ids.setdefault(g, len(ids)) if g >= 0 else -1 for g in grupos]
+
+
+def _opciones_componente(gas, valor, grupo_to, grupo_fn, capacidad, tiempo_limite_s):
+    """
+    Opciones (gas, valor, posiciones) de una componente con más de un destino: cada
+    transacción sola, los prefijos de la selección greedy por densidad, la DP de gas
+    escalado por destino a varias capacidades (completada en forma greedy, que además
+    repara los conflictos (from, nonce)) y el branch-and-bound a capacidad completa.
+    Se devuelve solo el frente de Pareto, así la mochila final elige a lo sumo una
+    opción por componente y puede cambiar gas entre componentes.
+    """
+    n = len(gas)
+    grupo_to, grupo_fn = _compactar(grupo_to), _compactar(grupo_fn)
+    # Mismo criterio que knapsack: en orden de densidad, las primeras son las que más aportan
+    orden = sorted(range(n), key=lambda t: valor[t] / gas[t] if gas[t] else float("inf"), reverse=True)
+    gas = [gas[t] for t in orden]
+    valor = [valor[t] for t in orden]
+    grupo_to = [grupo_to[t] for t in orden]
+    grupo_fn = [grupo_fn[t] for t in orden]
+    densidad = list(range(n))
+
+    opciones = [(gas[t], valor[t], [t]) for t in densidad]
+
+    usados_to, usados_fn = set(), set()
+    seleccion, g_total, v_total = [], 0, 0
+    for t in densidad:
+        to, fn = grupo_to[t], grupo_fn[t]
+        if g_total + gas[t] > capacidad or (to >= 0 and to in usados_to) or (fn >= 0 and fn in usados_fn):
+            continue
+        seleccion.append(t)
+        g_total += gas[t]
+        v_total += valor[t]
+        usados_to.add(to)
+        usados_fn.add(fn)
+        if len(seleccion) > 1:
+            opciones.append((g_total, v_total, list(seleccion)))
+
+    incumbente = (sorted(seleccion), v_total)
+    for divisor in _DIVISORES_DP:
+        cap = capacidad // divisor
+        if cap < min(gas):
+            break
+        prioridad = dp_escalado(gas[:_MAX_DP], valor[:_MAX_DP], grupo_to[:_MAX_DP], cap)
+        elegidas, total = _greedy(prioridad + densidad, gas, valor, grupo_to, grupo_fn, cap)
+        opciones.append((sum(gas[t] for t in elegidas), total, elegidas))
+        if divisor == 1 and total > incumbente[1]:
+            incumbente = (elegidas, total)
+
+    # Branch-and-bound sobre las de mayor densidad, partiendo de la mejor solución entre ellas
+    incumbente = [t for t in incumbente[0] if t < _MAX_BB]
+    elegidas, v_bb, _, _, _ = resolver_knapsack(
+        gas[:_MAX_BB], valor[:_MAX_BB], grupo_to[:_MAX_BB], grupo_fn[:_MAX_BB],
+        capacidad, tiempo_limite_s, (incumbente, sum(valor[t] for t in incumbente)),
+    )
+    opciones.append((sum(gas[t] for t in elegidas), v_bb, elegidas))
+
+    frente = _pareto([o[0] for o in opciones], [o[1] for o in opciones])
+    return [(opciones[k][0], opciones[k][1], [orden[t] for t in opciones[k][2]]) for k in frente]
+
+
+def _resolver_lote(tarea):
+    """Resuelve un lote de componentes (se ejecuta en un proceso del pool)."""
+    _, componentes, capacidad, tiempo_limite_s = tarea
+    return [_opciones_componente(*c, capacidad, tiempo_limite_s) for c in componentes]
+
+
+def _lotes(componentes, cantidad):
+    """Reparte las componentes (de mayor a menor) en 'cantidad' lotes de tamaño parejo."""
+    lotes = [[] for _ in range(cantidad)]
+    carga = [0] * cantidad
+    for c in sorted(componentes, key=lambda c: len(c[0]), reverse=True):
+        k = carga.index(min(carga))
+        lotes[k].append(c)
+        carga[k] += len(c[0])
+    return [lote for lote in lotes if lote]
+
+
+@registrar_builder("componentes_conflicto", determinista=False)
+def construir_bloque(df, T_simulado, gas_limit=30_000_000, workers=None, tiempo_componente_s=0.05):
+    """
+    Construye un bloque descomponiendo el mempool en componentes del grafo de
+    conflictos (mismo 'to', o mismo 'from' y nonce, igual que greedy_clasico).
+
+    Transacciones de componentes distintas nunca conflictúan, así que cada componente
+    se resuelve por separado y solo compiten por el gas. Una componente de un solo
+    destino admite una transacción; su frente de Pareto de (gas, valor) sale
+    vectorizado. Las compuestas (destinos unidos por pares (from, nonce) repetidos)
+    se resuelven en paralelo en un pool de procesos y devuelven su frente de
+    opciones. Una mochila final de gas escalado (dp_escalado, a lo sumo una opción
+    por componente) sobre las opciones de mayor densidad, completada en forma greedy,
+    arma el bloque; si el greedy por densidad de greedy_clasico da más utilidad, se
+    queda con ese.
+
+    Parámetros:
+        df (pd.DataFrame | TxBatch): Transacciones, como en greedy_clasico.
+        T_simulado (int): Timestamp simulado de inclusión del bloque.
+        gas_limit (int): Límite de gas del bloque (default: 30_000_000).
+        workers (int): Procesos para las componentes compuestas (default: os.cpu_count()).
+        tiempo_componente_s (float): Presupuesto del branch-and-bound por componente (default: 0.05).
+    Retorna:
+        tuple: Resumen de la construcción del bloque y DataFrame con las transacciones incluidas.
+    """
+    inicio = time.perf_counter()
+    with fase("cargar_batch"):
+        batch = df if isinstance(df, TxBatch) else TxBatch.desde_df(df)
+
+    with fase("componentes"):
+        # Solo candidatas que entran solas y aportan valor
+        fee = batch.fee
+        if fee.dtype.kind == "f":
+            fee = np.nan_to_num(fee, nan=0.0)
+        utiles = np.flatnonzero((batch.gas <= gas_limit) & (fee > 0))
+        grupo_to, grupo_fn = grupos_conflicto(batch.to_id[utiles], batch.from_id[utiles], batch.nonce[utiles])
+        gas_utiles = batch.gas[utiles].tolist()
+
+        vivas = ~dominadas(batch.gas[utiles], fee[utiles], grupo_to, grupo_fn)
+        candidatas = utiles[vivas]
+        to_vivas, fn_vivas = grupo_to[vivas], grupo_fn[vivas]
+        componente, n_componentes = componentes_conflicto(to_vivas, fn_vivas)
+        # Cada grupo de destino está entero en una componente: se cuenta por su primera tx
+        _, primeras = np.unique(to_vivas, return_index=True)
+        destinos_por_componente = np.bincount(componente[primeras], minlength=n_componentes)
+        compuesta = destinos_por_componente[componente] > 1
+
+    with fase("opciones"):
+        gas = batch.gas[candidatas]
+        valor = fee[candidatas]
+        # Listas de Python: las sumas de valores no desbordan int64
+        gas_l, valor_l = gas.tolist(), valor.tolist()
+
+        # Componentes de un destino: frente de Pareto de las transacciones sueltas
+        simples = np.flatnonzero(~compuesta)
+        orden = simples[np.lexsort((-valor[simples].astype(np.float64), gas[simples], componente[simples]))]
+        maximo_previo = (
+            pd.Series(valor[orden].astype(np.float64)).groupby(componente[orden]).cummax()
+            .groupby(componente[orden]).shift(fill_value=-np.inf).to_numpy()
+        )
+        frente = orden[valor[orden].astype(np.float64) > maximo_previo]
+        opciones = [(gas_l[t], valor_l[t], [t]) for t in frente.tolist()]
+        opcion_componente = componente[frente].tolist()
+
+        # Componentes compuestas: una tarea por lote, en paralelo si el volumen lo justifica
+        miembros = {}
+        for t in np.flatnonzero(compuesta).tolist():
+            miembros.setdefault(int(componente[t]), []).append(t)
+        datos = [
+            ([gas_l[t] for t in ts], [valor_l[t] for t in ts],
+             to_vivas[ts].tolist(), fn_vivas[ts].tolist())
+            for ts in miembros.values()
+        ]
+        workers = workers or os.cpu_count() or 1
+        if int(compuesta.sum()) < _MIN_PARALELO:
+            workers = 1
+        lotes = _lotes(list(zip(datos, miembros.items())), workers)
+        tareas = [(k, [d for d, _ in lote], gas_limit, tiempo_componente_s) for k, lote in enumerate(lotes)]
+        for tarea, resultado, error in ejecutar_en_paralelo(_resolver_lote, tareas, workers=workers):
+            if error is not None:
+                raise error
+            for (_, (c, ts)), opciones_c in zip(lotes[tarea[0]], resultado):
+                for g, v, locales in opciones_c:
+                    opciones.append((g, v, [ts[k] for k in locales]))
+                    opcion_componente.append(c)
+
+    with fase("knapsack_final"):
+        # Opciones en orden de densidad; la DP toma las primeras y el greedy completa
+        densidad = sorted(range(len(opciones)), key=lambda k: float(opciones[k][1]) / opciones[k][0]
+                          if opciones[k][0] else float("inf"), reverse=True)
+        top = densidad[:_MAX_DP]
+        elegidas_dp = [top[k] for k in dp_escalado(
+            [opciones[k][0] for k in top], [opciones[k][1] for k in top],
+            [opcion_componente[k] for k in top], gas_limit,
+        )]
+
+        def completar(prioridad):
+            usadas, elegidas, cap, total = set(), [], gas_limit, 0
+            for k in prioridad:
+                c = opcion_componente[k]
+                if c in usadas or opciones[k][0] > cap:
+                    continue
+                usadas.add(c)
+                elegidas.append(k)
+                cap -= opciones[k][0]
+                total += opciones[k][1]
+            return total, elegidas
+
+        _, elegidas = max(completar(elegidas_dp + densidad), completar(densidad), key=lambda sol: sol[0])
+        seleccion = sorted(int(candidatas[t]) for k in elegidas for t in opciones[k][2])
+
+        # El greedy por densidad de greedy_clasico (misma regla de conflicto) como piso
+        usados_to, usados_fn, greedy, cap = set(), set(), [], gas_limit
+        grupo_to_l, grupo_fn_l = grupo_to.tolist(), grupo_fn.tolist()
+        for t in np.argsort(-batch.gas_fee_cap[utiles], kind="stable").tolist():
+            to, fn = grupo_to_l[t], grupo_fn_l[t]
+            if gas_utiles[t] > cap or to in usados_to or (fn >= 0 and fn in usados_fn):
+                continue
+            greedy.append(int(utiles[t]))
+            cap -= gas_utiles[t]
+            usados_to.add(to)
+            usados_fn.add(fn)
+        if batch.suma("fee", greedy) > batch.suma("fee", seleccion):
+            seleccion = sorted(greedy)
+
+    with fase("armar_bloque"):
+        bloque_df = batch.a_dataframe(seleccion)
+
+        if not bloque_df.empty:
+            bloque_df["lead_time_ms"] = T_simulado - batch.timestamp_ms[seleccion]
+            lead_time_prom = round(bloque_df["lead_time_ms"].mean() / 1000, 3)
+            utilidad_total = batch.suma("fee", seleccion)
+            gas_usado_total = batch.suma("gas", seleccion)
+        else:
+            lead_time_prom = 0.0
+            utilidad_total = 0
+            gas_usado_total = 0
+
+    fin = time.perf_counter()
+
+    resumen = {
+        "algoritmo": "componentes_conflicto",
+        "timestamp_simulado": T_simulado,
+        "total_transacciones": len(batch),
+        "tx_incluidas": len(bloque_df),
+        "gas_usado": gas_usado_total,
+        "utilidad_total": utilidad_total,
+        "fragmentacion": gas_limit - gas_usado_total,
+        "lead_time_promedio_s": lead_time_prom,
+        "tiempo_ejecucion_s": round(fin - inicio, 4),
+        "componentes": n_componentes,
+        "componentes_compuestas": len(datos),
+    }
+
+    return resumen, bloque_df
@@ -1,8 +1,12 @@
-import pandas as pd
+import numpy as np
 import time
-from itertools import combinations
-from utils import guardar_log_csv, calcular_utilidad
+from motor_utilidad import MotorUtilidad
+from tx_batch import TxBatch
+from registro_builders import registrar_builder
+from empaquetado import Empaquetador
+from perfilado import fase
 
+@registrar_builder("algoritmo_extendido", regla_conflicto="direcciones")
 def construir_bloque(df, T_simulado, gas_limit=30_000_000, top_n=300, max_trios=10000, max_pares=20000):
     """
     Construye un bloque heurístico combinando tríos, pares y relleno greedy,
@@ -10,118 +14,52 @@ def construir_bloque(df, T_simulado, gas_limit=30_000_000, top_n=300, max_trios=
     Calcula tanto la utilidad heurística como la utilidad real basada en gas * gas_fee_cap.
     """
     inicio = time.perf_counter()
-    df["fee"] = df["gas"] * df["gas_fee_cap"]
+    with fase("cargar_batch"):
+        batch = df if isinstance(df, TxBatch) else TxBatch.desde_df(df)
 
-    # 1. Top-N por tarifa
-    top_df = df.sort_values("fee", ascending=False).head(top_n)
-    top_hashes = set(top_df["hash"])
-    top_from = set(top_df["from"])
-    top_to = set(top_df["to"])
-
-    # 2. Ampliar conjunto con transacciones relacionadas
-    relacionadas = df[
-        (~df["hash"].isin(top_hashes)) & (
-            df["from"].isin(top_from) |
-            df["to"].isin(top_to)
-        )
-    ]
-
-    # 3. Unir top + relacionadas, limitar tamaño final para evitar explosión combinatoria
-    ampliado_df = pd.concat([top_df, relacionadas]).drop_duplicates("hash").head(1000).reset_index(drop=True)
-    txs = ampliado_df.to_dict("records")
-    n = len(txs)
-
-    bloque_idx = set()
-    direcciones_ocupadas = set()
-    gas_usado = 0
+    # 1-3. Top-N por tarifa + transacciones relacionadas, limitado para evitar explosión combinatoria
+    ampliado = batch.ampliado(top_n, limite=1000)
+    motor = MotorUtilidad(ampliado, gas_limit=gas_limit)
+    # Direcciones ocupadas y transacciones incluidas como bitsets
+    empaquetador = Empaquetador(ampliado, gas_limit)
 
     # --- TRIOS ---
-    trios = []
-    for i, j, k in combinations(range(n), 3):
-        ti, tj, tk = txs[i], txs[j], txs[k]
-        gas_total = ti["gas"] + tj["gas"] + tk["gas"]
-        if gas_total > gas_limit:
-            continue
-
-        utilidad = (
-            calcular_utilidad(ti, tj, gas_limit=gas_limit) +
-            calcular_utilidad(ti, tk, gas_limit=gas_limit) +
-            calcular_utilidad(tj, tk, gas_limit=gas_limit)
-        ) / 3
-
-        addrs = {ti["from"], ti["to"], tj["from"], tj["to"], tk["from"], tk["to"]}
-        trios.append({
-            "idx": [i, j, k],
-            "utilidad": utilidad,
-            "gas_total": gas_total,
-            "addrs": addrs
-        })
-        if len(trios) >= max_trios:
-            break
+    # Los max_trios tríos factibles de mayor utilidad (best-first, sin recorrer C(n, 3))
+    with fase("trios"):
+        mejores_trios = motor.trios_top(max_trios)
 
-    trios.sort(key=lambda x: x["utilidad"], reverse=True)
-
-    for t in trios:
-        if t["addrs"] & direcciones_ocupadas:
-            continue
-        if gas_usado + t["gas_total"] > gas_limit:
-            continue
-        bloque_idx.update(t["idx"])
-        gas_usado += t["gas_total"]
-        direcciones_ocupadas |= t["addrs"]
+    with fase("empaquetado"):
+        empaquetador.empaquetar([(i, j, k) for i, j, k, _ in mejores_trios])
 
     # --- PARES ---
-    pares = []
-    for i, j in combinations(range(n), 2):
-        if i in bloque_idx or j in bloque_idx:
-            continue
-        ti, tj = txs[i], txs[j]
-        gas_total = ti["gas"] + tj["gas"]
-        if gas_total > gas_limit:
-            continue
-
-        utilidad = calcular_utilidad(ti, tj, gas_limit=gas_limit)
-        addrs = {ti["from"], ti["to"], tj["from"], tj["to"]}
-        pares.append({
-            "idx": [i, j],
-            "utilidad": utilidad,
-            "gas_total": gas_total,
-            "addrs": addrs
-        })
-        if len(pares) >= max_pares:
-            break
-
-    pares.sort(key=lambda x: x["utilidad"], reverse=True)
-
-    for p in pares:
-        if any(idx in bloque_idx for idx in p["idx"]):
-            continue
-        if p["addrs"] & direcciones_ocupadas:
-            continue
-        if gas_usado + p["gas_total"] > gas_limit:
-            continue
-        bloque_idx.update(p["idx"])
-        gas_usado += p["gas_total"]
-        direcciones_ocupadas |= p["addrs"]
+    # Los max_pares pares factibles de mayor utilidad entre las transacciones no incluidas
+    with fase("pares"):
+        libres = np.flatnonzero(~empaquetador.incluidas_mask())
+        pares_i, pares_j, _, gas_pares = motor.pares_top(max_pares, candidatas=libres)
+    with fase("empaquetado"):
+        empaquetador.empaquetar(np.column_stack([pares_i, pares_j]), gas_pares)
 
     # --- Finalizar ---
-    bloque_df = ampliado_df.loc[list(bloque_idx)].copy()
-    bloque_df["lead_time_ms"] = T_simulado - bloque_df["timestamp_ms"]
+    with fase("armar_bloque"):
+        bloque_idx = empaquetador.indices()
+        bloque_df = ampliado.a_dataframe(bloque_idx)
+        bloque_df["lead_time_ms"] = T_simulado - ampliado.timestamp_ms[bloque_idx]
+        gas_total = ampliado.suma("gas", bloque_idx)
+        utilidad_total = ampliado.suma("fee", bloque_idx)
 
     fin = time.perf_counter()
 
     resumen = {
-        "algoritmo": f"algoritmo_extendido",
+        "algoritmo": "algoritmo_extendido",
         "timestamp_simulado": T_simulado,
-        "total_transacciones": len(df),
+        "total_transacciones": len(batch),
         "tx_incluidas": len(bloque_df),
-        "gas_usado": int(bloque_df["gas"].sum()),
-        "utilidad_total_heuristica": int(bloque_df["fee"].sum()),
-        "utilidad_total_real": int(sum(bloque_df["gas"] * bloque_df["gas_fee_cap"])),
-        "fragmentacion": int(gas_limit - bloque_df["gas"].sum()),
-        "lead_time_promedio_s": round(bloque_df["lead_time_ms"].mean() / 1000, 3),
+        "gas_usado": gas_total,
+        "utilidad_total_heuristica": utilidad_total,
+        "utilidad_total_real": utilidad_total,
+        "fragmentacion": int(gas_limit - gas_total),
+        "lead_time_promedio_s": 0.0 if bloque_df.empty else round(bloque_df["lead_time_ms"].mean() / 1000, 3),
         "tiempo_ejecucion_s": round(fin - inicio, 4)
     }
 
-    guardar_log_csv(resumen)
     return resumen, bloque_df
@@ -1,15 +1,18 @@
 import time
 import numpy as np
-import pandas as pd
-from utils import guardar_log_csv
+from indice_conflictos import IndiceConflictos
+from tx_batch import TxBatch
+from registro_builders import registrar_builder
+from perfilado import fase
 
+@registrar_builder("greedy_clasico")
 def construir_bloque(df, T_simulado, gas_limit=30_000_000):
     """    Construye un bloque utilizando un algoritmo greedy clásico  
     basado en la maximización de la
     utilidad de las transacciones, priorizando aquellas con mayor
     gas_fee_cap por unidad de gas.
     Parámetros:
-        df (pd.DataFrame): DataFrame con las transacciones.
+        df (pd.DataFrame | TxBatch): Transacciones (DataFrame o batch columnar ya preparado).
         T_simulado (int): Timestamp simulado de inclusión del bloque.
         gas_limit (int): Límite de gas del bloque (default: 30_000_000).
     Retorna:
@@ -17,48 +20,52 @@ def construir_bloque(df, T_simulado, gas_limit=30_000_000):
     """
 
     inicio = time.perf_counter()
-    bloque = []
+    with fase("cargar_batch"):
+        batch = df if isinstance(df, TxBatch) else TxBatch.desde_df(df)
+    seleccion = []
     gas_usado = 0
 
-    txs = df.to_dict("records")
+    # Densidad fee / gas == gas_fee_cap; orden estable como sorted(..., reverse=True)
+    with fase("orden"):
+        orden = np.argsort(-batch.gas_fee_cap, kind="stable")
 
-    txs_ordenados = sorted(
-        txs,
-        key=lambda tx: (tx["gas_fee_cap"] * tx["gas"]) / tx["gas"],
-        reverse=True
-    )
+    with fase("seleccion"):
+        gas = batch.gas.tolist()
+        to_id = batch.to_id.tolist()
+        from_id = batch.from_id.tolist()
+        nonce = batch.nonce.tolist()
 
-    for tx in txs_ordenados:
-        if any(
-            tx["from"] == otro["from"] and tx.get("nonce") == otro.get("nonce")
-            or tx["to"] == otro["to"] for otro in bloque
-        ):
-            continue
+        # Conflictos por destino o (from, nonce) en O(1) contra lo ya aceptado
+        conflictos = IndiceConflictos()
+        for p in orden.tolist():
+            if conflictos.conflicta(to_id[p], from_id[p], nonce[p]):
+                continue
 
-        if gas_usado + tx["gas"] <= gas_limit:
-            bloque.append(tx)
-            gas_usado += tx["gas"]
+            if gas_usado + gas[p] <= gas_limit:
+                seleccion.append(p)
+                conflictos.agregar(to_id[p], from_id[p], nonce[p])
+                gas_usado += gas[p]
 
-    fin = time.perf_counter()
+    with fase("armar_bloque"):
+        bloque_df = batch.a_dataframe(seleccion)
 
-    bloque_df = pd.DataFrame(bloque)
+        if not bloque_df.empty:
+            bloque_df["lead_time_ms"] = T_simulado - batch.timestamp_ms[seleccion]
 
-    if not bloque_df.empty:
-        bloque_df["fee"] = bloque_df["gas"] * bloque_df["gas_fee_cap"]
-        bloque_df["lead_time_ms"] = T_simulado - bloque_df["timestamp_ms"]
+            utilidad_total = batch.suma("fee", seleccion)
+            lead_time_prom = round(bloque_df["lead_time_ms"].mean() / 1000, 3)
+            gas_usado_total = batch.suma("gas", seleccion)
+        else:
+            utilidad_total = 0
+            lead_time_prom = 0.0
+            gas_usado_total = 0
 
-        utilidad_total = int(bloque_df["fee"].sum())
-        lead_time_prom = round(bloque_df["lead_time_ms"].mean() / 1000, 3)
-        gas_usado_total = int(bloque_df["gas"].sum())
-    else:
-        utilidad_total = 0
-        lead_time_prom = 0.0
-        gas_usado_total = 0
+    fin = time.perf_counter()
 
     resumen = {
         "algoritmo": "greedy_clasico",
         "timestamp_simulado": T_simulado,
-        "total_transacciones": len(df),
+        "total_transacciones": len(batch),
         "tx_incluidas": len(bloque_df),
         "gas_usado": gas_usado_total,
         "utilidad_total": utilidad_total,
@@ -66,6 +73,5 @@ def construir_bloque(df, T_simulado, gas_limit=30_000_000):
         "lead_time_promedio_s": lead_time_prom,
         "tiempo_ejecucion_s": round(fin - inicio, 4)
     }
-    guardar_log_csv(resumen)
 
     return resumen, bloque_df
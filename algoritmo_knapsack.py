@@ -0,0 +1,370 @@
+import time
+from bisect import bisect_right
+from itertools import accumulate
+
+import numpy as np
+import pandas as pd
+from tx_batch import TxBatch
+from registro_builders import registrar_builder
+from perfilado import fase
+
+# Cada cuántos nodos se consulta el reloj
+_CHEQUEO_TIEMPO = 2048
+# Transacciones (las de mayor densidad) que entran en la DP de gas escalado; acota
+# la memoria de reconstrucción (grupos x celdas) en mempools grandes
+_MAX_DP = 2000
+
+
+def _grupos_conflicto(batch, posiciones):
+    """
+    Ids de grupo por transacción: uno por destino y otro por (from, nonce).
+    Dos transacciones del mismo grupo no pueden ir juntas (regla de greedy_clasico);
+    -1 = sin grupo (dirección vacía o nonce desconocido).
+    """
+    from_id = batch.from_id[posiciones].astype(np.int64)
+    nonce = batch.nonce[posiciones].astype(np.int64)
+    grupo_fn = np.full(len(posiciones), -1, dtype=np.int64)
+    con_nonce = np.flatnonzero((from_id >= 0) & (nonce >= 0))
+    if con_nonce.size:
+        # Cada par (from, nonce) como un solo entero: from_id * nonces distintos + código del nonce
+        codigo_nonce, nonces = pd.factorize(nonce[con_nonce])
+        grupo_fn[con_nonce] = pd.factorize(from_id[con_nonce] * len(nonces) + codigo_nonce)[0]
+    return batch.to_id[posiciones].tolist(), grupo_fn.tolist()
+
+
+def cota_por_destino(gas, valor, grupo_to, capacidad, limite=None):
+    """
+    Cota superior de la mochila con a lo sumo una transacción por destino (relajación
+    lineal de la mochila de elección múltiple; ignora los conflictos (from, nonce)).
+
+    En cada grupo se arma la envolvente cóncava de (gas, valor) desde (0, 0); sus
+    tramos, ordenados por pendiente de todos los grupos juntos, se llenan en forma
+    fraccional hasta agotar la capacidad. Es mucho más ajustada que la cota de
+    Dantzig cuando muchas transacciones caras comparten contrato.
+
+    Una cota a medio calcular no acota nada: si se pasa 'limite' (instante de
+    time.perf_counter()) y se alcanza antes de terminar, se devuelve None.
+
+    Retorna:
+        tuple: (cota, elegidas) donde 'elegidas' es, por grupo, la transacción del
+            último tramo completo que tomó la relajación (redondeo hacia abajo).
+    """
+    def agotado(i):
+        return limite is not None and i % _CHEQUEO_TIEMPO == 0 and time.perf_counter() > limite
+
+    grupos = {}
+    tramos = []
+    for t, to in enumerate(grupo_to):
+        if agotado(t):
+            return None
+        if to < 0:
+            tramos.append((gas[t], valor[t], t))  # grupo propio: un solo tramo
+        else:
+            grupos.setdefault(to, []).append(t)
+
+    for i, miembros in enumerate(grupos.values()):
+        if agotado(i):
+            return None
+        if len(miembros) == 1:
+            t = miembros[0]
+            tramos.append((gas[t], valor[t], t))
+            continue
+        miembros.sort(key=lambda t: (gas[t], -valor[t]))
+        envolvente = [(0, 0, None)]  # (gas, valor, tx); (0, 0) = no tomar nada del grupo
+        for t in miembros:
+            g, v = gas[t], valor[t]
+            if v <= envolvente[-1][1]:
+                continue
+            while len(envolvente) >= 2:
+                g1, v1, _ = envolvente[-2]
+                g2, v2, _ = envolvente[-1]
+                if (v2 - v1) * (g - g2) <= (v - v2) * (g2 - g1):
+                    envolvente.pop()
+                else:
+                    break
+            envolvente.append((g, v, t))
+        for (g1, v1, _), (g2, v2, t) in zip(envolvente, envolvente[1:]):
+            tramos.append((g2 - g1, v2 - v1, t))
+
+    tramos.sort(key=lambda tr: tr[1] / tr[0] if tr[0] else float("inf"), reverse=True)
+    total, cap = 0, capacidad
+    elegidas = {}
+    for g, v, t in tramos:
+        if g <= cap:
+            total += v
+            cap -= g
+            # Los tramos de un grupo aparecen en orden: el último reemplaza al anterior
+            elegidas[grupo_to[t] if grupo_to[t] >= 0 else ("solo", t)] = t
+        else:
+            total += -(-v * cap // g)
+            break
+    return total, list(elegidas.values())
+
+
+def dp_escalado(gas, valor, grupos, capacidad, celdas=16384, limite=None):
+    """
+    Programación dinámica de mochila con a lo sumo una transacción por grupo, sobre
+    el gas escalado a 'celdas' unidades (redondeando el gas de cada transacción hacia
+    arriba, así que la solución siempre es factible con el gas real).
+
+    Cada grupo actualiza el vector de mejores valores con una operación de NumPy por
+    transacción; para reconstruir la solución se guarda qué transacción mejoró cada
+    celda. Los conflictos fuera de 'grupos' no se consideran. Si se pasa 'limite'
+    (instante de time.perf_counter()) y se alcanza, se corta antes de la siguiente
+    transacción y se reconstruye la mejor solución con las ya procesadas.
+
+    Parámetros:
+        gas, valor (list): Gas y valor por transacción.
+        grupos (list[int]): Grupo de cada transacción (-1 = grupo propio).
+        capacidad (int): Gas disponible.
+        celdas (int): Resolución del gas escalado.
+        limite (float): Instante límite opcional (time.perf_counter()).
+
+    Retorna:
+        list[int]: Posiciones elegidas, en orden ascendente.
+    """
+    escala = max(-(-capacidad // celdas), 1)
+    C = capacidad // escala
+
+    por_grupo = {}
+    for t, gr in enumerate(grupos):
+        por_grupo.setdefault(gr if gr >= 0 else ("solo", t), []).append(t)
+    miembros = list(por_grupo.values())
+
+    mejor = np.zeros(C + 1)  # mejor[c] = mayor valor con gas escalado <= c
+    elecciones = []
+    agotado = False
+    for grupo in miembros:
+        nuevo = mejor.copy()
+        eleccion = np.full(C + 1, -1, dtype=np.int16 if len(grupo) < 2**15 else np.int32)
+        for j, t in enumerate(grupo):
+            if limite is not None and time.perf_counter() > limite:
+                agotado = True
+                break
+            w = -(-gas[t] // escala)
+            if w > C:
+                continue
+            candidato = mejor[:C + 1 - w] + float(valor[t])
+            mejora = candidato > nuevo[w:]
+            nuevo[w:][mejora] = candidato[mejora]
+            eleccion[w:][mejora] = j
+        mejor = nuevo
+        elecciones.append(eleccion)
+        if agotado:
+            break
+
+    # Solo se reconstruye sobre los grupos procesados (todos, salvo que se agote el tiempo)
+    seleccion, c = [], C
+    for grupo, eleccion in zip(reversed(miembros[:len(elecciones)]), reversed(elecciones)):
+        j = eleccion[c]
+        if j >= 0:
+            seleccion.append(grupo[j])
+            c -= -(-gas[grupo[j]] // escala)
+    return sorted(seleccion)
+
+
+def _greedy(prioridad, gas, valor, grupo_to, grupo_fn, capacidad):
+    """Agrega en orden de 'prioridad' cada transacción que entra y no conflictúa."""
+    usados_to, usados_fn = set(), set()
+    seleccion, total, cap = [], 0, capacidad
+    for t in prioridad:
+        to, fn = grupo_to[t], grupo_fn[t]
+        if gas[t] > cap or (to >= 0 and to in usados_to) or (fn >= 0 and fn in usados_fn):
+            continue
+        seleccion.append(t)
+        total += valor[t]
+        cap -= gas[t]
+        usados_to.add(to)
+        usados_fn.add(fn)
+    return sorted(seleccion), total
+
+
+def resolver_knapsack(gas, valor, grupo_to, grupo_fn, capacidad, tiempo_limite_s=1.0, incumbente=None):
+    """
+    Branch-and-bound para la mochila de gas con conflictos.
+
+    Las transacciones vienen ordenadas por densidad (valor / gas) descendente. El
+    recorrido es en profundidad probando primero incluir, así que la primera hoja es
+    la solución greedy. La cota de cada nodo es la relajación fraccional (Dantzig)
+    sobre las transacciones restantes, que ignora conflictos y sale en O(log n) con
+    sumas prefijas y bisect. Si se agota 'tiempo_limite_s' se devuelve la mejor
+    solución hallada junto con la cota superior de lo no explorado.
+
+    Parámetros:
+        gas, valor (list): Gas y valor por transacción, en orden de densidad.
+        grupo_to, grupo_fn (list[int]): Grupos de conflicto (ver _grupos_conflicto).
+        capacidad (int): Gas disponible.
+        tiempo_limite_s (float): Presupuesto de tiempo.
+        incumbente (tuple): (posiciones, valor) de una solución inicial factible.
+
+    Retorna:
+        tuple: (posiciones elegidas, valor, cota superior, óptimo probado, nodos)
+    """
+    n = len(gas)
+    G = list(accumulate(gas, initial=0))
+    F = list(accumulate(valor, initial=0))
+
+    def cota(k, cap):
+        # Ítems k..m-1 entran completos; del m-ésimo entra la fracción que cabe
+        m = bisect_right(G, G[k] + cap, lo=k) - 1
+        extra = F[m] - F[k]
+        if m < n:
+            resto = G[k] + cap - G[m]
+            extra += -(-valor[m] * resto // gas[m])
+        return extra
+
+    usado_to = [False] * (max(grupo_to, default=-1) + 2)
+    usado_fn = [False] * (max(grupo_fn, default=-1) + 2)
+
+    mejor_sel, mejor_valor = incumbente if incumbente is not None else ([], 0)
+    pila = []  # (k, cap antes, valor antes) de cada transacción incluida
+    k, cap, val = 0, capacidad, 0
+    nodos = 0
+    limite = time.perf_counter() + tiempo_limite_s
+    agotado = False
+
+    while True:
+        nodos += 1
+        if nodos % _CHEQUEO_TIEMPO == 0 and time.perf_counter() > limite:
+            agotado = True
+            break
+
+        if k < n and val + cota(k, cap) > mejor_valor:
+            # Incluir si entra y no hay conflicto; si no, pasar a la siguiente
+            t, ft = grupo_to[k], grupo_fn[k]
+            if gas[k] <= cap and not usado_to[t] and not usado_fn[ft]:
+                pila.append((k, cap, val))
+                cap -= gas[k]
+                val += valor[k]
+                usado_to[t] = usado_fn[ft] = True
+                usado_to[-1] = usado_fn[-1] = False  # el grupo -1 nunca se ocupa
+                if val > mejor_valor:
+                    mejor_valor, mejor_sel = val, [p for p, _, _ in pila]
+            k += 1
+            continue
+
+        # Hoja o nodo podado: deshacer la última inclusión y probar excluirla
+        while pila:
+            kp, cap, val = pila.pop()
+            usado_to[grupo_to[kp]] = usado_fn[grupo_fn[kp]] = False
+            k = kp + 1
+            if val + cota(k, cap) > mejor_valor:
+                break
+        else:
+            break
+
+    if not agotado:
+        return mejor_sel, mejor_valor, mejor_valor, True, nodos
+
+    # Cota superior global: el mejor valor o lo que podrían dar los subárboles pendientes
+    cota_superior = max(mejor_valor, val + (cota(k, cap) if k < n else 0))
+    for kp, cap_p, val_p in pila:
+        cota_superior = max(cota_superior, val_p + cota(kp + 1, cap_p))
+    return mejor_sel, mejor_valor, cota_superior, False, nodos
+
+
+@registrar_builder("knapsack", determinista=False)
+def construir_bloque(df, T_simulado, gas_limit=30_000_000, tiempo_limite_s=1.0):
+    """
+    Construye un bloque resolviendo la mochila de gas con conflictos (mismo 'to', o
+    mismo 'from' y nonce, igual que greedy_clasico) con presupuesto de tiempo.
+
+    Parte de la mejor de varias soluciones iniciales (greedy por densidad, redondeo
+    de la relajación por destino y DP de gas escalado por destino y por remitente,
+    completadas en forma greedy), la mejora con branch-and-bound y reporta el gap
+    contra la menor cota superior conocida (0 si se probó el óptimo). Nunca queda
+    por debajo de greedy_clasico en utilidad.
+
+    'tiempo_limite_s' acota toda la construcción: las soluciones iniciales salvo la
+    greedy se cortan al llegar al límite (las DP devuelven lo que llevan, las cotas
+    se descartan) y el branch-and-bound usa lo que sobra.
+
+    Parámetros:
+        df (pd.DataFrame | TxBatch): Transacciones, como en greedy_clasico.
+        T_simulado (int): Timestamp simulado de inclusión del bloque.
+        gas_limit (int): Límite de gas del bloque (default: 30_000_000).
+        tiempo_limite_s (float): Presupuesto de tiempo de la construcción (default: 1.0).
+    Retorna:
+        tuple: Resumen de la construcción del bloque y DataFrame con las transacciones incluidas.
+    """
+    inicio = time.perf_counter()
+    with fase("cargar_batch"):
+        batch = df if isinstance(df, TxBatch) else TxBatch.desde_df(df)
+
+    with fase("preparar"):
+        # Solo candidatas que entran solas y aportan valor, en orden de densidad (gas_fee_cap)
+        fee = batch.fee
+        if fee.dtype.kind == "f":
+            fee = np.nan_to_num(fee, nan=0.0)
+        utiles = np.flatnonzero((batch.gas <= gas_limit) & (fee > 0))
+        posiciones = utiles[np.argsort(-batch.gas_fee_cap[utiles], kind="stable")].tolist()
+
+        gas = batch.gas[posiciones].tolist()
+        valor = fee[posiciones].tolist()
+        grupo_to, grupo_fn = _grupos_conflicto(batch, posiciones)
+        densidad = range(len(posiciones))
+
+    with fase("soluciones_iniciales"):
+        # Soluciones iniciales: cada una prioriza una selección y completa en forma greedy.
+        # La greedy por densidad va siempre; las demás y la cota por (from, nonce), en
+        # ese orden, solo mientras quede tiempo
+        limite = inicio + tiempo_limite_s
+        candidatas = [_greedy(densidad, gas, valor, grupo_to, grupo_fn, gas_limit)]
+        cotas = []
+        relajacion = cota_por_destino(gas, valor, grupo_to, gas_limit, limite)
+        if relajacion is not None:
+            cota_to, elegidas_lp = relajacion
+            cotas.append(cota_to)
+            candidatas.append(_greedy(sorted(elegidas_lp) + list(densidad), gas, valor, grupo_to, grupo_fn, gas_limit))
+        for grupos in (grupo_to, grupo_fn):
+            if time.perf_counter() < limite:
+                prioridad = dp_escalado(gas[:_MAX_DP], valor[:_MAX_DP], grupos[:_MAX_DP], gas_limit, limite=limite)
+                candidatas.append(_greedy(prioridad + list(densidad), gas, valor, grupo_to, grupo_fn, gas_limit))
+        relajacion = cota_por_destino(gas, valor, grupo_fn, gas_limit, limite)
+        if relajacion is not None:
+            cotas.append(relajacion[0])
+        incumbente = max(candidatas, key=lambda sol: sol[1])
+
+    with fase("branch_and_bound"):
+        # El presupuesto es para toda la construcción: la búsqueda usa lo que queda
+        restante = max(limite - time.perf_counter(), 0.0)
+        elegidas, utilidad_total, cota_superior, optimo, nodos = resolver_knapsack(
+            gas, valor, grupo_to, grupo_fn, gas_limit, restante, incumbente
+        )
+        # Las relajaciones por destino y por (from, nonce) también acotan el óptimo
+        if cotas:
+            cota_superior = min(cota_superior, max(min(cotas), utilidad_total))
+        optimo = optimo or utilidad_total >= cota_superior
+        seleccion = [posiciones[k] for k in elegidas]
+
+    with fase("armar_bloque"):
+        bloque_df = batch.a_dataframe(seleccion)
+
+        if not bloque_df.empty:
+            bloque_df["lead_time_ms"] = T_simulado - batch.timestamp_ms[seleccion]
+            lead_time_prom = round(bloque_df["lead_time_ms"].mean() / 1000, 3)
+            utilidad_total = batch.suma("fee", seleccion)
+            gas_usado_total = batch.suma("gas", seleccion)
+        else:
+            lead_time_prom = 0.0
+            gas_usado_total = 0
+
+    fin = time.perf_counter()
+
+    resumen = {
+        "algoritmo": "knapsack",
+        "timestamp_simulado": T_simulado,
+        "total_transacciones": len(batch),
+        "tx_incluidas": len(bloque_df),
+        "gas_usado": gas_usado_total,
+        "utilidad_total": utilidad_total,
+        "fragmentacion": gas_limit - gas_usado_total,
+        "lead_time_promedio_s": lead_time_prom,
+        "tiempo_ejecucion_s": round(fin - inicio, 4),
+        "cota_superior": cota_superior,
+        "gap": float((cota_superior - utilidad_total) / cota_superior) if cota_superior else 0.0,
+        "optimo_probado": bool(optimo),
+        "nodos": nodos,
+    }
+
+    return resumen, bloque_df
@@ -0,0 +1,143 @@
+import argparse
+import json
+import subprocess
+import time
+from pathlib import Path
+
+from utils import calcular_T_simulado
+from tx_batch import TxBatch
+from registro_builders import builders_disponibles, es_determinista
+from comparar_builders import medir_builder
+from generador_mempool import generar_mempool, ajustar_parametros, DATASETS_REALES
+from registro_resultados import RegistroResultados
+
+# -------- CONFIGURACIÓN --------
+HERE = Path(__file__).resolve().parent
+TAMANOS = [1_000, 10_000, 50_000, 200_000, 500_000]
+SEMILLA = 42
+GAS_LIMIT = 30_000_000
+REPETICIONES = 5
+TIEMPO_MAXIMO_S = 30.0      # si un builder supera este p50, no se corre en tamaños mayores
+SALIDA_DEFAULT = HERE / "logs" / "bench_escalado.jsonl"
+# Umbrales para marcar regresiones contra un archivo de referencia
+TOLERANCIA_LATENCIA = 1.25  # p50 nuevo / p50 de referencia
+TOLERANCIA_MEMORIA = 1.25
+TOLERANCIA_UTILIDAD = 0.01  # diferencia relativa admitida en los builders acotados por tiempo
+# -------------------------------
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _leer_resultados(path):
+    """Última fila de cada (builder, n, semilla) de un archivo .jsonl de bench_escalado."""
+    filas = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for linea in f:
+            if linea.strip():
+                fila = json.loads(linea)
+                filas[(fila["builder"], fila["n"], fila["semilla"])] = fila
+    return filas
+
+
+def _utilidad_distinta(nombre, utilidad, utilidad_ref):
+    if utilidad == utilidad_ref:
+        return False
+    if es_determinista(nombre) or not utilidad_ref:
+        return True
+    return abs(utilidad - utilidad_ref) / abs(utilidad_ref) > TOLERANCIA_UTILIDAD
+
+
+def comparar(resultados, referencia):
+    """
+    Compara cada resultado con la fila de la referencia del mismo builder, tamaño y
+    semilla. Con la misma semilla el mempool es idéntico, así que la utilidad tiene
+    que coincidir exacto, salvo en los builders acotados por tiempo (es_determinista),
+    donde se admite TOLERANCIA_UTILIDAD; latencia y memoria se comparan con tolerancia.
+
+    Retorna:
+        list[str]: Descripción de cada regresión encontrada.
+    """
+    regresiones = []
+    for r in resultados:
+        ref = referencia.get((r["builder"], r["n"], r["semilla"]))
+        if ref is None or r.get("omitido") or ref.get("omitido"):
+            continue
+        clave = f"{r['builder']} n={r['n']}"
+        if _utilidad_distinta(r["builder"], r["utilidad_total"], ref["utilidad_total"]):
+            regresiones.append(f"{clave}: utilidad_total {ref['utilidad_total']} -> {r['utilidad_total']}")
+        if ref["p50_s"] > 0 and r["p50_s"] / ref["p50_s"] > TOLERANCIA_LATENCIA:
+            regresiones.append(f"{clave}: p50_s {ref['p50_s']} -> {r['p50_s']}")
+        if ref["pico_memoria_mb"] > 0 and r["pico_memoria_mb"] / ref["pico_memoria_mb"] > TOLERANCIA_MEMORIA:
+            regresiones.append(f"{clave}: pico_memoria_mb {ref['pico_memoria_mb']} -> {r['pico_memoria_mb']}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Corre todos los constructores sobre mempools sintéticos de tamaño creciente.")
+    parser.add_argument("--tamanos", type=int, nargs="*", default=TAMANOS)
+    parser.add_argument("--builders", nargs="*", default=None,
+                        help=f"Subconjunto a correr (default: todos). Disponibles: {', '.join(builders_disponibles())}")
+    parser.add_argument("--semilla", type=int, default=SEMILLA)
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    parser.add_argument("--gas-limit", type=int, default=GAS_LIMIT)
+    parser.add_argument("--ajustar", action="store_true",
+                        help="Estima los parámetros del generador desde los datasets del repo")
+    parser.add_argument("--salida", default=str(SALIDA_DEFAULT), help="Archivo .jsonl o .csv de resultados")
+    parser.add_argument("--referencia", default=None,
+                        help="Resultados .jsonl de una corrida anterior contra los que marcar regresiones")
+    args = parser.parse_args()
+
+    parametros = ajustar_parametros([p for p in DATASETS_REALES if p.exists()]) if args.ajustar else {}
+    nombres = args.builders or builders_disponibles()
+    commit = _commit_actual()
+    descartados = set()
+
+    print(f"{'builder':<28} {'n':>8} {'p50_s':>9} {'p99_s':>9} {'mem_mb':>8} {'tx_incl':>8} {'utilidad_total':>22}")
+    resultados = []
+    for n in sorted(args.tamanos):
+        t0 = time.perf_counter()
+        df = generar_mempool(n, semilla=args.semilla, **parametros)
+        batch = TxBatch.desde_df(df)
+        T_simulado = calcular_T_simulado(df)
+        print(f"-- n={n}: mempool generado en {time.perf_counter() - t0:.2f}s")
+
+        for nombre in nombres:
+            base = {"builder": nombre, "n": n, "semilla": args.semilla, "gas_limit": args.gas_limit,
+                    "parametros_ajustados": args.ajustar, "commit": commit}
+            if nombre in descartados:
+                resultados.append({**base, "omitido": True})
+                print(f"{nombre:<28} {n:>8} {'(omitido: superó ' + str(TIEMPO_MAXIMO_S) + 's antes)':>40}")
+                continue
+
+            r = medir_builder(nombre, batch, T_simulado, args.repeticiones, args.gas_limit)
+            r.update(base)
+            r["omitido"] = False
+            resultados.append(r)
+            print(f"{nombre:<28} {n:>8} {r['p50_s']:>9.5f} {r['p99_s']:>9.5f} {r['pico_memoria_mb']:>8.2f} "
+                  f"{r['tx_incluidas']:>8} {r['utilidad_total']:>22}")
+            if r["p50_s"] > TIEMPO_MAXIMO_S:
+                descartados.add(nombre)
+
+    with RegistroResultados(args.salida) as registro:
+        for r in resultados:
+            registro.registrar(r)
+    print(f"\nResultados en {args.salida}")
+
+    if args.referencia:
+        regresiones = comparar(resultados, _leer_resultados(args.referencia))
+        print(f"\n{len(regresiones)} regresiones contra {args.referencia}")
+        for linea in regresiones:
+            print(f"  {linea}")
+        if regresiones:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
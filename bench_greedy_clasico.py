@@ -0,0 +1,72 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from algoritmo_greedy_clasico import construir_bloque
+
+# -------- CONFIGURACIÓN --------
+TAMANOS = [1_000, 5_000, 20_000, 50_000, 200_000]
+MAX_TAMANO_LINEAL = 20_000    # la versión O(n²) se vuelve impracticable más arriba
+SEMILLA = 42
+# -------------------------------
+
+
+def generar_mempool(n, seed=SEMILLA):
+    """Mempool sintético mínimo con las columnas que usa greedy_clasico."""
+    rng = np.random.default_rng(seed)
+    n_remitentes = max(n // 3, 1)
+    # 20% de las tx van a un puñado de contratos populares, el resto a destinos dispersos
+    destinos = rng.integers(0, n, n)
+    populares = rng.random(n) < 0.2
+    destinos[populares] = rng.integers(0, 50, populares.sum())
+    return pd.DataFrame({
+        "hash": [f"0x{i:064x}" for i in range(n)],
+        "from": [f"0xf{x:039x}" for x in rng.integers(0, n_remitentes, n)],
+        "to": [f"0xd{x:039x}" for x in destinos],
+        "nonce": rng.integers(0, 50, n),
+        "gas": rng.choice([21_000, 50_000, 120_000, 250_000, 800_000], n),
+        "gas_fee_cap": rng.lognormal(np.log(2e9), 1.0, n).astype(np.int64),
+        "timestamp_ms": 1_752_451_200_000 + np.sort(rng.integers(0, 12_000, n)),
+    })
+
+
+def greedy_lineal(df, gas_limit=30_000_000):
+    """Versión anterior: compara cada candidata contra todo el bloque con any()."""
+    txs = sorted(df.to_dict("records"), key=lambda tx: tx["gas_fee_cap"], reverse=True)
+    bloque, gas_usado = [], 0
+    for tx in txs:
+        if any(
+            tx["from"] == otro["from"] and tx.get("nonce") == otro.get("nonce")
+            or tx["to"] == otro["to"] for otro in bloque
+        ):
+            continue
+        if gas_usado + tx["gas"] <= gas_limit:
+            bloque.append(tx)
+            gas_usado += tx["gas"]
+    return bloque
+
+
+def main():
+    print(f"{'n':>8} {'indice_s':>10} {'lineal_s':>10} {'tx_incluidas':>13}")
+    for n in TAMANOS:
+        df = generar_mempool(n)
+        T_simulado = int(df["timestamp_ms"].max())
+        # gas_limit proporcional para que el bloque crezca con el mempool
+        gas_limit = max(30_000_000, n * 60_000)
+
+        t0 = time.perf_counter()
+        resumen, _ = construir_bloque(df, T_simulado, gas_limit=gas_limit)
+        t_indice = time.perf_counter() - t0
+
+        t_lineal = float("nan")
+        if n <= MAX_TAMANO_LINEAL:
+            t0 = time.perf_counter()
+            greedy_lineal(df, gas_limit=gas_limit)
+            t_lineal = time.perf_counter() - t0
+
+        print(f"{n:>8} {t_indice:>10.4f} {t_lineal:>10.4f} {resumen['tx_incluidas']:>13}")
+
+
+if __name__ == "__main__":
+    main()
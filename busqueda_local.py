@@ -0,0 +1,271 @@
+import time
+
+import numpy as np
+from tx_batch import TxBatch
+from registro_builders import construir, regla_conflicto
+from empaquetado import Empaquetador
+from algoritmo_componentes import grupos_conflicto
+from perfilado import fase
+
+# Cada cuántas candidatas evaluadas se consulta el reloj
+_CHEQUEO_TIEMPO = 256
+
+
+def _claves_conflicto(batch, regla, gas_limit):
+    """
+    Por transacción, las dos claves que ocupa en el bloque (-1 = ninguna): dos
+    transacciones chocan si comparten alguna.
+
+    "clasico": el grupo de destino y el del par (from, nonce), como en greedy_clasico
+    (ver algoritmo_componentes.grupos_conflicto).
+    "direcciones": las direcciones 'from' y 'to' con los ids locales de
+    Empaquetador.direcciones, como en los algoritmos de pares y tríos.
+
+    Retorna:
+        list[list[int]]: [clave_a, clave_b] por transacción.
+    """
+    if regla == "clasico":
+        grupo_to, grupo_fn = grupos_conflicto(batch.to_id, batch.from_id, batch.nonce)
+        # Los grupos (from, nonce) van después de los de destino para no mezclarse
+        grupo_fn = np.where(grupo_fn >= 0, grupo_fn + grupo_to.max(initial=-1) + 1, -1)
+        return np.column_stack([grupo_to, grupo_fn]).tolist()
+    if regla == "direcciones":
+        empaquetador = Empaquetador(batch, gas_limit)
+        direcciones = empaquetador.direcciones.copy()
+        # La celda de dirección vacía nunca genera conflicto; from == to ocupa una sola
+        direcciones[direcciones == len(empaquetador.ocupadas) - 1] = -1
+        direcciones[direcciones[:, 1] == direcciones[:, 0], 1] = -1
+        return direcciones.tolist()
+    raise ValueError(f"Regla de conflicto desconocida: {regla}")
+
+
+class _EstadoBloque:
+    """
+    Bloque en edición con contabilidad incremental de gas, valor y conflictos.
+
+    Cada transacción ocupa hasta dos claves según la regla de conflicto del
+    constructor (ver _claves_conflicto). Por clave se guarda qué transacciones del
+    bloque la ocupan, así agregar, quitar y encontrar con quién choca una candidata
+    son O(1).
+    """
+
+    def __init__(self, batch, seleccion, gas_limit, regla="clasico"):
+        self.claves = _claves_conflicto(batch, regla, gas_limit)
+        self.gas = batch.gas.tolist()
+        fee = batch.fee
+        if fee.dtype.kind == "f":
+            fee = np.nan_to_num(fee, nan=0.0)
+        self.fee = fee.tolist()
+        self.gas_limit = gas_limit
+
+        self.incluidas = set()
+        self.ocupantes = {}
+        self.gas_usado = 0
+        for p in seleccion:
+            self.agregar(p)
+
+    def libre(self):
+        return self.gas_limit - self.gas_usado
+
+    def conflictos(self, p):
+        """Transacciones del bloque que chocan con la candidata p."""
+        choques = set()
+        for clave in self.claves[p]:
+            if clave >= 0:
+                choques |= self.ocupantes.get(clave, set())
+        return choques
+
+    def chocan(self, a, b):
+        return any(clave >= 0 and clave in self.claves[b] for clave in self.claves[a])
+
+    def agregar(self, p):
+        self.incluidas.add(p)
+        self.gas_usado += self.gas[p]
+        for clave in self.claves[p]:
+            if clave >= 0:
+                self.ocupantes.setdefault(clave, set()).add(p)
+
+    def quitar(self, p):
+        self.incluidas.discard(p)
+        self.gas_usado -= self.gas[p]
+        for clave in self.claves[p]:
+            if clave >= 0:
+                self.ocupantes[clave].discard(p)
+
+
+def _mejorar(estado, candidatas, limite):
+    """
+    Una pasada de mejora por primera ganancia. Movimientos, por candidata (en orden
+    de fee descendente):
+      - insertar si entra y no choca con nadie;
+      - 1 por 1: sacar la única transacción con la que choca (o, si no choca, la de
+        menor fee que libere el gas necesario) si la candidata vale más;
+      - 1 por 2: sacar una transacción y meter dos candidatas que sumen más fee,
+        aprovechando el gas liberado (reduce la fragmentación).
+
+    Retorna:
+        tuple: (movimientos aplicados, se agotó el tiempo)
+    """
+    movimientos = 0
+    fee, gas = estado.fee, estado.gas
+
+    for evaluadas, c in enumerate(candidatas):
+        if evaluadas % _CHEQUEO_TIEMPO == 0 and time.perf_counter() > limite:
+            return movimientos, True
+        if c in estado.incluidas:
+            continue
+
+        choques = estado.conflictos(c)
+        if not choques:
+            if gas[c] <= estado.libre():
+                estado.agregar(c)
+                movimientos += 1
+                continue
+            # Sale la de menor fee que libere lo suficiente
+            falta = gas[c] - estado.libre()
+            salientes = [b for b in estado.incluidas if gas[b] >= falta and fee[b] < fee[c]]
+            if salientes:
+                b = min(salientes, key=lambda b: fee[b])
+                estado.quitar(b)
+                estado.agregar(c)
+                movimientos += 1
+            continue
+
+        if len(choques) == 1:
+            (b,) = choques
+            if fee[c] > fee[b] and gas[c] <= estado.libre() + gas[b]:
+                estado.quitar(b)
+                estado.agregar(c)
+                movimientos += 1
+                continue
+
+    # 1 por 2: para cada transacción del bloque (de menor a mayor fee) buscar dos
+    # candidatas compatibles que entren en el gas liberado y sumen más fee
+    evaluadas = 0
+    for b in sorted(estado.incluidas, key=lambda b: fee[b]):
+        if b not in estado.incluidas:
+            continue
+        estado.quitar(b)
+        libre = estado.libre()
+        elegidas = []
+        for c in candidatas:
+            evaluadas += 1
+            if evaluadas % _CHEQUEO_TIEMPO == 0 and time.perf_counter() > limite:
+                estado.agregar(b)
+                return movimientos, True
+            if c == b or c in estado.incluidas or gas[c] > libre:
+                continue
+            if estado.conflictos(c) or any(estado.chocan(c, e) for e in elegidas):
+                continue
+            elegidas.append(c)
+            libre -= gas[c]
+            if len(elegidas) == 2:
+                break
+        if len(elegidas) == 2 and fee[elegidas[0]] + fee[elegidas[1]] > fee[b]:
+            for c in elegidas:
+                estado.agregar(c)
+            movimientos += 1
+        else:
+            estado.agregar(b)
+
+    return movimientos, False
+
+
+def mejorar_seleccion(batch, seleccion, gas_limit=30_000_000, tiempo_limite_s=0.5, regla="clasico"):
+    """
+    Búsqueda local "anytime" sobre una selección de posiciones de 'batch': aplica
+    movimientos de inserción e intercambio (ver _mejorar) que suben la fee total sin
+    pasarse de gas ni agregar conflictos según 'regla' ("clasico" o "direcciones",
+    ver _claves_conflicto), hasta que no haya mejoras o se cumpla el plazo. Los
+    conflictos que ya traía la selección se respetan, no se reparan.
+
+    Retorna:
+        tuple: (posiciones en orden ascendente, movimientos aplicados)
+    """
+    limite = time.perf_counter() + tiempo_limite_s
+    estado = _EstadoBloque(batch, seleccion, gas_limit, regla)
+
+    fee = np.asarray(estado.fee)
+    utiles = np.flatnonzero((batch.gas <= gas_limit) & (fee > 0))
+    candidatas = utiles[np.argsort(-fee[utiles], kind="stable")].tolist()
+
+    movimientos = 0
+    while True:
+        hechos, agotado = _mejorar(estado, candidatas, limite)
+        movimientos += hechos
+        if agotado or hechos == 0:
+            break
+    return sorted(estado.incluidas), movimientos
+
+
+def mejorar_bloque(txs, resumen, bloque_df, T_simulado, gas_limit=30_000_000, tiempo_limite_s=0.5,
+                   regla="clasico"):
+    """
+    Post-procesa el resultado de cualquier construir_bloque: ubica las filas de
+    'bloque_df' en las candidatas por hash, corre mejorar_seleccion con la regla de
+    conflicto del constructor y recalcula el resumen (gas, utilidad, fragmentación,
+    lead time y tiempo total). La utilidad heurística de los extendidos se descarta:
+    mide el bloque original, no el mejorado.
+
+    Parámetros:
+        txs (pd.DataFrame | TxBatch): Las mismas candidatas que recibió el constructor.
+        resumen (dict), bloque_df (pd.DataFrame): Lo que devolvió el constructor.
+        T_simulado (int): Timestamp simulado de inclusión del bloque.
+        gas_limit (int): Límite de gas del bloque.
+        tiempo_limite_s (float): Plazo de la búsqueda local.
+        regla (str): Regla de conflicto del constructor (registro_builders.regla_conflicto).
+
+    Retorna:
+        tuple: (resumen actualizado, bloque_df mejorado)
+    """
+    inicio = time.perf_counter()
+    batch = txs if isinstance(txs, TxBatch) else TxBatch.desde_df(txs)
+
+    posicion = {}
+    for p, h in enumerate(batch.hash.tolist()):
+        posicion.setdefault(h, p)
+    hashes = bloque_df["hash"].tolist() if "hash" in bloque_df.columns else []
+    seleccion = [posicion[h] for h in hashes if h in posicion]
+
+    seleccion, movimientos = mejorar_seleccion(batch, seleccion, gas_limit, tiempo_limite_s, regla)
+
+    bloque_df = batch.a_dataframe(seleccion)
+    timestamps = batch.timestamp_ms[seleccion]
+    if timestamps.dtype.kind == "f":
+        timestamps = np.where(np.isnan(timestamps), T_simulado, timestamps)
+    bloque_df["lead_time_ms"] = T_simulado - timestamps
+
+    utilidad_antes = resumen.get("utilidad_total", resumen.get("utilidad_total_real", 0))
+    utilidad = batch.suma("fee", seleccion)
+    gas_usado = batch.suma("gas", seleccion)
+
+    resumen = dict(resumen)
+    resumen.update({
+        "tx_incluidas": len(bloque_df),
+        "gas_usado": gas_usado,
+        "fragmentacion": max(gas_limit - gas_usado, 0),
+        "lead_time_promedio_s": 0.0 if bloque_df.empty else round(float(bloque_df["lead_time_ms"].mean()) / 1000, 3),
+        "tiempo_ejecucion_s": round(resumen.get("tiempo_ejecucion_s", 0) + time.perf_counter() - inicio, 4),
+        "movimientos_busqueda_local": movimientos,
+        "mejora_busqueda_local": utilidad - utilidad_antes,
+    })
+    resumen.pop("utilidad_total_heuristica", None)
+    for clave in ("utilidad_total", "utilidad_total_real"):
+        if clave in resumen:
+            resumen[clave] = utilidad
+
+    return resumen, bloque_df
+
+
+def construir_mejorado(nombre, txs, T_simulado, gas_limit=30_000_000, tiempo_limite_s=0.5, **params):
+    """
+    Corre el constructor registrado 'nombre' y mejora su bloque con búsqueda local
+    durante 'tiempo_limite_s', respetando la regla de conflicto con la que se
+    registró. Mismo contrato que registro_builders.construir.
+    """
+    with fase("cargar_batch"):
+        batch = txs if isinstance(txs, TxBatch) else TxBatch.desde_df(txs)
+    resumen, bloque_df = construir(nombre, batch, T_simulado, gas_limit=gas_limit, **params)
+    with fase("busqueda_local"):
+        return mejorar_bloque(batch, resumen, bloque_df, T_simulado, gas_limit, tiempo_limite_s,
+                              regla_conflicto(nombre))
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils import cargar_dataset, COLUMNAS_DATASET
+
+HERE = Path(__file__).resolve().parent
+CACHE_DIR = HERE / ".cache_datasets"
+
+
+def _directorio_cache(path, nrows, columnas, cache_dir):
+    clave = f"{Path(path).resolve()}|{nrows}|{','.join(columnas)}"
+    return Path(cache_dir) / hashlib.sha1(clave.encode("utf-8")).hexdigest()[:16]
+
+
+def _firma(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _guardar(df, destino, firma):
+    """Escribe cada columna como .npy en un directorio temporal y lo renombra al final."""
+    tmp = destino.with_name(destino.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    columnas = {}
+    dtypes = {}
+    for c in df.columns:
+        serie = df[c]
+        if isinstance(serie.dtype, pd.Int64Dtype):
+            np.save(tmp / f"{c}.npy", serie.fillna(0).to_numpy(dtype=np.int64))
+            np.save(tmp / f"{c}.nulos.npy", serie.isna().to_numpy())
+            columnas[c] = "int_nullable"
+        elif serie.dtype.kind in "iuf":
+            np.save(tmp / f"{c}.npy", serie.to_numpy())
+            columnas[c] = "numerica"
+        elif serie.dtype == object and serie.map(lambda v: isinstance(v, int)).all():
+            # Enteros que no caben en int64 (p.ej. 'value'): texto decimal
+            np.save(tmp / f"{c}.npy", serie.astype(str).to_numpy(dtype=str))
+            columnas[c] = "int_grande"
+        else:
+            dtypes[c] = str(serie.dtype)
+            codigos, categorias = pd.factorize(serie, use_na_sentinel=True)
+            if len(categorias) == len(serie):
+                # Todos distintos y sin faltantes (p.ej. 'hash'): la tabla no ahorra nada
+                np.save(tmp / f"{c}.npy", serie.to_numpy(dtype=str))
+                columnas[c] = "cadena"
+            else:
+                # Texto: códigos int32 (mmap) + tabla de valores distintos
+                np.save(tmp / f"{c}.npy", codigos.astype(np.int32))
+                np.save(tmp / f"{c}.categorias.npy", np.asarray(categorias, dtype=str))
+                columnas[c] = "texto"
+
+    meta = {"firma": firma, "filas": len(df), "columnas": columnas, "dtypes": dtypes}
+    with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    shutil.rmtree(destino, ignore_errors=True)
+    tmp.rename(destino)
+
+
+def _leer(destino, meta):
+    # El texto vuelve con el dtype que tenía al leer el CSV, no como Categorical, así
+    # un acierto de la caché devuelve el mismo DataFrame que una lectura sin caché
+    dtypes = meta.get("dtypes", {})
+    datos = {}
+    for c, tipo in meta["columnas"].items():
+        valores = np.load(destino / f"{c}.npy", mmap_mode="r")
+        if tipo == "numerica":
+            datos[c] = pd.Series(valores, copy=False)
+        elif tipo == "int_nullable":
+            nulos = np.load(destino / f"{c}.nulos.npy", mmap_mode="r")
+            datos[c] = pd.Series(pd.arrays.IntegerArray(np.asarray(valores), np.asarray(nulos)))
+        elif tipo == "int_grande":
+            datos[c] = pd.Series([int(v) for v in valores], dtype=object)
+        elif tipo == "cadena":
+            datos[c] = pd.Series(valores.astype(object), dtype=dtypes.get(c, object))
+        else:
+            # El código -1 (faltante) toma el NaN agregado al final de la tabla
+            categorias = np.append(np.load(destino / f"{c}.categorias.npy").astype(object), np.nan)
+            datos[c] = pd.Series(categorias[np.asarray(valores)], dtype=dtypes.get(c, object))
+    return pd.DataFrame(datos)
+
+
+def cargar_dataset_cacheado(path, nrows=1000, columnas=None, cache_dir=CACHE_DIR):
+    """
+    Igual que utils.cargar_dataset, pero la primera lectura convierte el CSV a un
+    directorio de columnas .npy y las siguientes lo abren con memory-map.
+
+    La caché se invalida sola si cambia el tamaño o el mtime del CSV. Las columnas
+    numéricas se mapean sin copiar; las de texto se guardan como códigos int32 más
+    la tabla de valores distintos (o como cadenas, si son todas distintas) y se
+    devuelven con su dtype original.
+
+    Parámetros:
+        path (str): Ruta al archivo .csv de mempool.
+        nrows (int): Número de filas a cargar (default: 1000).
+        columnas (list[str]): Columnas a cargar (default: COLUMNAS_DATASET).
+        cache_dir (str | Path): Directorio de la caché (default: .cache_datasets/).
+
+    Retorna:
+        pd.DataFrame
+    """
+    columnas = columnas or COLUMNAS_DATASET
+    destino = _directorio_cache(path, nrows, columnas, cache_dir)
+    firma = _firma(path)
+
+    meta_path = destino / "meta.json"
+    if meta_path.exists():
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("firma") == firma:
+            return _leer(destino, meta)
+
+    df = cargar_dataset(path, nrows=nrows, columnas=columnas)
+    _guardar(df, destino, firma)
+    return df
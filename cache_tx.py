@@ -0,0 +1,98 @@
+import json
+import sqlite3
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+CACHE_PATH = HERE / ".cache_tx.sqlite3"
+
+# SQLite limita la cantidad de parámetros por consulta
+_LOTE_CONSULTA = 900
+
+
+def _clave(tx_hash):
+    tx_hash = str(tx_hash).lower()
+    return tx_hash if tx_hash.startswith("0x") else "0x" + tx_hash
+
+
+class CacheTx:
+    """
+    Caché persistente de transacciones JSON-RPC (eth_getTransactionByHash) por hash.
+
+    Las mismas tx pendientes aparecen en snapshots consecutivos; los preparadores
+    (prepare_data_r2/format_pending_to_dataset.py y release3/prepare_data_r3.py)
+    consultan acá antes de pedir por RPC y guardan lo que resuelven. Es un archivo
+    SQLite (hash -> JSON de la tx) compartido por ambos; solo se guardan las tx
+    resueltas, así un hash desconocido se vuelve a pedir en la próxima corrida.
+
+    Uso:
+        with CacheTx() as cache:
+            encontradas = cache.obtener(hashes)
+            ...
+            cache.guardar(nuevas)
+            meta.update(cache.estadisticas())
+
+    Parámetros:
+        path (str | Path): Archivo SQLite (default: .cache_tx.sqlite3 en la raíz).
+    """
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._con = sqlite3.connect(self.path)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("CREATE TABLE IF NOT EXISTS tx (hash TEXT PRIMARY KEY, datos TEXT NOT NULL)")
+        self.hits = 0
+        self.misses = 0
+        self.guardadas = 0
+
+    def obtener(self, hashes):
+        """
+        Busca los hashes en la caché.
+
+        Retorna:
+            dict: {hash (tal como vino): tx} de los encontrados.
+        """
+        claves = {}
+        for h in hashes:
+            claves.setdefault(_clave(h), h)
+        lista = list(claves)
+
+        encontradas = {}
+        for i in range(0, len(lista), _LOTE_CONSULTA):
+            lote = lista[i:i + _LOTE_CONSULTA]
+            filas = self._con.execute(
+                f"SELECT hash, datos FROM tx WHERE hash IN ({','.join('?' * len(lote))})", lote
+            )
+            for clave, datos in filas:
+                encontradas[claves[clave]] = json.loads(datos)
+
+        self.hits += len(encontradas)
+        self.misses += len(lista) - len(encontradas)
+        return encontradas
+
+    def guardar(self, txs):
+        """Guarda (o reemplaza) las tx resueltas; se ignoran las vacías o sin hash."""
+        filas = [(_clave(tx["hash"]), json.dumps(tx)) for tx in txs if tx and tx.get("hash")]
+        with self._con:
+            self._con.executemany("INSERT OR REPLACE INTO tx (hash, datos) VALUES (?, ?)", filas)
+        self.guardadas += len(filas)
+
+    def estadisticas(self):
+        """Contadores de la sesión, para volcar en meta.json."""
+        consultas = self.hits + self.misses
+        return {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_hit_rate": round(self.hits / consultas, 4) if consultas else 0.0,
+            "cache_guardadas": self.guardadas,
+        }
+
+    def close(self):
+        self._con.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
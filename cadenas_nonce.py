@@ -0,0 +1,80 @@
+import numpy as np
+
+
+class CadenasNonce:
+    """
+    Cadenas de nonce contiguas por remitente, con gas y fee acumulados por prefijo.
+
+    Por cada remitente se toman sus transacciones desde el menor nonce presente
+    mientras los nonces sean consecutivos (lo que sigue a un hueco no se puede
+    ejecutar hasta que aparezca la transacción faltante). Si hay varias con el mismo
+    (from, nonce) queda la de mayor fee, como haría un reemplazo en la mempool. Las
+    transacciones sin remitente o sin nonce conocido forman cadenas de largo 1.
+
+    El prefijo de largo k de una cadena es un ítem de empaquetado: incluirlo mete
+    las primeras k transacciones en orden, con gas_acum / fee_acum ya calculados.
+
+    Atributos (arrays alineados, un elemento por transacción encadenada):
+        orden: Posición en el TxBatch, agrupadas por cadena y en orden de nonce.
+        cadena: Id de cadena de cada elemento.
+        gas_acum, fee_acum: Gas y fee del prefijo que termina en ese elemento.
+        inicio: Offset en 'orden' donde empieza cada cadena.
+    """
+
+    __slots__ = ("orden", "cadena", "gas_acum", "fee_acum", "inicio")
+
+    def __init__(self, batch):
+        from_id, nonce = batch.from_id, batch.nonce
+        fee = batch.fee
+        if fee.dtype.kind == "f":
+            fee = np.nan_to_num(fee, nan=0.0)
+
+        con_nonce = np.flatnonzero((from_id >= 0) & (nonce >= 0))
+        sueltas = np.flatnonzero((from_id < 0) | (nonce < 0))
+
+        # Ordenar por remitente, nonce y fee descendente; quedarse con la primera de cada (from, nonce)
+        orden_fee = np.argsort(-fee[con_nonce], kind="stable")
+        cand = con_nonce[orden_fee]
+        cand = cand[np.lexsort((nonce[cand], from_id[cand]))]
+        repetida = np.zeros(len(cand), dtype=bool)
+        repetida[1:] = (from_id[cand][1:] == from_id[cand][:-1]) & (nonce[cand][1:] == nonce[cand][:-1])
+        cand = cand[~repetida]
+
+        # Un nuevo remitente empieza cadena; dentro del remitente, el primer hueco la corta
+        f, nn = from_id[cand], nonce[cand]
+        nuevo_remitente = np.ones(len(cand), dtype=bool)
+        nuevo_remitente[1:] = f[1:] != f[:-1]
+        hueco = np.zeros(len(cand), dtype=bool)
+        hueco[1:] = ~nuevo_remitente[1:] & (nn[1:] != nn[:-1] + 1)
+        id_remitente = np.cumsum(nuevo_remitente) - 1
+        cortada = np.maximum.accumulate(np.where(hueco, id_remitente, -1)) == id_remitente
+        cand = cand[~cortada]
+        inicio_cand = nuevo_remitente[~cortada]
+
+        self.orden = np.concatenate([cand, sueltas]).astype(np.int64)
+        es_inicio = np.concatenate([inicio_cand, np.ones(len(sueltas), dtype=bool)])
+        self.cadena = np.cumsum(es_inicio) - 1
+        self.inicio = np.flatnonzero(es_inicio)
+
+        # Acumulados por cadena: suma global menos lo acumulado antes del inicio de la cadena
+        for nombre, valores in (("gas_acum", batch.gas), ("fee_acum", fee)):
+            v = valores[self.orden]
+            total = np.cumsum(v)
+            antes = (total - v)[self.inicio]
+            setattr(self, nombre, total - antes[self.cadena])
+
+    def __len__(self):
+        return len(self.inicio)
+
+    def elementos(self, c):
+        """Posiciones (en orden de nonce) de la cadena c."""
+        fin = self.inicio[c + 1] if c + 1 < len(self.inicio) else len(self.orden)
+        return self.orden[self.inicio[c]:fin]
+
+    def prefijos_por_densidad(self):
+        """
+        Índices de elementos (= prefijos) ordenados por fee_acum / gas_acum descendente.
+        """
+        gas = self.gas_acum.astype(np.float64)
+        densidad = np.divide(self.fee_acum.astype(np.float64), gas, out=np.zeros_like(gas), where=gas > 0)
+        return np.argsort(-densidad, kind="stable")
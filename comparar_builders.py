@@ -0,0 +1,124 @@
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from utils import cargar_dataset, calcular_T_simulado
+from tx_batch import TxBatch
+from registro_builders import builders_disponibles, construir
+from busqueda_local import construir_mejorado
+from registro_resultados import RegistroResultados
+from perfilado import Perfilador, exportar_traza
+
+# -------- CONFIGURACIÓN --------
+HERE = Path(__file__).resolve().parent
+DATASET_DEFAULT = HERE / "data_release_1" / "data_subset.csv"
+REPETICIONES = 20
+GAS_LIMIT = 30_000_000
+# -------------------------------
+
+
+def medir_builder(nombre, batch, T_simulado, repeticiones=REPETICIONES, gas_limit=GAS_LIMIT, busqueda_local_s=0.0,
+                  perfilador=None):
+    """
+    Corre un constructor 'repeticiones' veces sobre el mismo TxBatch y mide latencia
+    (p50/p99), throughput (tx de entrada por segundo según p50) y pico de memoria
+    (tracemalloc, en una corrida aparte para no distorsionar los tiempos).
+
+    Con 'busqueda_local_s' > 0 cada corrida incluye la mejora de busqueda_local.
+    Con un 'perfilador' se hace una corrida más dentro de él y el resumen suma sus
+    columnas t_<fase>_s.
+
+    Retorna:
+        dict: Resumen normalizado del constructor más las métricas de la medición.
+    """
+    def correr():
+        if busqueda_local_s > 0:
+            return construir_mejorado(nombre, batch, T_simulado, gas_limit=gas_limit, tiempo_limite_s=busqueda_local_s)
+        return construir(nombre, batch, T_simulado, gas_limit=gas_limit)
+
+    # Corrida de calentamiento (imports, cachés de NumPy)
+    resumen, _ = correr()
+
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        correr()
+        tiempos.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    try:
+        correr()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    if perfilador is not None:
+        with perfilador:
+            correr()
+        resumen.update(perfilador.columnas())
+
+    p50, p99 = np.percentile(tiempos, [50, 99])
+    resumen.update({
+        "repeticiones": repeticiones,
+        "p50_s": round(float(p50), 5),
+        "p99_s": round(float(p99), 5),
+        "tx_por_s": round(len(batch) / p50, 1) if p50 > 0 else float("inf"),
+        "pico_memoria_mb": round(pico / 2**20, 2),
+    })
+    return resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara constructores de bloques sobre un mismo dataset.")
+    parser.add_argument("--dataset", default=str(DATASET_DEFAULT), help="CSV de mempool")
+    parser.add_argument("--nrows", type=int, default=10**9, help="Filas a cargar del CSV")
+    parser.add_argument("--builders", nargs="*", default=None,
+                        help=f"Subconjunto a correr (default: todos). Disponibles: {', '.join(builders_disponibles())}")
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    parser.add_argument("--gas-limit", type=int, default=GAS_LIMIT)
+    parser.add_argument("--busqueda-local", type=float, default=0.0,
+                        help="Segundos de búsqueda local después de cada constructor (0 = sin mejora)")
+    parser.add_argument("--salida", default=None, help="Archivo .csv o .jsonl donde guardar los resultados")
+    parser.add_argument("--traza", default=None,
+                        help="Archivo .json donde guardar el desglose por fase (formato Chrome trace)")
+    args = parser.parse_args()
+
+    # Una sola carga: todos los constructores usan el mismo TxBatch
+    df = cargar_dataset(args.dataset, nrows=args.nrows)
+    batch = TxBatch.desde_df(df)
+    T_simulado = calcular_T_simulado(df)
+    nombres = args.builders or builders_disponibles()
+
+    print(f"Dataset: {args.dataset} ({len(batch)} tx), {args.repeticiones} repeticiones\n")
+    print(f"{'builder':<28} {'p50_s':>9} {'p99_s':>9} {'tx/s':>11} {'mem_mb':>8} {'tx_incl':>8} {'utilidad_total':>22}")
+    resultados = []
+    perfiladores = []
+    for nombre in nombres:
+        perfilador = Perfilador(nombre) if args.traza else None
+        r = medir_builder(nombre, batch, T_simulado, args.repeticiones, args.gas_limit, args.busqueda_local,
+                          perfilador)
+        if perfilador is not None:
+            perfiladores.append(perfilador)
+        r["dataset_file"] = Path(args.dataset).name
+        resultados.append(r)
+        print(f"{nombre:<28} {r['p50_s']:>9.5f} {r['p99_s']:>9.5f} {r['tx_por_s']:>11.1f} "
+              f"{r['pico_memoria_mb']:>8.2f} {r['tx_incluidas']:>8} {r['utilidad_total']:>22}")
+
+    if perfiladores:
+        exportar_traza(perfiladores, args.traza)
+        print(f"\nDesglose por fase en {args.traza}")
+        for p in perfiladores:
+            fases = ", ".join(f"{c[2:-2]}={v * 1000:.2f}ms" for c, v in p.columnas().items() if c.startswith("t_"))
+            print(f"  {p.nombre}: {fases}")
+
+    if args.salida:
+        with RegistroResultados(args.salida) as registro:
+            for r in resultados:
+                registro.registrar(r)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import heapq
+
+from tx_batch import _a_entero
+
+# Gas mínimo de una transacción: con menos gas libre no vale la pena rellenar
+GAS_MINIMO_TX = 21_000
+# Candidatas rechazadas que se revisan como máximo en cada relleno
+_MAX_REVISIONES = 256
+
+
+class ConstructorOnline:
+    """
+    Constructor incremental para un flujo de transacciones pendientes.
+
+    Mantiene el bloque armado en todo momento, así bloque() es O(k) (k = tx del
+    bloque) en lugar de reordenar la mempool. Las candidatas que no entran quedan en
+    un heap por gas_fee_cap (con borrado perezoso) y el bloque en un min-heap por la
+    misma prioridad, para saber a quién desplazar. Los conflictos siguen la regla de
+    greedy_clasico (mismo 'to', o mismo 'from' y nonce) con un índice que guarda qué
+    transacción ocupa cada clave, así se puede quitar.
+
+    Al llegar una transacción:
+      - si entra y no choca, se agrega;
+      - si choca, reemplaza a las del bloque con las que choca cuando vale más que
+        ellas juntas y entra en el gas que liberan;
+      - si no entra, desplaza a las de menor prioridad del bloque solo si vale más que
+        lo que desplaza;
+    y lo desplazado vuelve a las candidatas. Al quitar una del bloque se rellena el
+    gas liberado desde el heap de candidatas.
+
+    Parámetros:
+        gas_limit (int): Límite de gas del bloque.
+    """
+
+    def __init__(self, gas_limit=30_000_000):
+        self.gas_limit = gas_limit
+        self.txs = {}              # hash -> tx normalizada
+        self.en_bloque = {}        # hash -> None, en orden de inserción
+        self.gas_usado = 0
+        self.fee_total = 0
+        self._duenio_to = {}
+        self._duenio_fn = {}
+        self._candidatas = []      # max-heap (-gas_fee_cap, secuencia, hash)
+        self._miembros = []        # min-heap (gas_fee_cap, secuencia, hash)
+        self._secuencia = 0
+        self._vigente = {}         # hash -> secuencia de su única entrada válida en los heaps
+
+    # ---- claves de conflicto ----
+    @staticmethod
+    def _claves(tx):
+        fn = (tx["from"], tx["nonce"]) if tx["from"] and tx["nonce"] is not None else None
+        return tx["to"] or None, fn
+
+    def _conflictos(self, tx):
+        to, fn = self._claves(tx)
+        choques = set()
+        if to is not None and to in self._duenio_to:
+            choques.add(self._duenio_to[to])
+        if fn is not None and fn in self._duenio_fn:
+            choques.add(self._duenio_fn[fn])
+        return choques
+
+    # ---- altas y bajas del bloque ----
+    def _meter(self, h):
+        tx = self.txs[h]
+        to, fn = self._claves(tx)
+        if to is not None:
+            self._duenio_to[to] = h
+        if fn is not None:
+            self._duenio_fn[fn] = h
+        self.en_bloque[h] = None
+        self.gas_usado += tx["gas"]
+        self.fee_total += tx["fee"]
+        self._secuencia += 1
+        self._vigente[h] = self._secuencia
+        heapq.heappush(self._miembros, (tx["gas_fee_cap"], self._secuencia, h))
+
+    def _sacar(self, h):
+        tx = self.txs[h]
+        to, fn = self._claves(tx)
+        if to is not None and self._duenio_to.get(to) == h:
+            del self._duenio_to[to]
+        if fn is not None and self._duenio_fn.get(fn) == h:
+            del self._duenio_fn[fn]
+        del self.en_bloque[h]
+        self.gas_usado -= tx["gas"]
+        self.fee_total -= tx["fee"]
+
+    def _a_candidatas(self, h):
+        self._secuencia += 1
+        self._vigente[h] = self._secuencia
+        heapq.heappush(self._candidatas, (-self.txs[h]["gas_fee_cap"], self._secuencia, h))
+
+    def _menor_miembro(self):
+        # Limpia entradas viejas (la transacción salió del bloque o se volvió a encolar)
+        while self._miembros and self._vigente.get(self._miembros[0][2]) != self._miembros[0][1]:
+            heapq.heappop(self._miembros)
+        return self._miembros[0][2] if self._miembros else None
+
+    def _rellenar(self):
+        apartadas = []
+        revisiones = 0
+        while self._candidatas and self.gas_limit - self.gas_usado >= GAS_MINIMO_TX and revisiones < _MAX_REVISIONES:
+            item = heapq.heappop(self._candidatas)
+            h = item[2]
+            if self._vigente.get(h) != item[1]:
+                continue  # entrada vieja: eliminada, ya incluida o reencolada
+            tx = self.txs[h]
+            if tx["gas"] <= self.gas_limit - self.gas_usado and not self._conflictos(tx):
+                self._meter(h)
+            else:
+                apartadas.append(item)
+                revisiones += 1
+        for item in apartadas:
+            heapq.heappush(self._candidatas, item)
+
+    # ---- API ----
+    def agregar(self, tx):
+        """
+        Incorpora una transacción pendiente (dict con 'hash', 'from', 'to', 'gas',
+        'gas_fee_cap' y opcionalmente 'nonce'). Si el hash ya estaba no hace nada.
+
+        Retorna:
+            bool: True si la transacción quedó en el bloque.
+        """
+        h = tx["hash"]
+        if h in self.txs:
+            return h in self.en_bloque
+        gas = max(_a_entero(tx.get("gas")), 0)
+        gas_fee_cap = max(_a_entero(tx.get("gas_fee_cap")), 0)
+        nonce = tx.get("nonce")
+        tx = {
+            **tx,
+            "gas": gas,
+            "gas_fee_cap": gas_fee_cap,
+            "nonce": None if nonce is None or nonce != nonce else _a_entero(nonce),
+            "fee": gas * gas_fee_cap,
+        }
+        self.txs[h] = tx
+        if gas > self.gas_limit:
+            return False
+
+        libre = self.gas_limit - self.gas_usado
+        choques = self._conflictos(tx)
+        if choques:
+            liberado = sum(self.txs[c]["gas"] for c in choques)
+            if tx["fee"] > sum(self.txs[c]["fee"] for c in choques) and gas <= libre + liberado:
+                for c in choques:
+                    self._sacar(c)
+                    self._a_candidatas(c)
+                self._meter(h)
+                self._rellenar()
+                return True
+            self._a_candidatas(h)
+            return False
+
+        if gas <= libre:
+            self._meter(h)
+            return True
+
+        # No entra: desplazar miembros de menor prioridad si la nueva vale más que ellos
+        desplazados, liberado, fee_desplazada = [], 0, 0
+        while gas > libre + liberado:
+            m = self._menor_miembro()
+            if m is None or self.txs[m]["gas_fee_cap"] >= gas_fee_cap:
+                break
+            heapq.heappop(self._miembros)
+            desplazados.append(m)
+            liberado += self.txs[m]["gas"]
+            fee_desplazada += self.txs[m]["fee"]
+            self._sacar(m)
+
+        if gas <= libre + liberado and tx["fee"] > fee_desplazada:
+            for m in desplazados:
+                self._a_candidatas(m)
+            self._meter(h)
+            self._rellenar()
+            return True
+
+        # Deshacer: la nueva no compensa lo que habría que sacar
+        for m in desplazados:
+            self._meter(m)
+        self._a_candidatas(h)
+        return False
+
+    def eliminar(self, h):
+        """
+        Saca una transacción (minada, reemplazada o descartada de la mempool). Si
+        estaba en el bloque se rellena el gas liberado con las mejores candidatas.
+        """
+        if h not in self.txs:
+            return
+        if h in self.en_bloque:
+            self._sacar(h)
+            del self.txs[h]
+            del self._vigente[h]
+            self._rellenar()
+        else:
+            del self.txs[h]
+            self._vigente.pop(h, None)  # la entrada del heap se descarta al salir
+
+    def bloque(self):
+        """Transacciones del bloque actual, en O(k)."""
+        return [self.txs[h] for h in self.en_bloque]
+
+    def __len__(self):
+        return len(self.txs)
@@ -0,0 +1,132 @@
+import numpy as np
+
+# Tamaño de la ventana de combos que se evalúa de una vez entre aceptaciones
+_VENTANA = 1024
+
+
+class Empaquetador:
+    """
+    Estado de empaquetado de un bloque con bitsets de NumPy.
+
+    Las direcciones ('from' y 'to') de las candidatas se reindexan localmente y el
+    bloque guarda un array booleano de direcciones ocupadas y otro de posiciones
+    incluidas. Para una ventana de combos (pares o tríos en orden de prioridad) el
+    chequeo de conflicto, de transacción repetida y de gas se hace en una sola
+    operación vectorizada; solo se vuelve a Python para aceptar el primer combo
+    válido de la ventana. Equivale a recorrerlos uno por uno con sets de direcciones.
+
+    Parámetros:
+        batch (TxBatch): Candidatas; las posiciones de los combos se refieren a él.
+        gas_limit (int): Límite de gas del bloque.
+    """
+
+    __slots__ = ("direcciones", "gas", "gas_limit", "ocupadas", "incluidas", "gas_usado")
+
+    def __init__(self, batch, gas_limit):
+        n = len(batch)
+        ids = np.concatenate([batch.from_id, batch.to_id])
+        locales = np.full(len(ids), -1, dtype=np.int64)
+        validos = ids >= 0
+        unicas, locales[validos] = np.unique(ids[validos], return_inverse=True)
+        # Las direcciones vacías apuntan a una celda extra que nunca se marca
+        locales[~validos] = len(unicas)
+
+        self.direcciones = np.column_stack([locales[:n], locales[n:]])
+        self.gas = batch.gas
+        self.gas_limit = gas_limit
+        self.ocupadas = np.zeros(len(unicas) + 1, dtype=bool)
+        self.incluidas = np.zeros(n, dtype=bool)
+        self.gas_usado = 0
+
+    def empaquetar(self, combos, gas_combos=None):
+        """
+        Recorre los combos (filas de posiciones, ya ordenadas por prioridad) y acepta
+        cada uno que no comparta direcciones ni transacciones con el bloque y que
+        entre en el gas restante.
+
+        Retorna:
+            int: Cantidad de combos aceptados.
+        """
+        combos = np.asarray(combos, dtype=np.int64)
+        if combos.size == 0:
+            return 0
+        combos = combos.reshape(len(combos), -1)
+        if gas_combos is None:
+            gas_combos = self.gas[combos].sum(axis=1)
+        gas_combos = np.asarray(gas_combos)
+        direcciones = self.direcciones[combos].reshape(len(combos), -1)
+        celda_vacia = len(self.ocupadas) - 1
+
+        aceptados = 0
+        p = 0
+        while p < len(combos):
+            fin = min(p + _VENTANA, len(combos))
+            validos = (
+                (gas_combos[p:fin] <= self.gas_limit - self.gas_usado)
+                & ~self.incluidas[combos[p:fin]].any(axis=1)
+                & ~self.ocupadas[direcciones[p:fin]].any(axis=1)
+            )
+            primero = np.flatnonzero(validos)
+            if primero.size == 0:
+                p = fin
+                continue
+            q = p + int(primero[0])
+            self.ocupadas[direcciones[q]] = True
+            self.ocupadas[celda_vacia] = False
+            self.incluidas[combos[q]] = True
+            self.gas_usado += int(gas_combos[q])
+            aceptados += 1
+            p = q + 1
+
+        return aceptados
+
+    def rellenar(self, posiciones):
+        """
+        Relleno de una pasada con transacciones sueltas (ya ordenadas por densidad):
+        acepta cada una que no comparta direcciones con el bloque ni con las
+        aceptadas antes en la misma pasada y que entre en el gas restante.
+
+        Primero descarta de forma vectorizada las que ya chocan con el bloque o no
+        entran en el gas; el recorrido secuencial sobre las que quedan usa listas de
+        Python en lugar de indexar arrays elemento a elemento.
+
+        Retorna:
+            int: Cantidad de transacciones aceptadas.
+        """
+        posiciones = np.asarray(posiciones, dtype=np.int64)
+        restante = self.gas_limit - self.gas_usado
+        direcciones = self.direcciones[posiciones]
+        candidatas = (
+            ~self.incluidas[posiciones]
+            & (self.gas[posiciones] <= restante)
+            & ~self.ocupadas[direcciones].any(axis=1)
+        )
+        posiciones = posiciones[candidatas]
+        if posiciones.size == 0:
+            return 0
+
+        celda_vacia = len(self.ocupadas) - 1
+        ocupadas = set()
+        aceptadas = []
+        for pos, g, (d_from, d_to) in zip(posiciones.tolist(), self.gas[posiciones].tolist(),
+                                          self.direcciones[posiciones].tolist()):
+            if g > restante or d_from in ocupadas or d_to in ocupadas:
+                continue
+            aceptadas.append(pos)
+            restante -= g
+            ocupadas.update((d_from, d_to))
+            # Las direcciones vacías nunca generan conflicto
+            ocupadas.discard(celda_vacia)
+
+        self.ocupadas[list(ocupadas)] = True
+        self.incluidas[aceptadas] = True
+        self.gas_usado = self.gas_limit - restante
+        return len(aceptadas)
+
+    def incluidas_mask(self):
+        """Máscara booleana (largo n) de las posiciones incluidas en el bloque."""
+        return self.incluidas.copy()
+
+    def indices(self):
+        """Posiciones incluidas en el bloque, en orden ascendente."""
+        return np.flatnonzero(self.incluidas).tolist()
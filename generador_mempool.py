@@ -0,0 +1,201 @@
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "prepare_data_r2"))
+# Mismo encabezado que los pending_formatted.csv que escribe prepare_data_r2
+from format_pending_to_dataset import HEADER  # noqa: E402
+
+# Parámetros ajustados a los datasets del repo (data_release_1, prepare_data_r2 y
+# release3): ver ajustar_parametros para recalcularlos.
+PARAMETROS_DEFAULT = {
+    "tx_por_remitente": 1.13,        # tx por remitente en promedio
+    "sesgo_remitentes": 0.5,         # exponente Zipf de la actividad por remitente
+    "prob_hueco_nonce": 0.05,        # prob. de saltear un nonce dentro de la cadena
+    "prob_reemplazo": 0.02,          # prob. de repetir el nonce anterior (tx de reemplazo)
+    "frac_destinos_populares": 0.6,  # tx que van a un puñado de contratos populares
+    "n_destinos_populares": 50,
+    "sesgo_destinos": 1.6,           # exponente Zipf entre los contratos populares
+    "destinos_por_tx": 0.36,         # destinos distintos del resto, por tx
+    "prob_transferencia": 0.24,      # tx con gas 21000 y sin datos
+    "gas_mediana": 58_000,           # lognormal del gas del resto
+    "gas_sigma": 1.4,
+    "fee_cap_mediana": 4.8e8,        # lognormal de gas_fee_cap (wei)
+    "fee_cap_sigma": 2.6,
+    "tip_fraccion_media": 0.2,       # gas_tip_cap / gas_fee_cap (beta con esta media)
+    "prob_value": 0.39,              # tx con value > 0
+    "tipos": {"0x2": 0.51, "0x0": 0.48, "0x3": 0.006, "0x1": 0.003, "0x4": 0.001},
+    "duracion_ms": 12_000,           # ventana de arribos
+}
+
+HERE = Path(__file__).resolve().parent
+# CSVs reales de los que sale PARAMETROS_DEFAULT (y que usa --ajustar sin argumentos)
+DATASETS_REALES = [
+    HERE / "data_release_1" / "data_subset.csv",
+    *sorted((HERE / "prepare_data_r2" / "datasets").glob("*/pending_formatted.csv")),
+    *sorted((HERE / "release3" / "datasets").glob("*.csv")),
+]
+
+_GAS_MAX = 30_000_000
+_TS_BASE = 1_762_000_000_000
+
+
+def _zipf(rng, n_items, sesgo, tamano):
+    """Índices en [0, n_items) con probabilidad proporcional a 1 / (rango + 1)^sesgo."""
+    pesos = 1.0 / np.arange(1, n_items + 1) ** sesgo
+    return rng.choice(n_items, size=tamano, p=pesos / pesos.sum())
+
+
+def _direcciones(prefijo, ids):
+    return [f"0x{prefijo}{i:039x}" for i in ids.tolist()]
+
+
+def generar_mempool(n, semilla=42, **parametros):
+    """
+    Genera un mempool sintético de 'n' transacciones pendientes con las columnas de
+    HEADER (mismo formato que los pending_formatted.csv de prepare_data_r2).
+
+    El modelo: remitentes con actividad Zipf y cadenas de nonce consecutivos (con
+    huecos y reemplazos ocasionales), una fracción de las tx concentrada en pocos
+    contratos populares, gas como mezcla de transferencias de 21000 y una lognormal,
+    y gas_fee_cap lognormal. Mismo 'semilla' y parámetros -> mismo DataFrame.
+
+    Parámetros:
+        n (int): Cantidad de transacciones.
+        semilla (int): Semilla del generador.
+        **parametros: Reemplazan valores de PARAMETROS_DEFAULT.
+
+    Retorna:
+        pd.DataFrame
+    """
+    p = {**PARAMETROS_DEFAULT, **parametros}
+    rng = np.random.default_rng(semilla)
+
+    # --- Remitentes y cadenas de nonce ---
+    n_remitentes = max(int(n / p["tx_por_remitente"]), 1)
+    remitente = np.sort(_zipf(rng, n_remitentes, p["sesgo_remitentes"], n))
+    nueva_cadena = np.r_[True, remitente[1:] != remitente[:-1]]
+    inicio_cadena = np.flatnonzero(nueva_cadena)
+    inicio_por_tx = np.repeat(inicio_cadena, np.diff(np.r_[inicio_cadena, n]))
+    # Paso entre nonces consecutivos: 1, 2 si hay hueco, 0 si es un reemplazo
+    paso = 1 + (rng.random(n) < p["prob_hueco_nonce"]) - (rng.random(n) < p["prob_reemplazo"])
+    paso[nueva_cadena] = 0
+    acumulado = np.cumsum(paso)
+    base = rng.integers(0, 5_000, n_remitentes)
+    nonce = base[remitente] + acumulado - acumulado[inicio_por_tx]
+
+    # --- Destinos ---
+    populares = rng.random(n) < p["frac_destinos_populares"]
+    destino = rng.integers(p["n_destinos_populares"], p["n_destinos_populares"] + max(int(n * p["destinos_por_tx"]), 1), n)
+    destino[populares] = _zipf(rng, p["n_destinos_populares"], p["sesgo_destinos"], int(populares.sum()))
+
+    # --- Gas y tarifas ---
+    transferencia = rng.random(n) < p["prob_transferencia"]
+    gas = np.clip(rng.lognormal(np.log(p["gas_mediana"]), p["gas_sigma"], n), 21_000, _GAS_MAX).astype(np.int64)
+    gas[transferencia] = 21_000
+    gas_fee_cap = rng.lognormal(np.log(p["fee_cap_mediana"]), p["fee_cap_sigma"], n).astype(np.int64) + 1
+    media = p["tip_fraccion_media"]
+    gas_tip_cap = (gas_fee_cap * rng.beta(2 * media / (1 - media), 2, n)).astype(np.int64)
+    tipos = list(p["tipos"])
+    tx_type = np.array(tipos)[rng.choice(len(tipos), n, p=np.array(list(p["tipos"].values())) / sum(p["tipos"].values()))]
+    legacy = (tx_type == "0x0") | (tx_type == "0x1")
+    gas_price = np.where(legacy, gas_fee_cap, gas_fee_cap - (gas_fee_cap - gas_tip_cap) // 2)
+    gas_tip_cap[legacy] = 0
+
+    # --- Datos y value ---
+    data_size = np.where(transferencia, 0, 4 + 32 * rng.geometric(0.4, n))
+    selector = rng.integers(0, 2**32, n)
+    data_4bytes = np.where(transferencia, "", [f"0x{s:08x}" for s in selector.tolist()])
+    value = np.where(rng.random(n) < p["prob_value"], np.minimum(rng.lognormal(np.log(1e17), 2.0, n), 1e19), 0)
+    value = value.astype(np.uint64)
+
+    timestamp_ms = _TS_BASE + np.sort(rng.integers(0, p["duracion_ms"], n))
+    orden = rng.permutation(n)   # las cadenas no llegan agrupadas por remitente
+
+    df = pd.DataFrame({
+        "timestamp_ms": timestamp_ms,
+        "hash": [f"0x{h:064x}" for h in rng.integers(0, 2**63, n).tolist()],
+        "chain_id": 1,
+        "from": np.array(_direcciones("f", remitente), dtype=object)[orden],
+        "to": np.array(_direcciones("d", destino), dtype=object)[orden],
+        "value": value[orden],
+        "nonce": nonce[orden],
+        "gas": gas[orden],
+        "gas_price": gas_price[orden],
+        "gas_tip_cap": gas_tip_cap[orden],
+        "gas_fee_cap": gas_fee_cap[orden],
+        "data_size": data_size[orden],
+        "data_4bytes": data_4bytes[orden],
+        "sources": "sintetico",
+        "included_at_block_height": 0,
+        "included_block_timestamp_ms": 0,
+        "inclusion_delay_ms": 0,
+        "tx_type": tx_type[orden],
+    })
+    return df[HEADER]
+
+
+def ajustar_parametros(paths):
+    """
+    Estima los parámetros del generador desde CSVs de mempool reales (formato de
+    HEADER). Solo se ajusta lo que los datos permiten; el resto queda en el default.
+
+    Retorna:
+        dict: Parámetros para generar_mempool.
+    """
+    df = pd.concat([pd.read_csv(path, low_memory=False) for path in paths], ignore_index=True)
+    gas = pd.to_numeric(df["gas"], errors="coerce").dropna()
+    cap = pd.to_numeric(df["gas_fee_cap"], errors="coerce")
+    cap = cap.where(cap > 0, pd.to_numeric(df.get("gas_price"), errors="coerce")).dropna()
+    cap = cap[cap > 0]
+    tip = pd.to_numeric(df.get("gas_tip_cap"), errors="coerce")
+    destinos = df["to"].value_counts()
+
+    p = dict(PARAMETROS_DEFAULT)
+    p["tx_por_remitente"] = round(len(df) / max(df["from"].nunique(), 1), 3)
+    p["prob_transferencia"] = round(float((gas == 21_000).mean()), 3)
+    resto = np.log(gas[gas > 21_000])
+    if len(resto) > 1:
+        p["gas_mediana"] = int(np.exp(resto.median()))
+        p["gas_sigma"] = round(float(resto.std()), 3)
+    if len(cap) > 1:
+        p["fee_cap_mediana"] = float(np.exp(np.log(cap).median()))
+        p["fee_cap_sigma"] = round(float(np.log(cap).std()), 3)
+    fraccion = (tip / cap).dropna()
+    fraccion = fraccion[(fraccion > 0) & (fraccion < 1)]
+    if len(fraccion):
+        p["tip_fraccion_media"] = round(float(fraccion.mean()), 3)
+    p["frac_destinos_populares"] = round(float(destinos.iloc[:p["n_destinos_populares"]].sum() / len(df)), 3)
+    p["destinos_por_tx"] = round(max(len(destinos) - p["n_destinos_populares"], 1) / len(df), 3)
+    p["prob_value"] = round(float((pd.to_numeric(df["value"], errors="coerce") > 0).mean()), 3)
+    # tx_type viene como "0x2" (prepare_data_r2) o como entero (release3)
+    tipos = df["tx_type"].dropna().map(lambda t: t if isinstance(t, str) and t.startswith("0x") else hex(int(float(t))))
+    if len(tipos):
+        p["tipos"] = {t: round(float(f), 4) for t, f in tipos.value_counts(normalize=True).items()}
+    return p
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera un mempool sintético con el formato de pending_formatted.csv.")
+    parser.add_argument("n", type=int, help="Cantidad de transacciones")
+    parser.add_argument("--salida", default=None, help="CSV de salida (default: mempool_sintetico_<n>.csv)")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--ajustar", nargs="*", default=None,
+                        help="Estima los parámetros desde estos CSVs reales (sin argumentos: DATASETS_REALES)")
+    args = parser.parse_args()
+
+    parametros = {}
+    if args.ajustar is not None:
+        parametros = ajustar_parametros(args.ajustar or [p for p in DATASETS_REALES if p.exists()])
+        print(f"Parámetros ajustados: {parametros}")
+    df = generar_mempool(args.n, semilla=args.semilla, **parametros)
+    salida = Path(args.salida or f"mempool_sintetico_{args.n}.csv")
+    df.to_csv(salida, index=False)
+    print(f"{len(df)} tx -> {salida}")
+
+
+if __name__ == "__main__":
+    main()
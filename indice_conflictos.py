@@ -0,0 +1,25 @@
+class IndiceConflictos:
+    """
+    Índice de conflictos de un bloque en construcción.
+
+    Mantiene conjuntos hash con los ids de 'to' y los pares (id de 'from', nonce)
+    de las transacciones aceptadas (ver TxBatch), así cada verificación es O(1) en
+    lugar de recorrer todo el bloque. Reproduce la regla de greedy_clasico: hay
+    conflicto si coincide el destino, o si coinciden remitente y nonce. Los ids
+    -1 (dirección vacía) y los nonce -1 (desconocido) nunca coinciden.
+    """
+
+    def __init__(self):
+        self.destinos = set()
+        self.remitente_nonce = set()
+
+    def conflicta(self, to_id, from_id, nonce):
+        if to_id >= 0 and to_id in self.destinos:
+            return True
+        return from_id >= 0 and nonce >= 0 and (from_id, nonce) in self.remitente_nonce
+
+    def agregar(self, to_id, from_id, nonce):
+        if to_id >= 0:
+            self.destinos.add(to_id)
+        if from_id >= 0 and nonce >= 0:
+            self.remitente_nonce.add((from_id, nonce))
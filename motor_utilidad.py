@@ -0,0 +1,293 @@
+import heapq
+import math
+
+import numpy as np
+import pandas as pd
+
+from utils import PENALIZACIONES_DEFAULT, BONIFICACIONES_DEFAULT
+from tx_batch import TxBatch
+
+_MASCARA_62 = 2**62 - 1
+
+
+def _mejores_pares(bloques, k):
+    """Une bloques (i, j, utilidad, gas) y deja los k mejores por (-utilidad, i, j)."""
+    i, j, u, g = (np.concatenate(c) for c in zip(*bloques))
+    if u.dtype == object:
+        # Enteros de Python (tarifas que no caben en int64): se ordena por la parte alta
+        # y la baja de 62 bits, que sí caben y dan el mismo orden
+        mejores = np.lexsort((j, i, -(u & _MASCARA_62).astype(np.int64), -(u >> 62).astype(np.int64)))[:k]
+    else:
+        mejores = np.lexsort((j, i, -u))[:k]
+    return i[mejores], j[mejores], u[mejores], g[mejores]
+
+
+class MotorUtilidad:
+    """
+    Versión vectorizada de utils.calcular_utilidad sobre un conjunto fijo de transacciones.
+
+    Trabaja sobre los arrays de un TxBatch (ids internados de 'from'/'to', nonce, gas
+    y fee) y calcula la utilidad de muchos pares (o la matriz triangular superior
+    completa) con operaciones de NumPy. Para un par (i, j) con i < j devuelve el mismo
+    valor que calcular_utilidad(txs[i], txs[j]).
+
+    Parámetros:
+        txs (TxBatch | pd.DataFrame | list[dict]): Transacciones con 'from', 'to', 'gas',
+            'gas_fee_cap' y opcionalmente 'nonce'.
+        gas_limit (int): Límite de gas usado para la penalización 'gas_alto'.
+        penalties (dict), bonuses (dict): Igual que en calcular_utilidad.
+    """
+
+    def __init__(self, txs, gas_limit=30_000_000, penalties=None, bonuses=None):
+        if not isinstance(txs, TxBatch):
+            if not isinstance(txs, pd.DataFrame):
+                txs = pd.DataFrame(list(txs))
+            txs = TxBatch.desde_df(txs)
+        self.n = len(txs)
+        self.gas_limit = gas_limit
+        self.penalties = penalties or PENALIZACIONES_DEFAULT
+        self.bonuses = bonuses or BONIFICACIONES_DEFAULT
+
+        self.gas = txs.gas
+        self.tarifa = txs.fee
+        self.from_id = txs.from_id
+        self.to_id = txs.to_id
+        # nonce -1 = desconocido (nunca coincide); sin columna todas valen 0 (None == None)
+        self.nonce = txs.nonce
+
+        self._matriz = None
+
+    def _utilidad(self, i, j):
+        mismo_from = (self.from_id[i] == self.from_id[j]) & (self.from_id[i] >= 0)
+        mismo_to = (self.to_id[i] == self.to_id[j]) & (self.to_id[i] >= 0)
+
+        nonce_conocido = self.nonce[i] >= 0
+        conflicto_nonce = mismo_from & nonce_conocido & (self.nonce[i] == self.nonce[j])
+        orden_valido = mismo_from & nonce_conocido & (self.nonce[i] + 1 == self.nonce[j])
+
+        gas_excesivo = (self.gas[i] + self.gas[j]) > self.gas_limit
+
+        penalizacion = (
+            (conflicto_nonce | mismo_to) * self.penalties["conflicto"]
+            + gas_excesivo * self.penalties["gas_alto"]
+        )
+        bonificacion = (
+            mismo_to * self.bonuses["contrato_comun"]
+            + orden_valido * self.bonuses["orden_correcto"]
+        )
+        return self.tarifa[i] + self.tarifa[j] + (bonificacion - penalizacion)
+
+    def utilidad_pares(self, i, j):
+        """Utilidad de los pares (i[k], j[k]) para arrays de índices con i < j."""
+        return self._utilidad(np.asarray(i), np.asarray(j))
+
+    def gas_pares(self, i, j):
+        """Gas conjunto de los pares (i[k], j[k])."""
+        return self.gas[np.asarray(i)] + self.gas[np.asarray(j)]
+
+    def matriz(self):
+        """
+        Matriz n x n de utilidades. Solo la parte triangular superior (i < j)
+        corresponde a calcular_utilidad; se calcula una vez y se reutiliza.
+        """
+        if self._matriz is None:
+            idx = np.arange(self.n)
+            self._matriz = self._utilidad(idx[:, None], idx[None, :])
+        return self._matriz
+
+    def utilidad_trios(self, i, j, k):
+        """
+        Suma de las utilidades de los tres pares de cada trío (i < j < k).
+        Los algoritmos extendidos usan esta suma dividida por 3.
+        """
+        u = self.matriz()
+        i, j, k = np.asarray(i), np.asarray(j), np.asarray(k)
+        return u[i, j] + u[i, k] + u[j, k]
+
+    def _ajuste_maximo(self):
+        """Cota superior de (bonificación - penalización) para cualquier par."""
+        cc, oc = self.bonuses["contrato_comun"], self.bonuses["orden_correcto"]
+        conf, alto = self.penalties["conflicto"], self.penalties["gas_alto"]
+        return max(0, cc, oc, cc + oc) + max(0, -conf, -alto, -conf - alto)
+
+    def _ajustes_escalares(self):
+        """Devuelve ajuste(i, j) = utilidad - tarifa_i - tarifa_j en Python puro (i < j)."""
+        from_id = self.from_id.tolist()
+        to_id = self.to_id.tolist()
+        gas = self.gas.tolist()
+        nonce = self.nonce.tolist()
+        conf, alto = self.penalties["conflicto"], self.penalties["gas_alto"]
+        cc, oc = self.bonuses["contrato_comun"], self.bonuses["orden_correcto"]
+        gas_limit = self.gas_limit
+
+        def ajuste(i, j):
+            mismo_from = from_id[i] == from_id[j] and from_id[i] >= 0
+            mismo_to = to_id[i] == to_id[j] and to_id[i] >= 0
+            conflicto_nonce = mismo_from and nonce[i] >= 0 and nonce[i] == nonce[j]
+            orden_valido = mismo_from and nonce[i] >= 0 and nonce[i] + 1 == nonce[j]
+            valor = 0
+            if conflicto_nonce or mismo_to:
+                valor -= conf
+            if gas[i] + gas[j] > gas_limit:
+                valor -= alto
+            if mismo_to:
+                valor += cc
+            if orden_valido:
+                valor += oc
+            return valor
+
+        return ajuste
+
+    def pares_top(self, k=None, candidatas=None):
+        """
+        Genera los k pares factibles (gas <= gas_limit) de mayor utilidad sin armar la
+        matriz de todos los pares.
+
+        Las candidatas se recorren en orden decreciente de tarifa y cada una se combina
+        solo con las de menor tarifa, así que la cota de un par es 2 * tarifa_i más el
+        ajuste máximo y el recorrido se corta cuando ya no supera al k-ésimo mejor. Para
+        cada i los socios que todavía pueden superarlo son un prefijo de las restantes
+        (bisect sobre las tarifas); con el gas ordenado y sus máximos de tarifa
+        acumulados se descarta en O(log n) una i cuyo mejor socio que entra en el gas
+        no alcanza, y entre los socios solo se evalúan los que entran.
+
+        Parámetros:
+            k (int): Cantidad de pares (None = todos los factibles).
+            candidatas (array): Posiciones entre las que formar pares (default: todas).
+
+        Retorna:
+            tuple: Arrays (i, j, utilidad, gas) con i < j, ordenados por utilidad
+                descendente y, a igual utilidad, por (i, j) como en combinations().
+        """
+        pos = np.arange(self.n) if candidatas is None else np.unique(np.asarray(candidatas, dtype=np.int64))
+        vacio = np.zeros(0, dtype=np.int64)
+        m = len(pos)
+        if k is None:
+            k = m * (m - 1) // 2
+        if k <= 0 or m < 2:
+            return vacio, vacio, self.tarifa[vacio], self.gas[vacio]
+
+        if k >= m * (m - 1) // 2:
+            # Se piden todos: alcanza con filtrar por gas la triangular superior
+            i, j = np.triu_indices(m, k=1)
+            i, j = pos[i], pos[j]
+            gas_pares = self.gas_pares(i, j)
+            factibles = gas_pares <= self.gas_limit
+            i, j = i[factibles], j[factibles]
+            return _mejores_pares([(i, j, self._utilidad(i, j), gas_pares[factibles])], k)
+
+        orden = pos[np.argsort(-self.tarifa[pos], kind="stable")]
+        tarifa, gas = self.tarifa[orden], self.gas[orden]
+        negativa = -tarifa   # ascendente, para searchsorted
+        por_gas = np.argsort(gas, kind="stable")
+        gas_ordenado = gas[por_gas]
+        maximo_tarifa = np.maximum.accumulate(tarifa[por_gas])   # mejor tarifa con gas <= gas_ordenado[h]
+        ajuste = self._ajuste_maximo()
+
+        bloques = []
+        acumulados = 0
+        umbral = None   # utilidad del k-ésimo mejor par hallado
+        for a in range(m - 1):
+            if umbral is not None and 2 * tarifa[a] + ajuste < umbral:
+                break
+            cap = self.gas_limit - gas[a]
+            h = int(np.searchsorted(gas_ordenado, cap, side="right"))
+            if h == 0:
+                continue
+            if umbral is not None and tarifa[a] + min(maximo_tarifa[h - 1], tarifa[a]) + ajuste < umbral:
+                continue
+
+            fin = m if umbral is None else max(int(np.searchsorted(negativa, tarifa[a] + ajuste - umbral, side="right")), a + 1)
+            b = np.arange(a + 1, fin)
+            b = b[gas[b] <= cap]
+            if b.size == 0:
+                continue
+            i = np.minimum(orden[a], orden[b])
+            j = np.maximum(orden[a], orden[b])
+            bloques.append((i, j, self._utilidad(i, j), gas[a] + gas[b]))
+            acumulados += b.size
+
+            if acumulados >= k and (umbral is None or acumulados >= 2 * k):
+                bloques = [_mejores_pares(bloques, k)]
+                acumulados = k
+                umbral = bloques[0][2][-1]
+
+        if not bloques:
+            return vacio, vacio, self.tarifa[vacio], self.gas[vacio]
+        return _mejores_pares(bloques, k)
+
+    def trios_top(self, k, max_expansiones=None):
+        """
+        Genera los k tríos factibles (gas <= gas_limit) de mayor utilidad sin recorrer C(n, 3).
+
+        La suma de utilidades de un trío es 2 * (tarifa_i + tarifa_j + tarifa_k) más tres
+        ajustes acotados, así que se recorren los tríos en orden decreciente de suma de
+        tarifas (best-first con un heap sobre posiciones ordenadas por tarifa) y se corta
+        cuando la cota del siguiente trío ya no supera al k-ésimo mejor encontrado.
+
+        Con muchas tarifas repetidas los empates pueden obligar a recorrer clases enormes;
+        'max_expansiones' (default 4 * k) acota los tríos factibles evaluados y devuelve
+        los mejores hallados. Los tríos que no entran en el gas no consumen ese
+        presupuesto: si no, unas pocas transacciones pesadas de tarifa alta agotaban las
+        expansiones antes de llegar al primer trío factible.
+
+        Retorna:
+            list[tuple]: (i, j, k, suma) con i < j < k, ordenada por suma descendente.
+                'suma' es la suma de las utilidades de los tres pares (ver utilidad_trios).
+        """
+        n = self.n
+        if k <= 0 or n < 3:
+            return []
+
+        tarifa = self.tarifa
+        if tarifa.dtype.kind == "f":
+            # Tarifas desconocidas (NaN) quedan al final y cortan la búsqueda
+            tarifa = np.where(np.isnan(tarifa), -math.inf, tarifa)
+        # Una transacción que no entra ni con las dos de menor gas no forma ningún trío factible
+        dos_menores = np.sort(self.gas)[:2].sum()
+        candidatas = [t for t in range(n) if self.gas[t] + dos_menores <= self.gas_limit]
+        if len(candidatas) < 3:
+            return []
+        n = len(candidatas)
+        orden = sorted(candidatas, key=lambda t: tarifa[t], reverse=True)
+        f = [tarifa[t] for t in orden]
+        f = [int(v) for v in f] if tarifa.dtype.kind in "iuO" else [float(v) for v in f]
+        g = [self.gas[t] for t in orden]
+        gas_limit = self.gas_limit
+        ajuste = self._ajustes_escalares()
+        holgura = 3 * self._ajuste_maximo()
+
+        frontera = [(-(f[0] + f[1] + f[2]), 0, 1, 2)]
+        vistos = {(0, 1, 2)}
+        mejores = []  # min-heap (suma, secuencia, trío) con los k mejores
+        secuencia = 0
+        expansiones = max_expansiones if max_expansiones is not None else 4 * k
+
+        while frontera and expansiones > 0:
+            neg_s, a, b, c = heapq.heappop(frontera)
+            s = -neg_s
+            if s == -math.inf:
+                break
+            if len(mejores) >= k and 2 * s + holgura <= mejores[0][0]:
+                break
+
+            for nuevo in ((a + 1, b, c), (a, b + 1, c), (a, b, c + 1)):
+                x, y, z = nuevo
+                if x < y < z < n and nuevo not in vistos:
+                    vistos.add(nuevo)
+                    heapq.heappush(frontera, (-(f[x] + f[y] + f[z]), x, y, z))
+
+            if g[a] + g[b] + g[c] > gas_limit:
+                continue
+            expansiones -= 1
+            i, j, l = sorted((orden[a], orden[b], orden[c]))
+            suma = 2 * s + ajuste(i, j) + ajuste(i, l) + ajuste(j, l)
+            secuencia += 1
+            item = (suma, -secuencia, (i, j, l))
+            if len(mejores) < k:
+                heapq.heappush(mejores, item)
+            elif item > mejores[0]:
+                heapq.heapreplace(mejores, item)
+
+        mejores.sort(reverse=True)
+        return [(i, j, l, suma) for suma, _, (i, j, l) in mejores]
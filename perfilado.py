@@ -0,0 +1,176 @@
+import functools
+import json
+import os
+import time
+import tracemalloc
+
+# Perfilador activo del proceso (None = perfilado apagado)
+_activo = None
+
+
+class _FaseNula:
+    """Context manager vacío que devuelve fase() con el perfilado apagado."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULA = _FaseNula()
+
+
+class _Fase:
+    __slots__ = ("perfilador", "nombre", "inicio_ns", "pico")
+
+    def __init__(self, perfilador, nombre):
+        self.perfilador = perfilador
+        self.nombre = nombre
+        self.pico = 0
+
+    def __enter__(self):
+        p = self.perfilador
+        if p.memoria:
+            if p._pila:
+                # El pico que lleva la fase de afuera no se pierde al resetear
+                padre = p._pila[-1]
+                padre.pico = max(padre.pico, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        p._pila.append(self)
+        self.inicio_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        fin_ns = time.perf_counter_ns()
+        p = self.perfilador
+        p._pila.pop()
+        evento = {"nombre": self.nombre, "inicio_ns": self.inicio_ns, "duracion_ns": fin_ns - self.inicio_ns,
+                  "nivel": len(p._pila)}
+        if p.memoria:
+            self.pico = max(self.pico, tracemalloc.get_traced_memory()[1])
+            evento["pico_memoria_mb"] = round(self.pico / 2**20, 3)
+            if p._pila:
+                p._pila[-1].pico = max(p._pila[-1].pico, self.pico)
+        p.eventos.append(evento)
+        return False
+
+
+class Perfilador:
+    """
+    Registro de tiempos por fase de un constructor de bloques.
+
+    Mientras está activo (dentro de 'with Perfilador():') cada 'with fase("...")' y
+    cada función decorada con @medido registran su duración; con memoria=True además
+    el pico de memoria de Python (tracemalloc) de cada fase. Sin un Perfilador activo
+    fase() devuelve un context manager vacío y @medido llama directo a la función,
+    así que los constructores pueden quedar instrumentados sin costo.
+
+    Uso:
+        with Perfilador(memoria=True) as perfilador:
+            resumen, bloque = construir_bloque(df, T_simulado)
+        resumen.update(perfilador.columnas())
+        exportar_traza([perfilador], "logs/traza.json")
+
+    Parámetros:
+        nombre (str): Etiqueta de la corrida en la traza (p.ej. builder y bloque).
+        memoria (bool): Registrar el pico de memoria por fase (más lento).
+    """
+
+    def __init__(self, nombre="", memoria=False):
+        self.nombre = nombre
+        self.memoria = memoria
+        self.eventos = []
+        self.pico_total = None
+        self._pila = []
+        self._anterior = None
+        self._inicio_tracemalloc = False
+
+    def fase(self, nombre):
+        return _Fase(self, nombre)
+
+    def __enter__(self):
+        global _activo
+        self._anterior, _activo = _activo, self
+        if self.memoria:
+            self._inicio_tracemalloc = not tracemalloc.is_tracing()
+            if self._inicio_tracemalloc:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _activo
+        _activo = self._anterior
+        if self.memoria:
+            self.pico_total = tracemalloc.get_traced_memory()[1]
+            for evento in self.eventos:
+                self.pico_total = max(self.pico_total, int(evento["pico_memoria_mb"] * 2**20))
+            if self._inicio_tracemalloc:
+                tracemalloc.stop()
+        return False
+
+    def columnas(self):
+        """
+        Tiempo total por fase como columnas del resumen ('t_<fase>_s'), en orden de
+        primera aparición, más 'pico_memoria_mb' si se midió memoria.
+        """
+        tiempos = {}
+        for evento in sorted(self.eventos, key=lambda e: e["inicio_ns"]):
+            clave = f"t_{evento['nombre']}_s"
+            tiempos[clave] = tiempos.get(clave, 0) + evento["duracion_ns"]
+        columnas = {clave: round(ns / 1e9, 6) for clave, ns in tiempos.items()}
+        if self.pico_total is not None:
+            columnas["pico_memoria_mb"] = round(self.pico_total / 2**20, 3)
+        return columnas
+
+
+def fase(nombre):
+    """Context manager para una fase del constructor; no hace nada si no hay Perfilador activo."""
+    perfilador = _activo
+    return _NULA if perfilador is None else perfilador.fase(nombre)
+
+
+def medido(nombre=None):
+    """Decorador: registra cada llamada como una fase ('nombre' o el de la función)."""
+    def decorador(funcion):
+        etiqueta = nombre or funcion.__name__
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            perfilador = _activo
+            if perfilador is None:
+                return funcion(*args, **kwargs)
+            with perfilador.fase(etiqueta):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def exportar_traza(perfiladores, path):
+    """
+    Escribe las fases de uno o más perfiladores como traza de Chrome (JSON de
+    'traceEvents', se abre en chrome://tracing o Perfetto). Cada perfilador va en
+    su propia fila, con su 'nombre' como título.
+    """
+    perfiladores = list(perfiladores)
+    origen = min((e["inicio_ns"] for p in perfiladores for e in p.eventos), default=0)
+    pid = os.getpid()
+    eventos = []
+    for tid, p in enumerate(perfiladores):
+        eventos.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                        "args": {"name": p.nombre or f"corrida {tid}"}})
+        for e in p.eventos:
+            evento = {"name": e["nombre"], "ph": "X", "pid": pid, "tid": tid,
+                      "ts": (e["inicio_ns"] - origen) / 1000, "dur": e["duracion_ns"] / 1000}
+            if "pico_memoria_mb" in e:
+                evento["args"] = {"pico_memoria_mb": e["pico_memoria_mb"]}
+            eventos.append(evento)
+
+    carpeta = os.path.dirname(str(path))
+    if carpeta:
+        os.makedirs(carpeta, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": eventos, "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,53 @@
+# prepare_data_r2/bench_rpc_batch.py
+# -*- coding: utf-8 -*-
+# Mide hashes/s del enriquecimiento de format_pending_to_dataset contra un nodo
+# JSON-RPC falso local (servidor_rpc_falso.py), sin red:
+#   - antes:   Session por defecto (pool de 10), un POST por hash
+#   - pool:    Session con pool del tamaño del ThreadPool y retry, un POST por hash
+#   - batch:   lo anterior + BATCH_SIZE hashes por POST
+import sys, time
+from pathlib import Path
+
+import requests
+
+ROOT = Path(__file__).resolve().parents[0]
+sys.path.insert(0, str(ROOT.parent))
+sys.path.insert(0, str(ROOT))
+
+from servidor_rpc_falso import ServidorRPCFalso   # noqa: E402
+import format_pending_to_dataset as fpd            # noqa: E402
+
+# ==========================
+# CONFIG
+# ==========================
+N_HASHES = 3000
+LATENCIA_S = 0.01     # demora por POST del nodo falso
+TASA_429 = 0.02       # fracción de POSTs que el nodo rechaza con 429
+BATCH_SIZES = [fpd.BATCH_SIZE, 25, 250]
+
+def medir(nombre, hashes, session, batch_size, servidor):
+    fpd.session = session
+    servidor.posts = 0
+    t0 = time.perf_counter()
+    ok = sum(1 for tx in fpd.iter_txs(hashes, batch_size=batch_size) if tx)
+    dt = time.perf_counter() - t0
+    print(f"{nombre:<16} batch={batch_size:<4} {len(hashes) / dt:>9.0f} hashes/s  "
+          f"({dt:6.2f}s, resueltas {ok}/{len(hashes)}, POSTs {servidor.posts})")
+
+def main():
+    hashes = ["0x" + f"{i:064x}" for i in range(N_HASHES)]
+    with ServidorRPCFalso(latencia_s=LATENCIA_S, tasa_429=TASA_429) as servidor:
+        fpd.ALCHEMY_HTTP = servidor.url
+        print(f"Nodo falso: {LATENCIA_S * 1000:.0f} ms por POST, {TASA_429:.0%} de 429 | "
+              f"{N_HASHES} hashes, {fpd.MAX_WORKERS} hilos")
+
+        antes = requests.Session()
+        antes.headers.update({"Content-Type": "application/json"})
+        medir("antes", hashes, antes, 1, servidor)
+        # Con reintentos rápidos para que el backoff no domine la medición
+        medir("pool+retry", hashes, fpd.crear_sesion(backoff_factor=0.01), 1, servidor)
+        for b in BATCH_SIZES:
+            medir("pool+retry+batch", hashes, fpd.crear_sesion(backoff_factor=0.01), b, servidor)
+
+if __name__ == "__main__":
+    main()
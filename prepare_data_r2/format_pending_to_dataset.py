@@ -1,11 +1,15 @@
 # prepare_data_r2/format_pending_to_dataset.py
 # -*- coding: utf-8 -*-
-import os, json, time
+import os, sys, csv, json, time
 from pathlib import Path
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
-import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from cache_tx import CacheTx  # noqa: E402
 
 # ==========================
 # 1) CONFIG SIMPLE (EDITAR)
@@ -15,6 +19,10 @@ ALCHEMY_HTTP = "https://eth-mainnet.g.alchemy.com/v2/Mb0w1SreNP0tXz9xGTK9f"  # <
 BLOCKS = []  # ejemplo: [23506390, 23506393, 23506414]
 MAX_WORKERS = 16
 HTTP_TIMEOUT = 20
+BATCH_SIZE = 100        # hashes por POST (batch JSON-RPC); 1 = un request por hash
+MAX_RETRIES = 5         # reintentos ante 429/5xx, con backoff exponencial
+BACKOFF_FACTOR = 0.5
+CHUNK_HASHES = 5000     # hashes por tramo (caché + RPC + escritura); acota la memoria
 
 
 ROOT = Path(__file__).resolve().parents[0]                 # prepare_data_r2/
@@ -31,8 +39,28 @@ HEADER = [
 # ==========================
 # 2) UTILES
 # ==========================
-session = requests.Session()
-session.headers.update({"Content-Type": "application/json", "User-Agent": "prepare_data_r2/1.0"})
+def crear_sesion(pool_size=MAX_WORKERS, max_retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR):
+    """
+    Session con un pool de conexiones del tamaño del ThreadPool (el adapter por
+    defecto guarda 10 y el resto de los hilos abre y cierra conexiones) y reintentos
+    con backoff ante 429/5xx, respetando Retry-After.
+    """
+    s = requests.Session()
+    s.headers.update({"Content-Type": "application/json", "User-Agent": "prepare_data_r2/1.0"})
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=None,   # JSON-RPC va por POST
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+session = crear_sesion()
 
 def jrpc(method, params):
     payload = {"jsonrpc":"2.0","id":1,"method":method,"params":params}
@@ -43,6 +71,44 @@ def jrpc(method, params):
         raise RuntimeError(str(j["error"]))
     return j["result"]
 
+def jrpc_batch(method, params_list):
+    """
+    Un solo POST con varios requests JSON-RPC. Retorna los 'result' en el mismo
+    orden que 'params_list' (None donde el nodo devolvió error o null).
+    """
+    payload = [{"jsonrpc":"2.0","id":i,"method":method,"params":p} for i, p in enumerate(params_list)]
+    r = session.post(ALCHEMY_HTTP, json=payload, timeout=HTTP_TIMEOUT)
+    r.raise_for_status()
+    j = r.json()
+    if not isinstance(j, list):
+        raise RuntimeError(str(j.get("error", j)))
+    results = [None] * len(params_list)
+    for item in j:
+        i = item.get("id")
+        if isinstance(i, int) and 0 <= i < len(results) and "error" not in item:
+            results[i] = item.get("result")
+    return results
+
+def fetch_txs(hashes):
+    """eth_getTransactionByHash de un lote de hashes; None en los que fallan."""
+    try:
+        if len(hashes) == 1:
+            return [jrpc("eth_getTransactionByHash", [hashes[0]])]
+        return jrpc_batch("eth_getTransactionByHash", [[h] for h in hashes])
+    except Exception:
+        return [None] * len(hashes)
+
+def iter_txs(hashes, batch_size=BATCH_SIZE, max_workers=MAX_WORKERS):
+    """
+    Reparte los hashes en lotes de 'batch_size' sobre un pool de hilos y entrega
+    cada tx (o None si no se pudo resolver) a medida que terminan los lotes.
+    """
+    lotes = [hashes[i:i + batch_size] for i in range(0, len(hashes), batch_size)]
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        futs = [ex.submit(fetch_txs, lote) for lote in lotes]
+        for fut in as_completed(futs):
+            yield from fut.result()
+
 def to_int(x):
     if x is None: return 0
     if isinstance(x, str) and x.startswith("0x"):
@@ -52,6 +118,35 @@ def to_int(x):
     except Exception:
         return 0
 
+def tx_to_row(tx, ts_ms):
+    """
+    Fila del CSV (orden de HEADER) para una tx JSON-RPC. data_size y data_4bytes salen
+    del largo y de un slice del hex de 'input', sin decodificarlo a bytes.
+    """
+    inp = tx.get("input") or "0x"
+    data_size = max(len(inp)//2 - 1, 0) if inp.startswith("0x") else len(inp)
+    data_4b = (inp[:10] if inp.startswith("0x") and len(inp) >= 10 else "")
+    return [
+        ts_ms,                                                   # timestamp_ms
+        tx.get("hash"),
+        to_int(tx.get("chainId")) or 1,
+        tx.get("from"),
+        tx.get("to") or "",
+        to_int(tx.get("value")),
+        to_int(tx.get("nonce")),
+        to_int(tx.get("gas")),
+        to_int(tx.get("gasPrice")),                              # gas_price
+        to_int(tx.get("maxPriorityFeePerGas")),                  # gas_tip_cap
+        to_int(tx.get("maxFeePerGas")) or to_int(tx.get("gasPrice")),  # gas_fee_cap
+        data_size,
+        data_4b,
+        "alchemy_ws",                                            # sources
+        0,                                                       # included_at_block_height
+        0,                                                       # included_block_timestamp_ms
+        0,                                                       # inclusion_delay_ms
+        tx.get("type") or "",                                    # tx_type
+    ]
+
 def iso_to_ms(iso_str: str | None) -> int:
     if not iso_str: 
         return int(time.time()*1000)
@@ -73,70 +168,50 @@ def process_block_snapshot(snap_path: Path):
         print(f"[skip] {snap_path.name}: 0 pending")
         return
 
-    # Enriquecer transacciones por RPC
-    def fetch_tx(h):
-        try:
-            return jrpc("eth_getTransactionByHash", [h])
-        except Exception:
-            return None
-
-    results = []
-    misses = 0
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
-        futs = {ex.submit(fetch_tx, h): h for h in hashes}
-        for fut in as_completed(futs):
-            tx = fut.result()
-            if tx: results.append(tx)
-            else:  misses += 1
-
-    # Armar filas con CABECERA FIJA
-    rows = []
-    for tx in results:
-        inp = tx.get("input") or "0x"
-        data_size = max(len(inp)//2 - 1, 0) if inp.startswith("0x") else len(inp)
-        data_4b = (inp[:10] if inp.startswith("0x") and len(inp) >= 10 else "")
-
-        row = {
-            "timestamp_ms": ts_ms,
-            "hash": tx.get("hash"),
-            "chain_id": to_int(tx.get("chainId")) or 1,
-            "from": tx.get("from"),
-            "to": tx.get("to"),
-            "value": to_int(tx.get("value")),
-            "nonce": to_int(tx.get("nonce")),
-            "gas": to_int(tx.get("gas")),
-            "gas_price": to_int(tx.get("gasPrice")),                      
-            "gas_tip_cap": to_int(tx.get("maxPriorityFeePerGas")),         
-            "gas_fee_cap": (to_int(tx.get("maxFeePerGas")) or to_int(tx.get("gasPrice"))),
-            "data_size": data_size,
-            "data_4bytes": data_4b,
-            "sources": "alchemy_ws",                                   
-            "included_at_block_height": 0,                             
-            "included_block_timestamp_ms": 0,
-            "inclusion_delay_ms": 0,
-            "tx_type": tx.get("type") or ""
-        }
-
-        # asegurar orden exacto
-        rows.append([row.get(col, "") for col in HEADER])
-
     out_dir = OUT_ROOT / str(target_block)
     out_dir.mkdir(parents=True, exist_ok=True)
     out_csv = out_dir / "pending_formatted.csv"
-    pd.DataFrame(rows, columns=HEADER).to_csv(out_csv, index=False)
+
+    # Enriquecer y escribir en streaming: por tramos de CHUNK_HASHES, primero lo que
+    # ya está en la caché y luego lo que llega por RPC (lotes de BATCH_SIZE hashes por
+    # POST), fila por fila a medida que terminan los lotes. La memoria no crece con
+    # el tamaño del snapshot.
+    n_enriched = 0
+    misses = 0
+    with CacheTx() as cache, open(out_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for i in range(0, len(hashes), CHUNK_HASHES):
+            tramo = hashes[i:i + CHUNK_HASHES]
+            en_cache = cache.obtener(tramo)
+            for tx in en_cache.values():
+                writer.writerow(tx_to_row(tx, ts_ms))
+            n_enriched += len(en_cache)
+
+            nuevas = []
+            for tx in iter_txs([h for h in tramo if h not in en_cache]):
+                if tx:
+                    writer.writerow(tx_to_row(tx, ts_ms))
+                    nuevas.append(tx)
+                else:
+                    misses += 1
+            cache.guardar(nuevas)
+            n_enriched += len(nuevas)
+        stats_cache = cache.estadisticas()
 
     meta_out = {
         "snapshot_file": snap_path.name,
         "target_block": target_block,
         "captured_at": meta.get("captured_at"),
         "n_pending_hashes_raw": len(hashes),
-        "n_enriched": len(results),
-        "misses": misses
+        "n_enriched": n_enriched,
+        "misses": misses,
+        **stats_cache
     }
     with open(out_dir / "meta.json", "w", encoding="utf-8") as f:
         json.dump(meta_out, f, ensure_ascii=False, indent=2)
 
-    print(f"[ok] {snap_path.name} → {out_csv}  (enriched={len(results)}, misses={misses})")
+    print(f"[ok] {snap_path.name} → {out_csv}  (enriched={n_enriched}, misses={misses}, cache_hits={stats_cache['cache_hits']})")
 
 def main():
     if BLOCKS:
@@ -0,0 +1,100 @@
+import importlib
+
+# Módulos que registran sus constructores con @registrar_builder al importarse
+MODULOS_BUILDERS = [
+    "algoritmo_greedy_clasico",
+    "algoritmo_base",
+    "algoritmo_extendido",
+    "algoritmo_extendido_greedy",
+    "algoritmo_knapsack",
+    "algoritmo_cadenas_nonce",
+    "algoritmo_componentes",
+]
+
+_BUILDERS = {}
+# Regla de conflicto que respeta el bloque de cada constructor (ver registrar_builder)
+_REGLAS_CONFLICTO = {}
+REGLAS_CONFLICTO = ("clasico", "direcciones")
+# Constructores acotados por reloj: con el mismo mempool la utilidad puede variar entre corridas
+_NO_DETERMINISTAS = set()
+
+
+def registrar_builder(nombre, regla_conflicto="clasico", determinista=True, **params_default):
+    """
+    Decorador que registra un construir_bloque(txs, T_simulado, gas_limit=..., **params)
+    bajo 'nombre'. 'params_default' son parámetros fijos que el registro le pasa
+    (los que se den al construir tienen prioridad). Devuelve la función sin cambios.
+
+    'regla_conflicto' es la que cumple el bloque que arma el constructor, para que
+    quien lo post-procese (busqueda_local) no la rompa: "clasico" (mismo 'to', o
+    mismo 'from' y nonce, como greedy_clasico) o "direcciones" (ninguna dirección
+    'from'/'to' compartida, como el Empaquetador de los algoritmos de pares y tríos).
+    'determinista' = False marca a los que cortan por tiempo (ver es_determinista).
+    """
+    if regla_conflicto not in REGLAS_CONFLICTO:
+        raise ValueError(f"Regla de conflicto desconocida: {regla_conflicto}")
+
+    def decorador(funcion):
+        _BUILDERS[nombre] = (funcion, params_default)
+        _REGLAS_CONFLICTO[nombre] = regla_conflicto
+        if not determinista:
+            _NO_DETERMINISTAS.add(nombre)
+        return funcion
+    return decorador
+
+
+def _cargar_builders():
+    for modulo in MODULOS_BUILDERS:
+        importlib.import_module(modulo)
+
+
+def builders_disponibles():
+    """Nombres de los constructores registrados, en orden alfabético."""
+    _cargar_builders()
+    return sorted(_BUILDERS)
+
+
+def obtener_builder(nombre):
+    _cargar_builders()
+    if nombre not in _BUILDERS:
+        raise KeyError(f"Builder desconocido: {nombre}. Disponibles: {', '.join(sorted(_BUILDERS))}")
+    return _BUILDERS[nombre]
+
+
+def regla_conflicto(nombre):
+    """Regla de conflicto ("clasico" o "direcciones") con la que se registró 'nombre'."""
+    obtener_builder(nombre)
+    return _REGLAS_CONFLICTO[nombre]
+
+
+def es_determinista(nombre):
+    """
+    False si 'nombre' corta la búsqueda por tiempo: sobre el mismo mempool puede
+    devolver otra utilidad según la carga de la máquina.
+    """
+    obtener_builder(nombre)
+    return nombre not in _NO_DETERMINISTAS
+
+
+def normalizar_resumen(resumen, nombre):
+    """
+    Resumen con claves comunes a todos los constructores: agrega 'builder' y
+    completa 'utilidad_total' (los extendidos reportan 'utilidad_total_real').
+    """
+    resumen = dict(resumen)
+    resumen["builder"] = nombre
+    if "utilidad_total" not in resumen:
+        resumen["utilidad_total"] = resumen.get("utilidad_total_real")
+    return resumen
+
+
+def construir(nombre, txs, T_simulado, gas_limit=30_000_000, **params):
+    """
+    Ejecuta el constructor 'nombre' sobre un DataFrame o un TxBatch ya cargado.
+
+    Retorna:
+        tuple: (resumen normalizado, bloque_df)
+    """
+    funcion, params_default = obtener_builder(nombre)
+    resumen, bloque = funcion(txs, T_simulado, gas_limit=gas_limit, **{**params_default, **params})
+    return normalizar_resumen(resumen, nombre), bloque
@@ -0,0 +1,120 @@
+import csv
+import json
+import os
+
+# Esquema común de los resúmenes: algoritmo_base y greedy_clasico reportan
+# 'utilidad_total', los extendidos 'utilidad_total_heuristica'/'utilidad_total_real',
+# y los runners agregan block_number, dataset_file, etc. Las claves que no están
+# acá se agregan al final, en el orden en que aparecen.
+COLUMNAS_RESUMEN = [
+    "algoritmo",
+    "builder",
+    "timestamp_simulado",
+    "total_transacciones",
+    "tx_incluidas",
+    "gas_usado",
+    "utilidad_total",
+    "utilidad_total_heuristica",
+    "utilidad_total_real",
+    "fragmentacion",
+    "lead_time_promedio_s",
+    "tiempo_ejecucion_s",
+    "block_number",
+    "dataset_file",
+    "num_tx_input",
+    "top_n",
+]
+
+
+def _leer_encabezado(path):
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), [])
+
+
+class RegistroResultados:
+    """
+    Sink de resúmenes con buffer: acumula en memoria y escribe en bloque en flush().
+
+    Reemplaza las llamadas a guardar_log_csv por resultado (un DataFrame de una fila
+    y una apertura de archivo cada vez). Soporta CSV y JSONL según la extensión de
+    'path' (o 'formato'). Todas las filas usan el mismo esquema (COLUMNAS_RESUMEN
+    más las claves extra vistas), con vacío/null donde un algoritmo no reporta una
+    clave. Si el CSV ya existe se respeta el orden de su encabezado, y si aparecen
+    claves nuevas se reescribe con el encabezado ampliado.
+
+    Uso:
+        with RegistroResultados("logs/logs.csv") as registro:
+            registro.registrar(resumen)
+
+    Parámetros:
+        path (str): Archivo destino (se crea la carpeta si no existe).
+        formato (str): "csv" o "jsonl" (default: según la extensión).
+        tam_buffer (int): Resúmenes acumulados antes de un flush automático.
+    """
+
+    def __init__(self, path, formato=None, tam_buffer=100):
+        self.path = str(path)
+        self.formato = formato or ("jsonl" if self.path.endswith((".jsonl", ".ndjson")) else "csv")
+        if self.formato not in ("csv", "jsonl"):
+            raise ValueError(f"Formato de registro no soportado: {self.formato}")
+        self.tam_buffer = tam_buffer
+        self.columnas = list(COLUMNAS_RESUMEN)
+        self._buffer = []
+
+    def registrar(self, resumen):
+        for clave in resumen:
+            if clave not in self.columnas:
+                self.columnas.append(clave)
+        self._buffer.append(dict(resumen))
+        if len(self._buffer) >= self.tam_buffer:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        carpeta = os.path.dirname(self.path)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        if self.formato == "csv":
+            self._flush_csv()
+        else:
+            with open(self.path, "a", encoding="utf-8") as f:
+                for fila in self._buffer:
+                    f.write(json.dumps({c: fila.get(c) for c in self.columnas}, default=str) + "\n")
+        self._buffer = []
+
+    def _flush_csv(self):
+        existe = os.path.exists(self.path) and os.path.getsize(self.path) > 0
+        if existe:
+            # Se respeta el orden del encabezado existente; las claves que no figuran en él
+            # van al final y el archivo se reescribe con el encabezado ampliado
+            encabezado = _leer_encabezado(self.path)
+            self.columnas = encabezado + [c for c in self.columnas if c not in encabezado]
+            if len(self.columnas) > len(encabezado):
+                self._reescribir_csv()
+
+        with open(self.path, "a" if existe else "w", newline="", encoding="utf-8") as f:
+            escritor = csv.DictWriter(f, fieldnames=self.columnas, restval="")
+            if not existe:
+                escritor.writeheader()
+            escritor.writerows(self._buffer)
+
+    def _reescribir_csv(self):
+        """Reescribe el CSV existente con self.columnas como encabezado (vacío en las nuevas)."""
+        temporal = self.path + ".tmp"
+        with open(self.path, "r", newline="", encoding="utf-8") as origen, \
+                open(temporal, "w", newline="", encoding="utf-8") as destino:
+            escritor = csv.DictWriter(destino, fieldnames=self.columnas, restval="")
+            escritor.writeheader()
+            escritor.writerows(csv.DictReader(origen))
+        os.replace(temporal, self.path)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,78 @@
+# bench_enriquecimiento.py
+#
+# Compara la resolución de hashes de prepare_data_r3 contra tres nodos JSON-RPC
+# falsos locales (servidor_rpc_falso.py): la cascada secuencial de antes (un POST
+# por hash, proveedor tras proveedor) contra resolver_hashes (batches + asyncio +
+# competencia entre proveedores). No usa red.
+
+import asyncio
+import json
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+
+from servidor_rpc_falso import ServidorRPCFalso  # noqa: E402
+from prepare_data_r3 import resolver_hashes      # noqa: E402
+
+# ==== CONFIGURACIÓN ====
+N_HASHES = 2000
+N_SECUENCIAL = 200        # la cascada es lenta: se mide sobre una muestra y se extrapola
+LATENCIA_S = 0.02         # demora por POST de cada nodo falso
+TASA_429 = 0.05           # el segundo nodo a veces limita
+COBERTURA_TERCERO = 0.7   # el tercero no conoce todas las tx
+
+
+def _hash(i):
+    return "0x" + f"{i:064x}"
+
+
+def _cascada(urls, tx_hash):
+    """Equivalente a get_tx_details_cascada: un POST bloqueante por proveedor hasta encontrarla."""
+    for url in urls:
+        cuerpo = json.dumps({"jsonrpc": "2.0", "id": 1, "method": "eth_getTransactionByHash", "params": [tx_hash]})
+        pedido = urllib.request.Request(url, data=cuerpo.encode(), headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(pedido, timeout=10) as resp:
+                tx = json.loads(resp.read()).get("result")
+            if tx:
+                return tx
+        except Exception:
+            continue
+    return None
+
+
+def main():
+    hashes = [_hash(i) for i in range(N_HASHES)]
+    with ServidorRPCFalso(latencia_s=LATENCIA_S, semilla=1) as a, \
+            ServidorRPCFalso(latencia_s=LATENCIA_S, tasa_429=TASA_429, semilla=2) as b, \
+            ServidorRPCFalso(latencia_s=LATENCIA_S, cobertura=COBERTURA_TERCERO, semilla=3) as c:
+        servidores = {"A": a, "B": b, "C": c}
+        proveedores = {nombre: s.url for nombre, s in servidores.items()}
+
+        inicio = time.perf_counter()
+        secuencial = [_cascada(list(proveedores.values()), h) for h in hashes[:N_SECUENCIAL]]
+        t_secuencial = (time.perf_counter() - inicio) * N_HASHES / N_SECUENCIAL
+        posts_secuencial = sum(s.posts for s in servidores.values())
+
+        for s in servidores.values():
+            s.posts = 0
+        inicio = time.perf_counter()
+        resueltas, estadisticas = asyncio.run(resolver_hashes(hashes, proveedores=proveedores, progreso=False))
+        t_async = time.perf_counter() - inicio
+        posts_async = sum(s.posts for s in servidores.values())
+
+    print(f"Hashes: {N_HASHES} | latencia por POST: {LATENCIA_S * 1000:.0f} ms")
+    print(f"Cascada secuencial: {t_secuencial:7.2f}s (extrapolado de {N_SECUENCIAL}), "
+          f"{sum(tx is not None for tx in secuencial)}/{N_SECUENCIAL} resueltas, {posts_secuencial} POSTs")
+    print(f"Async por batches:  {t_async:7.2f}s, {len(resueltas)}/{N_HASHES} resueltas, {posts_async} POSTs "
+          f"-> {t_secuencial / t_async:.0f}x")
+    for nombre, e in estadisticas.items():
+        print(f"  {nombre}: {e['batches']} batches, {e['resueltas']} tx, {e['errores']} errores")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,9 @@ import asyncio
 import websockets
 import json
 import time
-from datetime import datetime
-from web3 import Web3
+from web3 import AsyncWeb3, AsyncHTTPProvider
+
+from snapshot_mempool import ArribosMempool
 
 # ==== CONFIGURACIÓN DE ENDPOINTS (reemplazá con tus claves reales si hace falta) ====
 ALCHEMY_WSS = "wss://eth-mainnet.g.alchemy.com/v2/Mb0w1SreNP0tXz9xGTK9f"
@@ -14,19 +15,24 @@ QUICKNODE_WSS = "wss://cool-convincing-wind.quiknode.pro/6f7c19e08d10e8d804cd7ed
 
 # RPC para obtener el bloque real (puede ser Alchemy o Infura)
 RPC_HTTP = "https://eth-mainnet.g.alchemy.com/v2/Mb0w1SreNP0tXz9xGTK9f"
-web3 = Web3(Web3.HTTPProvider(RPC_HTTP))
+web3 = AsyncWeb3(AsyncHTTPProvider(RPC_HTTP))
+
+# ==== CAPTURA CONTINUA ====
+# Nuevos bloques: suscripción newHeads por websocket ("ws") o polling async de
+# eth_blockNumber ("poll"). En ambos casos corre junto a los listeners, sin
+# bloquear el event loop.
+HEADS_MODE = "ws"
+HEADS_WSS = ALCHEMY_WSS
+POLL_INTERVAL_SEC = 0.5
+MAX_BLOCKS = None            # snapshots a cerrar antes de terminar (None = sin límite)
+RECONNECT_SEC = 2            # espera antes de reconectar un websocket caído
 
 # ==== ESTRUCTURA DE RESULTADO ====
+PROVIDERS = ["alchemy", "infura", "quicknode"]
+
 def create_empty_snapshot():
-    return {
-        "timestamp": datetime.utcnow().isoformat(),
-        "duration_sec": 12,
-        "transactions": {
-            "alchemy": set(),
-            "infura": set(),
-            "quicknode": set()
-        }
-    }
+    # hash -> primer arribo (monotonic ns) en cada proveedor
+    return ArribosMempool(PROVIDERS)
 
 SUBSCRIBE_MSG = {
     "jsonrpc": "2.0",
@@ -35,74 +41,162 @@ SUBSCRIBE_MSG = {
     "params": ["newPendingTransactions"]
 }
 
+SUBSCRIBE_HEADS_MSG = {
+    "jsonrpc": "2.0",
+    "id": 1,
+    "method": "eth_subscribe",
+    "params": ["newHeads"]
+}
+
+
+class Capture:
+    """
+    Estado de la captura continua: el snapshot abierto y el bloque en el que
+    empezó. Los listeners registran siempre en 'snapshot'; al llegar un head se
+    cambia por uno vacío y el anterior se guarda.
+    """
+
+    def __init__(self):
+        self.snapshot = create_empty_snapshot()
+        self.block_number = None
+        self.closed = 0
+        self.done = asyncio.Event()
+
+    def roll(self, block_number):
+        """Abre un snapshot nuevo para 'block_number' y devuelve (bloque, snapshot) del anterior."""
+        previous = (self.block_number, self.snapshot)
+        self.snapshot = create_empty_snapshot()
+        self.block_number = block_number
+        return previous
+
+
 # ==== ESCUCHA DE WEBSOCKETS ====
-async def listen(provider_name, url, snapshot, start_time):
-    async with websockets.connect(url) as ws:
-        await ws.send(json.dumps(SUBSCRIBE_MSG))
-        await ws.recv()  # confirmación
-
-        while time.time() - start_time < snapshot["duration_sec"]:
-            try:
-                message = await asyncio.wait_for(ws.recv(), timeout=10)
-                data = json.loads(message)
-                tx_hash = data.get("params", {}).get("result")
-                if tx_hash:
-                    snapshot["transactions"][provider_name].add(tx_hash)
-            except asyncio.TimeoutError:
-                continue
-
-# ==== ESPERAR NUEVO BLOQUE ====
-def wait_for_new_block(latest_block):
-    print(f"Esperando bloque posterior a #{latest_block}...")
-    while True:
-        current = web3.eth.block_number
-        if current > latest_block:
-            print(f"Nuevo bloque detectado: #{current}")
-            return current
-        time.sleep(1)
+async def listen(provider_name, url, capture):
+    while not capture.done.is_set():
+        try:
+            async with websockets.connect(url) as ws:
+                await ws.send(json.dumps(SUBSCRIBE_MSG))
+                await ws.recv()  # confirmación
+
+                while not capture.done.is_set():
+                    try:
+                        message = await asyncio.wait_for(ws.recv(), timeout=10)
+                    except asyncio.TimeoutError:
+                        continue
+                    # El instante se toma apenas llega el mensaje, antes de parsearlo
+                    t_ns = time.monotonic_ns()
+                    data = json.loads(message)
+                    tx_hash = data.get("params", {}).get("result")
+                    # Antes del primer head no hay snapshot en curso
+                    if tx_hash and capture.block_number is not None:
+                        capture.snapshot.registrar(provider_name, tx_hash, t_ns)
+        except (OSError, websockets.ConnectionClosed) as e:
+            print(f"[{provider_name}] conexión perdida ({e}); reconectando...")
+            await asyncio.sleep(RECONNECT_SEC)
+
+# ==== NUEVOS BLOQUES ====
+async def watch_heads_ws(url, on_head, capture):
+    while not capture.done.is_set():
+        try:
+            async with websockets.connect(url) as ws:
+                await ws.send(json.dumps(SUBSCRIBE_HEADS_MSG))
+                await ws.recv()  # confirmación
+                while not capture.done.is_set():
+                    try:
+                        message = await asyncio.wait_for(ws.recv(), timeout=30)
+                    except asyncio.TimeoutError:
+                        continue
+                    head = json.loads(message).get("params", {}).get("result") or {}
+                    if "number" in head:
+                        await on_head(int(head["number"], 16))
+        except (OSError, websockets.ConnectionClosed) as e:
+            print(f"[heads] conexión perdida ({e}); reconectando...")
+            await asyncio.sleep(RECONNECT_SEC)
+
+async def watch_heads_poll(on_head, capture):
+    latest = await web3.eth.block_number
+    while not capture.done.is_set():
+        await asyncio.sleep(POLL_INTERVAL_SEC)
+        try:
+            current = await web3.eth.block_number
+        except Exception as e:
+            print(f"[heads] error consultando el bloque actual: {e}")
+            continue
+        if current > latest:
+            latest = current
+            await on_head(current)
 
 # ==== OBTENER BLOQUE POR NÚMERO ====
-def get_block_data(block_number):
-    blk = web3.eth.get_block(block_number, full_transactions=True)
+async def get_block_data(block_number):
+    blk = await web3.eth.get_block(block_number, full_transactions=True)
     return dict(blk)
 
+def save_snapshot(snapshot, block_number):
+    snapshot_fname = f"snapshot_mempool_bloque_{block_number}.ndjson"
+    snapshot.guardar(snapshot_fname, block_number=block_number,
+                     duration_sec=round((time.monotonic_ns() - snapshot.t0_monotonic_ns) / 1e9, 3))
+    print(f"\nSnapshot guardado en {snapshot_fname} con {len(snapshot)} hashes únicos:")
+    for source, n in snapshot.conteo_por_proveedor().items():
+        print(f"- {source}: {n} hashes")
+
+async def save_block(block_number):
+    try:
+        blk = await get_block_data(block_number)
+    except Exception as e:
+        print(f"[warn] No se pudo obtener el bloque #{block_number}: {e}")
+        return
+    blk_fname = f"bloque_{block_number}.json"
+    await asyncio.to_thread(_dump_json, blk, blk_fname)
+    print(f"Bloque guardado en {blk_fname} ({len(blk['transactions'])} transacciones)")
+
+def _dump_json(obj, fname):
+    with open(fname, "w") as f:
+        json.dump(obj, f, indent=2, default=str)
+
 # ==== FUNCIÓN PRINCIPAL ====
 async def main():
-    latest_block = web3.eth.block_number
-    print(f"Bloque actual: #{latest_block}")
-
-    # 1. Esperar nuevo bloque
-    current_block = wait_for_new_block(latest_block)
-    reference_time = time.time()
-
-    # 2. Captura de mempool
-    snapshot = create_empty_snapshot()
-    print("Iniciando captura de mempool por 12 segundos...")
-    await asyncio.gather(
-        listen("alchemy", ALCHEMY_WSS, snapshot, reference_time),
-        listen("infura", INFURA_WSS, snapshot, reference_time),
-        listen("quicknode", QUICKNODE_WSS, snapshot, reference_time)
-    )
-
-    for k in snapshot["transactions"]:
-        snapshot["transactions"][k] = list(snapshot["transactions"][k])
-
-    snapshot_fname = f"snapshot_mempool_bloque_{current_block}.json"
-    with open(snapshot_fname, "w") as f:
-        json.dump(snapshot, f, indent=2)
-
-    print(f"\nSnapshot guardado en {snapshot_fname} con un total de hashes:")
-    for source, txs in snapshot["transactions"].items():
-        print(f"- {source}: {len(txs)} hashes")
-
-    # 3. Esperar siguiente bloque
-    next_block = wait_for_new_block(current_block)
-    blk = get_block_data(next_block)
-    blk_fname = f"bloque_{next_block}.json"
-    with open(blk_fname, "w") as f:
-        json.dump(blk, f, indent=2, default=str)
-    print(f"\nBloque guardado en {blk_fname}")
-    print(f"Transacciones en el bloque real #{next_block}: {len(blk['transactions'])}")
+    capture = Capture()
+    pending = set()
+
+    async def on_head(block_number):
+        if capture.block_number is not None and block_number <= capture.block_number:
+            return  # head repetido o reorg al mismo alto
+        print(f"Nuevo bloque detectado: #{block_number}")
+        previous_block, snapshot = capture.roll(block_number)
+        if previous_block is None:
+            print("Iniciando captura continua de mempool...")
+            return
+
+        # El snapshot abierto en el bloque anterior es la mempool que vio el bloque
+        # actual; se guardan ambos sin frenar a los listeners
+        for job in (asyncio.to_thread(save_snapshot, snapshot, previous_block), save_block(block_number)):
+            task = asyncio.ensure_future(job)
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        capture.closed += 1
+        if MAX_BLOCKS is not None and capture.closed >= MAX_BLOCKS:
+            capture.done.set()
+
+    if HEADS_MODE == "ws":
+        watcher = watch_heads_ws(HEADS_WSS, on_head, capture)
+    else:
+        watcher = watch_heads_poll(on_head, capture)
+
+    tasks = [
+        asyncio.ensure_future(watcher),
+        asyncio.ensure_future(listen("alchemy", ALCHEMY_WSS, capture)),
+        asyncio.ensure_future(listen("infura", INFURA_WSS, capture)),
+        asyncio.ensure_future(listen("quicknode", QUICKNODE_WSS, capture)),
+    ]
+    try:
+        await capture.done.wait()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
 
 # ==== EJECUCIÓN ====
 if __name__ == "__main__":
@@ -1,24 +1,54 @@
 # resolver_txhashes_snapshot.py
 
+import asyncio
 import json
+import re
+import sys
 import time
 import csv
 from datetime import datetime
-from web3 import Web3
+from pathlib import Path
+
+import aiohttp
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+sys.path.insert(0, str(HERE.parent))
+from cache_tx import CacheTx  # noqa: E402
+from snapshot_mempool import cargar_snapshot  # noqa: E402
 
 # ==== CONFIGURACIÓN ====
-SNAPSHOT_FILE = "snapshot_mempool_bloque_23748339.json"
-RPC_HTTP = "https://eth-mainnet.g.alchemy.com/v2/Mb0w1SreNP0tXz9xGTK9f"
-web3 = Web3(Web3.HTTPProvider(RPC_HTTP))
-web3_alchemy = Web3(Web3.HTTPProvider("https://eth-mainnet.g.alchemy.com/v2/Mb0w1SreNP0tXz9xGTK9f"))
-web3_infura = Web3(Web3.HTTPProvider("https://mainnet.infura.io/v3/9c61effdaa5c4af995478f715ccdebc8"))
-web3_quicknode = Web3(Web3.HTTPProvider("https://cool-convincing-wind.quiknode.pro/6f7c19e08d10e8d804cd7ed1b5347a2f6f235534/"))
+SNAPSHOT_FILE = "snapshot_mempool_bloque_23748339.json"   # .json (formato viejo) o .ndjson
+PROVEEDORES = {
+    "Alchemy": "https://eth-mainnet.g.alchemy.com/v2/Mb0w1SreNP0tXz9xGTK9f",
+    "Infura": "https://mainnet.infura.io/v3/9c61effdaa5c4af995478f715ccdebc8",
+    "QuickNode": "https://cool-convincing-wind.quiknode.pro/6f7c19e08d10e8d804cd7ed1b5347a2f6f235534/",
+}
+BATCH_SIZE = 50                  # hashes por POST (batch JSON-RPC)
+CONCURRENCIA_POR_PROVEEDOR = 4   # POSTs simultáneos por proveedor
+TIMEOUT_S = 10.0
+ESPERA_COBERTURA_S = 1.0         # si un proveedor no responde en este tiempo, se lanza el mismo batch en el siguiente
+
+CHUNK_HASHES = 5000              # hashes por consulta a la caché al exportar
+
+HEADER = [
+    "timestamp_ms","hash","chain_id","from","to","value","nonce",
+    "gas","gas_price","gas_tip_cap","gas_fee_cap","data_size",
+    "data_4bytes","sources","included_at_block_height",
+    "included_block_timestamp_ms","inclusion_delay_ms","tx_type"
+]
+
+# Campos numéricos que el JSON-RPC devuelve como hex
+CAMPOS_CANTIDAD = ["chainId", "value", "nonce", "gas", "gasPrice", "maxPriorityFeePerGas", "maxFeePerGas", "type"]
+
+
+class ErrorProveedor(Exception):
+    """El proveedor rechazó el batch (429, 5xx o respuesta de error JSON-RPC)."""
 
 
 # ==== FUNCIONES ====
 def load_snapshot(file_path):
-    with open(file_path, "r") as f:
-        return json.load(f)
+    return cargar_snapshot(file_path)
 
 def collect_unique_hashes(snapshot):
     tx_seen_by = {}
@@ -29,59 +59,237 @@ def collect_unique_hashes(snapshot):
             tx_seen_by[h].add(source)
     return tx_seen_by
 
-def get_tx_details_cascada(tx_hash):
-    for w3, label in [(web3_alchemy, 'Alchemy'), (web3_infura, 'Infura'), (web3_quicknode, 'QuickNode')]:
-        try:
-            tx = w3.eth.get_transaction(tx_hash)
-            if tx and tx.hash:
-                return tx
-        except Exception:
-            continue
-    return None
 
+async def _pedir_batch(sesion, url, semaforo, hashes):
+    """Un POST con N eth_getTransactionByHash. Retorna {hash: tx} de las que el proveedor conoce."""
+    cuerpo = [
+        {"jsonrpc": "2.0", "id": i, "method": "eth_getTransactionByHash", "params": [h]}
+        for i, h in enumerate(hashes)
+    ]
+    async with semaforo:
+        async with sesion.post(url, json=cuerpo) as resp:
+            if resp.status == 429 or resp.status >= 500:
+                raise ErrorProveedor(f"HTTP {resp.status}")
+            resp.raise_for_status()
+            datos = await resp.json(content_type=None)
+
+    # Algunos proveedores contestan un único objeto de error en lugar de la lista
+    if not isinstance(datos, list):
+        raise ErrorProveedor(str(datos.get("error", datos)))
+    resueltas = {}
+    for r in datos:
+        tx = r.get("result")
+        if tx and isinstance(r.get("id"), int) and r["id"] < len(hashes):
+            resueltas[hashes[r["id"]]] = tx
+    return resueltas
+
+
+async def _resolver_batch(sesion, proveedores, semaforos, hashes, inicio, espera_cobertura_s, estadisticas):
+    """
+    Resuelve un batch empezando por el proveedor 'inicio' (rotan entre batches).
+
+    Si el proveedor falla se pasa al siguiente en el acto; si tarda más de
+    'espera_cobertura_s' se lanza el mismo batch en el siguiente y gana el primero
+    que responda (el resto se cancela). Los hashes que vuelvan en null se piden al
+    proveedor siguiente.
+    """
+    nombres = list(proveedores)
+    orden = nombres[inicio:] + nombres[:inicio]
+    pendientes = list(hashes)
+    resueltas = {}
+    tareas = {}
+    siguiente = 0
+
+    def lanzar():
+        nonlocal siguiente
+        if siguiente >= len(orden):
+            return
+        nombre = orden[siguiente]
+        siguiente += 1
+        tarea = asyncio.ensure_future(_pedir_batch(sesion, proveedores[nombre], semaforos[nombre], pendientes))
+        tareas[tarea] = nombre
+
+    try:
+        while pendientes:
+            if not tareas:
+                if siguiente >= len(orden):
+                    break
+                lanzar()
+            hechas, _ = await asyncio.wait(tareas, timeout=espera_cobertura_s, return_when=asyncio.FIRST_COMPLETED)
+            if not hechas:
+                lanzar()
+                continue
+
+            exito = False
+            for tarea in hechas:
+                nombre = tareas.pop(tarea)
+                if tarea.exception() is not None:
+                    estadisticas[nombre]["errores"] += 1
+                    lanzar()
+                    continue
+                estadisticas[nombre]["batches"] += 1
+                nuevas = tarea.result()
+                estadisticas[nombre]["resueltas"] += sum(1 for h in nuevas if h not in resueltas)
+                resueltas.update(nuevas)
+                exito = True
+
+            if exito:
+                for tarea in tareas:
+                    tarea.cancel()
+                tareas.clear()
+                pendientes = [h for h in pendientes if h not in resueltas]
+    finally:
+        for tarea in tareas:
+            tarea.cancel()
+
+    return resueltas
+
+
+async def iterar_resueltas(hashes, proveedores=PROVEEDORES, batch_size=BATCH_SIZE,
+                           concurrencia=CONCURRENCIA_POR_PROVEEDOR, timeout_s=TIMEOUT_S,
+                           espera_cobertura_s=ESPERA_COBERTURA_S, estadisticas=None, progreso=True):
+    """
+    Resuelve los hashes con batches JSON-RPC en paralelo sobre varios proveedores y
+    entrega {hash: tx} de cada batch a medida que termina.
+
+    Reemplaza a get_tx_details_cascada (una llamada bloqueante por hash y por
+    proveedor): cada POST lleva 'batch_size' hashes, cada proveedor tiene a lo sumo
+    'concurrencia' POSTs en vuelo y los proveedores compiten por cada batch en
+    lugar de probarse uno detrás de otro.
 
-def export_to_csv(transactions, tx_seen_by, snapshot_ts_ms, output_file):
+    Parámetros:
+        hashes (list[str]): Hashes con prefijo 0x.
+        proveedores (dict): nombre -> URL HTTP del nodo.
+        batch_size (int): Hashes por POST.
+        concurrencia (int): POSTs simultáneos por proveedor.
+        timeout_s (float): Timeout de cada POST.
+        espera_cobertura_s (float): Demora antes de lanzar el batch en otro proveedor.
+        estadisticas (dict): Si se pasa, se llena con los contadores por proveedor.
+        progreso (bool): Imprime el avance.
+    """
+    hashes = list(hashes)
+    lotes = [hashes[i:i + batch_size] for i in range(0, len(hashes), batch_size)]
+    semaforos = {nombre: asyncio.Semaphore(concurrencia) for nombre in proveedores}
+    if estadisticas is None:
+        estadisticas = {}
+    for nombre in proveedores:
+        estadisticas.setdefault(nombre, {"batches": 0, "resueltas": 0, "errores": 0})
+    conector = aiohttp.TCPConnector(limit=concurrencia * len(proveedores) * 2)
+    timeout = aiohttp.ClientTimeout(total=timeout_s)
+
+    total = 0
+    async with aiohttp.ClientSession(connector=conector, timeout=timeout) as sesion:
+        pendientes = [
+            _resolver_batch(sesion, proveedores, semaforos, lote, i % len(proveedores),
+                            espera_cobertura_s, estadisticas)
+            for i, lote in enumerate(lotes)
+        ]
+        for hechos, futuro in enumerate(asyncio.as_completed(pendientes), start=1):
+            resueltas = await futuro
+            total += len(resueltas)
+            if progreso and (hechos % 20 == 0 or hechos == len(lotes)):
+                print(f"Batches {hechos}/{len(lotes)} - resueltas {total}/{len(hashes)}")
+            yield resueltas
+
+
+async def resolver_hashes(hashes, proveedores=PROVEEDORES, **kwargs):
+    """
+    Igual que iterar_resueltas pero junta todo en memoria.
+
+    Retorna:
+        tuple(dict, dict): ({hash: tx JSON-RPC}, estadísticas por proveedor)
+    """
+    resueltas, estadisticas = {}, {}
+    async for lote in iterar_resueltas(hashes, proveedores, estadisticas=estadisticas, **kwargs):
+        resueltas.update(lote)
+    return resueltas, estadisticas
+
+
+def _cantidad(valor):
+    """Cantidad JSON-RPC ('0x1a') a entero; vacío si falta."""
+    if isinstance(valor, str) and valor.startswith("0x"):
+        return int(valor, 16)
+    return "" if valor is None else valor
+
+
+def tx_to_row(tx, tx_seen_by, snapshot_ts_ms, primer_arribo_ms=None):
+    """
+    Fila del CSV para una tx JSON-RPC. data_size y data_4bytes salen del largo y
+    de un slice del hex de 'input', sin decodificarlo a bytes. timestamp_ms es el
+    primer arribo de la tx en la captura si el snapshot lo trae; si no, la hora
+    del snapshot.
+    """
+    inp = tx.get("input")
+    if isinstance(inp, str) and inp.startswith("0x"):
+        data_size = (len(inp) - 2) // 2
+        data_4bytes = inp[2:10] if data_size >= 4 else ""
+    else:
+        data_size, data_4bytes = 0, ""
+    cantidades = {campo: _cantidad(tx.get(campo)) for campo in CAMPOS_CANTIDAD}
+
+    return [
+        (primer_arribo_ms or {}).get(tx["hash"], snapshot_ts_ms),
+        tx["hash"][2:] if tx["hash"].startswith("0x") else tx["hash"],
+        cantidades["chainId"],
+        tx.get("from", ""),
+        tx.get("to") or "",
+        cantidades["value"] or 0,
+        cantidades["nonce"],
+        cantidades["gas"] or 0,
+        cantidades["gasPrice"],
+        cantidades["maxPriorityFeePerGas"],
+        cantidades["maxFeePerGas"],
+        data_size,
+        data_4bytes,
+        ",".join(sorted(tx_seen_by.get(tx["hash"], []))),
+        "",  # included_at_block_height
+        "",  # included_block_timestamp_ms
+        "",  # inclusion_delay_ms
+        cantidades["type"]
+    ]
+
+
+def export_to_csv(transactions, tx_seen_by, snapshot_ts_ms, output_file, primer_arribo_ms=None):
+    """Escribe las tx (cualquier iterable, se consume fila por fila) al CSV."""
     with open(output_file, mode="w", newline="") as f:
         writer = csv.writer(f)
-        writer.writerow([
-            "timestamp_ms","hash","chain_id","from","to","value","nonce",
-            "gas","gas_price","gas_tip_cap","gas_fee_cap","data_size",
-            "data_4bytes","sources","included_at_block_height",
-            "included_block_timestamp_ms","inclusion_delay_ms","tx_type"
-        ])
-
+        writer.writerow(HEADER)
         for tx in transactions:
-            try:
-                if tx.input and isinstance(tx.input, str) and tx.input.startswith("0x"):
-                    data_bytes = bytes.fromhex(tx.input[2:])
-                else:
-                    data_bytes = b""
-            except Exception:
-                data_bytes = b""
-
-            data_size = len(data_bytes)
-            data_4bytes = data_bytes[:4].hex() if data_size >= 4 else ""
-
-            writer.writerow([
-                snapshot_ts_ms,
-                tx.hash.hex(),
-                tx.get("chainId", ""),
-                tx.get("from", ""),
-                tx.get("to", ""),
-                tx.get("value", 0),
-                tx.get("nonce", ""),
-                tx.get("gas", 0),
-                tx.get("gasPrice", ""),
-                tx.get("maxPriorityFeePerGas", ""),
-                tx.get("maxFeePerGas", ""),
-                len(tx.get("input", "")) // 2,
-                tx.get("input", "")[:10],
-                ",".join(tx_seen_by.get(tx.hash.hex(), [])),
-                "",  # included_at_block_height
-                "",  # included_block_timestamp_ms
-                "",  # inclusion_delay_ms
-                tx.get("type", "")
-            ])
+            writer.writerow(tx_to_row(tx, tx_seen_by, snapshot_ts_ms, primer_arribo_ms))
+
+
+async def enriquecer_a_csv(tx_seen_by, snapshot_ts_ms, output_file, cache, proveedores=PROVEEDORES,
+                           primer_arribo_ms=None):
+    """
+    Exporta el snapshot en streaming: primero las tx que ya están en la caché (por
+    tramos de CHUNK_HASHES) y después las que llegan por RPC, fila por fila a medida
+    que terminan los batches. Ni las tx ni las filas se acumulan en memoria.
+
+    Retorna:
+        tuple(int, dict): (tx escritas, estadísticas por proveedor)
+    """
+    hashes = list(tx_seen_by)
+    escritas = 0
+    faltantes = []
+    estadisticas = {}
+    with open(output_file, mode="w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for i in range(0, len(hashes), CHUNK_HASHES):
+            tramo = hashes[i:i + CHUNK_HASHES]
+            en_cache = cache.obtener(tramo)
+            for tx in en_cache.values():
+                writer.writerow(tx_to_row(tx, tx_seen_by, snapshot_ts_ms, primer_arribo_ms))
+            escritas += len(en_cache)
+            faltantes += [h for h in tramo if h not in en_cache]
+        print(f"En caché: {escritas} - a resolver por RPC: {len(faltantes)}")
+
+        async for lote in iterar_resueltas(faltantes, proveedores, estadisticas=estadisticas):
+            for tx in lote.values():
+                writer.writerow(tx_to_row(tx, tx_seen_by, snapshot_ts_ms, primer_arribo_ms))
+            cache.guardar(lote.values())
+            escritas += len(lote)
+    return escritas, estadisticas
 
 
 # ==== EJECUCIÓN PRINCIPAL ====
@@ -93,22 +301,32 @@ def main():
     tx_seen_by = collect_unique_hashes(snapshot)
     print(f"Total de hashes únicos en snapshot: {len(tx_seen_by)}")
 
-    resolved = []
-    for i, tx_hash in enumerate(tx_seen_by):
-        try:
-            tx = get_tx_details_cascada(tx_hash)
-            if tx and hasattr(tx, "hash"):
-                resolved.append(tx)
-            if i % 20 == 0:
-                print(f"Resueltos {i+1}/{len(tx_seen_by)}")
-        except Exception as e:
-            print(f"Error al resolver {tx_hash}: {e}")
-            continue
-
-    print(f"Total de transacciones resueltas exitosamente: {len(resolved)}")
-    output_file = SNAPSHOT_FILE.replace("snapshot_mempool", "mempool_datos").replace(".json", ".csv")
-    export_to_csv(resolved, tx_seen_by, snapshot_ts_ms, output_file)
-    print(f"\nArchivo CSV guardado en {output_file} con {len(resolved)} transacciones resueltas.")
+    inicio = time.perf_counter()
+    output_file = re.sub(r"\.(nd)?json$", ".csv", SNAPSHOT_FILE.replace("snapshot_mempool", "mempool_datos"))
+    with CacheTx() as cache:
+        # Solo se piden por RPC las tx que no estaban en snapshots anteriores
+        n_resueltas, estadisticas = asyncio.run(
+            enriquecer_a_csv(tx_seen_by, snapshot_ts_ms, output_file, cache, PROVEEDORES,
+                             snapshot["primer_arribo_ms"])
+        )
+        stats_cache = cache.estadisticas()
+    print(f"Total de transacciones resueltas exitosamente: {n_resueltas} en {time.perf_counter() - inicio:.1f}s")
+    for nombre, e in estadisticas.items():
+        print(f"  {nombre}: {e['batches']} batches, {e['resueltas']} tx, {e['errores']} errores")
+    print(f"\nArchivo CSV guardado en {output_file} con {n_resueltas} transacciones resueltas.")
+
+    meta_out = {
+        "snapshot_file": SNAPSHOT_FILE,
+        "captured_at": snapshot_ts,
+        "n_hashes": len(tx_seen_by),
+        "arribos_por_tx": bool(snapshot["primer_arribo_ms"]),
+        "n_enriched": n_resueltas,
+        "misses": len(tx_seen_by) - n_resueltas,
+        "proveedores": estadisticas,
+        **stats_cache,
+    }
+    with open(output_file.replace(".csv", ".meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta_out, f, ensure_ascii=False, indent=2)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,126 @@
+# snapshot_mempool.py
+#
+# Registro de arribos de la captura de mempool y formato de snapshot NDJSON.
+#
+# Cada hash guarda un int64 por proveedor con el primer instante (time.monotonic_ns)
+# en que ese proveedor lo anunció; -1 si no lo vio. El snapshot se escribe en NDJSON:
+# una línea de encabezado y una línea compacta por hash,
+#
+#   {"formato": "snapshot_mempool/2", "timestamp": ..., "proveedores": [...], "t0_unix_ns": ..., ...}
+#   ["0xabc...", 1532000, -1, 1618000]
+#
+# con los arribos como ns desde el inicio de la captura (t0). cargar_snapshot lee
+# este formato y el JSON indentado anterior, y devuelve la misma estructura.
+
+import json
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+FORMATO = "snapshot_mempool/2"
+NO_VISTO = -1
+
+
+class ArribosMempool:
+    """
+    Primer arribo de cada hash en cada proveedor: dict hash -> np.int64[n_proveedores].
+
+    Los instantes son time.monotonic_ns() (no retroceden con ajustes de reloj); el
+    par (t0_unix_ns, t0_monotonic_ns) tomado al crear el registro permite pasarlos
+    a hora Unix al guardar.
+
+    Parámetros:
+        proveedores (list[str]): Nombres de los proveedores, en orden de columna.
+    """
+
+    def __init__(self, proveedores):
+        self.proveedores = list(proveedores)
+        self._columna = {p: i for i, p in enumerate(self.proveedores)}
+        self.arribos = {}
+        self.t0_unix_ns = time.time_ns()
+        self.t0_monotonic_ns = time.monotonic_ns()
+
+    def registrar(self, proveedor, tx_hash, t_ns=None):
+        """Anota el arribo si es el primero de 'tx_hash' en 'proveedor'."""
+        t_ns = time.monotonic_ns() if t_ns is None else t_ns
+        fila = self.arribos.get(tx_hash)
+        if fila is None:
+            fila = np.full(len(self.proveedores), NO_VISTO, dtype=np.int64)
+            self.arribos[tx_hash] = fila
+        columna = self._columna[proveedor]
+        if fila[columna] == NO_VISTO:
+            fila[columna] = t_ns
+
+    def __len__(self):
+        return len(self.arribos)
+
+    def __contains__(self, tx_hash):
+        return tx_hash in self.arribos
+
+    def conteo_por_proveedor(self):
+        conteo = dict.fromkeys(self.proveedores, 0)
+        for fila in self.arribos.values():
+            for p, t in zip(self.proveedores, fila):
+                conteo[p] += t != NO_VISTO
+        return conteo
+
+    def guardar(self, path, **meta):
+        """
+        Escribe el snapshot NDJSON. 'meta' se agrega al encabezado (duration_sec,
+        block_number, ...).
+        """
+        encabezado = {
+            "formato": FORMATO,
+            "timestamp": datetime.fromtimestamp(self.t0_unix_ns / 1e9, tz=timezone.utc).isoformat(),
+            "proveedores": self.proveedores,
+            "t0_unix_ns": self.t0_unix_ns,
+            "t0_monotonic_ns": self.t0_monotonic_ns,
+            "n_hashes": len(self.arribos),
+            **meta,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(encabezado) + "\n")
+            for tx_hash, fila in self.arribos.items():
+                relativos = np.where(fila == NO_VISTO, NO_VISTO, fila - self.t0_monotonic_ns).tolist()
+                f.write(json.dumps([tx_hash, *relativos], separators=(",", ":")) + "\n")
+
+
+def cargar_snapshot(path):
+    """
+    Lee un snapshot de captura, NDJSON (snapshot_mempool/2) o JSON indentado.
+
+    Retorna:
+        dict: {"timestamp", "duration_sec", "transactions": {proveedor: [hash, ...]},
+        "primer_arribo_ms": {hash: hora Unix en ms del primer arribo entre todos los
+        proveedores}}. En el formato viejo no hay arribos y 'primer_arribo_ms' queda vacío.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        primera = f.readline()
+        encabezado = json.loads(primera) if primera.strip().startswith("{") and primera.strip().endswith("}") else None
+        if encabezado is None or encabezado.get("formato") != FORMATO:
+            f.seek(0)
+            snapshot = json.load(f)
+            snapshot.setdefault("primer_arribo_ms", {})
+            return snapshot
+
+        proveedores = encabezado["proveedores"]
+        transactions = {p: [] for p in proveedores}
+        primer_arribo_ms = {}
+        t0_unix_ns = encabezado["t0_unix_ns"]
+        for linea in f:
+            if not linea.strip():
+                continue
+            tx_hash, *relativos = json.loads(linea)
+            vistos = [t for t in relativos if t != NO_VISTO]
+            if not vistos:
+                continue
+            for p, t in zip(proveedores, relativos):
+                if t != NO_VISTO:
+                    transactions[p].append(tx_hash)
+            primer_arribo_ms[tx_hash] = (t0_unix_ns + min(vistos)) // 1_000_000
+
+    snapshot = {k: v for k, v in encabezado.items() if k not in ("formato", "proveedores")}
+    snapshot["transactions"] = transactions
+    snapshot["primer_arribo_ms"] = primer_arribo_ms
+    return snapshot
@@ -1,9 +1,11 @@
-from utils import cargar_dataset, calcular_T_simulado
+from utils import calcular_T_simulado, guardar_log_csv
+from cache_datasets import cargar_dataset_cacheado
 from algoritmo_base import construir_bloque
 import os 
 
-df = cargar_dataset(os.path.join(os.path.dirname(__file__), '..', 'data', '2025-07-14.csv'), nrows=1000)
+df = cargar_dataset_cacheado(os.path.join(os.path.dirname(__file__), '..', 'data', '2025-07-14.csv'), nrows=1000)
 T_simulado = calcular_T_simulado(df)
 resumen, bloque = construir_bloque(df, T_simulado, top_n=500)
 
+guardar_log_csv(resumen, path=os.path.join(os.path.dirname(__file__), 'logs', 'logs.csv'))
 print(resumen)
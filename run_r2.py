@@ -2,20 +2,29 @@
 
 import json
 import os
+from contextlib import nullcontext
 from pathlib import Path
 
-from utils import cargar_dataset, guardar_log_csv
-from algoritmo_greedy_clasico import construir_bloque
+from cache_datasets import cargar_dataset_cacheado
+from runner_paralelo import ejecutar_en_paralelo
+from registro_resultados import RegistroResultados
+from registro_builders import construir
+from perfilado import Perfilador, exportar_traza
 
 # -------- CONFIGURACIÓN --------
+BUILDER = "greedy_clasico"   # ver registro_builders.builders_disponibles()
 BLOCKS = [23506390, 23506393, 23506414]
 TOP_N = 500
+WORKERS = os.cpu_count()   # 1 = secuencial
+PERFILAR = False           # agrega columnas t_<fase>_s al log y una traza de Chrome por bloque
+PERFILAR_MEMORIA = False   # además el pico de memoria por fase (tracemalloc, más lento)
 # -------------------------------
 
 HERE = Path(__file__).resolve().parent           
 DATASETS_DIR = HERE / "prepare_data_r2" / "datasets"
 BLOCKS_DIR   = HERE / "data_release_2" / "blocks"
 LOGS_DIR     = HERE / "logs"
+TRAZAS_DIR   = LOGS_DIR / "trazas"
 LOGS_DIR.mkdir(parents=True, exist_ok=True)    
 
 def leer_timestamp_ms_del_bloque(block_number: int) -> int:
@@ -30,26 +39,33 @@ def leer_timestamp_ms_del_bloque(block_number: int) -> int:
     return ts_ms
 
 def correr_un_bloque(block_number: int):
-    """Carga dataset, lee T_simulado real y ejecuta el algoritmo."""
+    """Carga dataset, lee T_simulado real y ejecuta el algoritmo. Retorna el resumen."""
     csv_path = DATASETS_DIR / str(block_number) / "pending_formatted.csv"
     if not csv_path.exists():
         raise FileNotFoundError(f"No existe dataset preparado: {csv_path}")
 
-    df = cargar_dataset(str(csv_path), nrows=10**9)
+    df = cargar_dataset_cacheado(str(csv_path), nrows=10**9)
     T_simulado = leer_timestamp_ms_del_bloque(block_number)
 
-    resumen, bloque = construir_bloque(df, T_simulado)
+    perfilador = Perfilador(f"{BUILDER} #{block_number}", memoria=PERFILAR_MEMORIA) if PERFILAR else None
+    with perfilador or nullcontext():
+        resumen, bloque = construir(BUILDER, df, T_simulado)
+    if perfilador is not None:
+        resumen.update(perfilador.columnas())
+        exportar_traza([perfilador], TRAZAS_DIR / f"{BUILDER}_{block_number}.json")
     resumen["block_number"] = block_number
-    print(f"\n=== Bloque {block_number} ===")
-    print(resumen)
-    guardar_log_csv(resumen, path=str(LOGS_DIR / "logs.csv"))
+    return resumen
 
 def main():
-    for b in BLOCKS:
-        try:
-            correr_un_bloque(b)
-        except Exception as e:
-            print(f"[ERROR] Bloque {b}: {e}")
+    # Los bloques corren en paralelo; el log se escribe solo desde este proceso
+    with RegistroResultados(LOGS_DIR / "logs.csv") as registro:
+        for b, resumen, error in ejecutar_en_paralelo(correr_un_bloque, BLOCKS, workers=WORKERS):
+            if error is not None:
+                print(f"[ERROR] Bloque {b}: {error}")
+                continue
+            print(f"\n=== Bloque {b} ===")
+            print(resumen)
+            registro.registrar(resumen)
 
 if __name__ == "__main__":
     main()
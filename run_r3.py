@@ -1,11 +1,22 @@
+import os
 import re
+from contextlib import nullcontext
 from pathlib import Path
 
-from utils import cargar_dataset, guardar_log_csv
-from algoritmo_extendido_greedy import construir_bloque  # o cambia al que quieras
+from cache_datasets import cargar_dataset_cacheado
+from runner_paralelo import ejecutar_en_paralelo
+from registro_resultados import RegistroResultados
+from registro_builders import construir
+from busqueda_local import construir_mejorado
+from perfilado import Perfilador, exportar_traza
 
 # -------- CONFIG --------
+BUILDER = "algoritmo_extendido_greedy"   # ver registro_builders.builders_disponibles()
 TOP_N = 500
+BUSQUEDA_LOCAL_S = 0.0   # > 0: mejora el bloque con busqueda_local durante esos segundos
+WORKERS = os.cpu_count()   # 1 = secuencial
+PERFILAR = False           # agrega columnas t_<fase>_s al log y una traza de Chrome por dataset
+PERFILAR_MEMORIA = False   # además el pico de memoria por fase (tracemalloc, más lento)
 DATASETS_SUBDIR = "release3/datasets"
 LOGFILE = "release3/logs_r3.csv"
 # ------------------------
@@ -13,6 +24,7 @@ LOGFILE = "release3/logs_r3.csv"
 HERE = Path(__file__).resolve().parent
 DATASETS_DIR = HERE / DATASETS_SUBDIR
 LOGS_PATH = HERE / LOGFILE
+TRAZAS_DIR = LOGS_PATH.parent / "trazas"
 LOGS_PATH.parent.mkdir(parents=True, exist_ok=True)
 
 CSV_PATTERN = re.compile(r"mempool_datos_bloque_(\d+)\.csv$", re.IGNORECASE)
@@ -60,24 +72,29 @@ def correr_csv(csv_path: Path):
     block_number = int(m.group(1)) if m else None
 
     # Cargar dataset completo
-    df = cargar_dataset(str(csv_path), nrows=10**9)
+    df = cargar_dataset_cacheado(str(csv_path), nrows=10**9)
 
     # Inferir T_simulado sin JSON
     T_simulado = inferir_T_simulado(df)
 
     # Ejecutar heurística
-    resumen, bloque = construir_bloque(df, T_simulado)
+    perfilador = Perfilador(f"{BUILDER} {csv_path.stem}", memoria=PERFILAR_MEMORIA) if PERFILAR else None
+    with perfilador or nullcontext():
+        if BUSQUEDA_LOCAL_S > 0:
+            resumen, bloque = construir_mejorado(BUILDER, df, T_simulado, tiempo_limite_s=BUSQUEDA_LOCAL_S)
+        else:
+            resumen, bloque = construir(BUILDER, df, T_simulado)
+    if perfilador is not None:
+        resumen.update(perfilador.columnas())
+        exportar_traza([perfilador], TRAZAS_DIR / f"{BUILDER}_{csv_path.stem}.json")
 
-    # Completar/estandarizar el resumen y loguear
+    # Completar/estandarizar el resumen (el log lo escribe main)
     if block_number is not None:
         resumen["block_number"] = block_number
     resumen.setdefault("dataset_file", csv_path.name)
     resumen.setdefault("num_tx_input", len(df))
     resumen.setdefault("top_n", TOP_N)
-
-    print(f"\n=== Dataset: {csv_path.name} ===")
-    print(resumen)
-    guardar_log_csv(resumen, path=str(LOGS_PATH))
+    return resumen
 
 def main():
     csvs = listar_csv_mempool()
@@ -85,11 +102,15 @@ def main():
         print(f"No encontré CSVs de mempool en {DATASETS_DIR}")
         return
 
-    for csv_path in csvs:
-        try:
-            correr_csv(csv_path)
-        except Exception as e:
-            print(f"[ERROR] {csv_path.name}: {e}")
+    # Los CSVs corren en paralelo; el log se escribe solo desde este proceso
+    with RegistroResultados(LOGS_PATH) as registro:
+        for csv_path, resumen, error in ejecutar_en_paralelo(correr_csv, csvs, workers=WORKERS):
+            if error is not None:
+                print(f"[ERROR] {csv_path.name}: {error}")
+                continue
+            print(f"\n=== Dataset: {csv_path.name} ===")
+            print(resumen)
+            registro.registrar(resumen)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,39 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def ejecutar_en_paralelo(funcion, tareas, workers=None):
+    """
+    Reparte las tareas (p.ej. bloques o CSVs) en un pool de procesos y devuelve
+    los resultados en el proceso padre a medida que terminan.
+
+    'funcion' tiene que ser una función de nivel de módulo (se serializa con pickle)
+    y no debería escribir logs: el padre recibe cada 'resumen' y lo registra desde
+    un solo lugar, así las escrituras a logs.csv no se intercalan.
+
+    Parámetros:
+        funcion (callable): funcion(tarea) -> resultado.
+        tareas (iterable): Argumento de cada llamada.
+        workers (int): Procesos del pool (default: os.cpu_count()). Con 1 se
+            ejecuta en el mismo proceso, sin pool.
+
+    Retorna:
+        generator de (tarea, resultado, error): 'error' es la excepción del worker
+        (y 'resultado' None) si la tarea falló.
+    """
+    tareas = list(tareas)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(tareas) <= 1:
+        for tarea in tareas:
+            try:
+                yield tarea, funcion(tarea), None
+            except Exception as e:
+                yield tarea, None, e
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tareas))) as pool:
+        futuros = {pool.submit(funcion, tarea): tarea for tarea in tareas}
+        for futuro in as_completed(futuros):
+            error = futuro.exception()
+            yield futuros[futuro], (None if error else futuro.result()), error
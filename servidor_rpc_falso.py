@@ -0,0 +1,137 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def tx_sintetica(tx_hash):
+    """
+    Transacción determinística (formato JSON-RPC, cantidades en hex) para un hash,
+    así distintos servidores falsos responden lo mismo sin compartir estado.
+    """
+    semilla = int(hashlib.sha256(tx_hash.encode()).hexdigest()[:16], 16)
+    rng = random.Random(semilla)
+    gas = rng.choice([21_000, 50_000, 120_000, 250_000])
+    tip = rng.randint(1, 3) * 10**9
+    return {
+        "hash": tx_hash,
+        "chainId": "0x1",
+        "from": "0x" + hashlib.sha1(f"from{rng.randint(0, 5000)}".encode()).hexdigest(),
+        "to": "0x" + hashlib.sha1(f"to{rng.randint(0, 500)}".encode()).hexdigest(),
+        "value": hex(rng.randint(0, 10**18)),
+        "nonce": hex(rng.randint(0, 50)),
+        "gas": hex(gas),
+        "gasPrice": hex(tip + 10**9),
+        "maxPriorityFeePerGas": hex(tip),
+        "maxFeePerGas": hex(tip + rng.randint(1, 30) * 10**9),
+        "input": "0x" + "".join(rng.choice("0123456789abcdef") for _ in range(rng.choice([0, 8, 136, 264]))),
+        "type": "0x2",
+    }
+
+
+class _Servidor(ThreadingHTTPServer):
+    # La cola por defecto (5) resetea conexiones cuando un pool de hilos abre varias a la vez
+    request_queue_size = 128
+
+
+class ServidorRPCFalso:
+    """
+    Servidor JSON-RPC local (http.server en un hilo) para probar y medir los
+    preparadores de datos sin pegarle a un proveedor real.
+
+    Responde eth_getTransactionByHash, tanto en llamadas sueltas como en batch
+    (lista de requests en un solo POST). Se puede simular latencia por POST,
+    respuestas 429 y hashes que el proveedor no conoce (result null).
+
+    Uso:
+        with ServidorRPCFalso(latencia_s=0.05) as servidor:
+            url = servidor.url
+
+    Parámetros:
+        txs (dict): hash -> tx JSON-RPC. Si es None se genera con tx_sintetica.
+        latencia_s (float): Demora por POST.
+        tasa_429 (float): Probabilidad de responder 429 Too Many Requests.
+        cobertura (float): Probabilidad de conocer un hash (si no, result null).
+        semilla (int): Semilla de los eventos aleatorios.
+    """
+
+    def __init__(self, txs=None, latencia_s=0.0, tasa_429=0.0, cobertura=1.0, semilla=0):
+        self.txs = txs
+        self.latencia_s = latencia_s
+        self.tasa_429 = tasa_429
+        self.cobertura = cobertura
+        self.rng = random.Random(semilla)
+        self.posts = 0
+        self.pedidos = 0
+        self._lock = threading.Lock()
+        self._servidor = None
+        self._hilo = None
+
+    def _tx(self, tx_hash):
+        # La cobertura depende solo del hash y la semilla: cada reintento ve lo mismo
+        conocida = random.Random(f"{tx_hash}{self.rng_semilla}").random() < self.cobertura
+        if not conocida:
+            return None
+        if self.txs is None:
+            return tx_sintetica(tx_hash)
+        return self.txs.get(tx_hash)
+
+    def _responder(self, pedido):
+        if pedido.get("method") != "eth_getTransactionByHash":
+            return {"jsonrpc": "2.0", "id": pedido.get("id"),
+                    "error": {"code": -32601, "message": "method not found"}}
+        return {"jsonrpc": "2.0", "id": pedido.get("id"), "result": self._tx(pedido["params"][0])}
+
+    def __enter__(self):
+        servidor_falso = self
+        self.rng_semilla = self.rng.random()
+
+        class Manejador(BaseHTTPRequestHandler):
+            # Keep-alive: los clientes con pool de conexiones reusan el socket
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                cuerpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                with servidor_falso._lock:
+                    servidor_falso.posts += 1
+                    servidor_falso.pedidos += len(cuerpo) if isinstance(cuerpo, list) else 1
+                    limitar = servidor_falso.rng.random() < servidor_falso.tasa_429
+                if servidor_falso.latencia_s:
+                    time.sleep(servidor_falso.latencia_s)
+                if limitar:
+                    self.send_response(429)
+                    self.send_header("Retry-After", "0")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if isinstance(cuerpo, list):
+                    respuesta = [servidor_falso._responder(p) for p in cuerpo]
+                else:
+                    respuesta = servidor_falso._responder(cuerpo)
+                datos = json.dumps(respuesta).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def log_message(self, *args):
+                pass
+
+        self._servidor = _Servidor(("127.0.0.1", 0), Manejador)
+        self._servidor.daemon_threads = True
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    @property
+    def url(self):
+        host, puerto = self._servidor.server_address
+        return f"http://{host}:{puerto}"
+
+    def __exit__(self, exc_type, exc, tb):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+        return False
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import random
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(RAIZ / "release3"))
+from utils import cargar_dataset, COLUMNAS_DATASET
+from constructor_online import ConstructorOnline
+from registro_builders import construir
+from snapshot_mempool import cargar_snapshot
+
+DATASETS_DIR = RAIZ / "release3" / "datasets"
+GAS_LIMIT = 30_000_000
+FRACCION_DESALOJO = 0.05   # fracción de tx que se descartan de la mempool durante la captura
+SEMILLA = 42
+# El bloque online no puede quedar muy por debajo de greedy_clasico sobre las mismas tx vivas
+FRACCION_MINIMA_OFFLINE = 0.95
+
+HASH_EN_BLOQUE = re.compile(r"'hash': HexBytes\('(0x[0-9a-fA-F]{64})'\)")
+
+
+class FuenteFalsa:
+    """
+    Fuente local que imita los websockets de mempool_capture_multiapi.py: recorre
+    las listas de hashes del snapshot intercalando proveedores y entrega mensajes
+    JSON-RPC de suscripción, más eventos de desalojo.
+    """
+
+    def __init__(self, snapshot, desalojos=()):
+        self.snapshot = snapshot
+        self.desalojos = set(desalojos)
+
+    async def mensajes(self):
+        listas = list(self.snapshot["transactions"].values())
+        vistos = []
+        for i in range(max((len(l) for l in listas), default=0)):
+            for lista in listas:
+                if i < len(lista):
+                    vistos.append(lista[i])
+                    yield json.dumps({
+                        "jsonrpc": "2.0",
+                        "method": "eth_subscription",
+                        "params": {"subscription": "0x1", "result": lista[i]},
+                    })
+                    await asyncio.sleep(0)
+            # Los desalojos llegan mezclados con las altas, poco después de verse la tx
+            for h in [v for v in vistos if v in self.desalojos]:
+                self.desalojos.discard(h)
+                yield json.dumps({"evento": "desalojo", "hash": h})
+
+
+def _sin_prefijo(h):
+    return h[2:].lower() if h.startswith("0x") else h.lower()
+
+
+def _snapshots():
+    """Bloques con snapshot de captura y CSV de mempool resuelto."""
+    return sorted(
+        int(p.stem.rsplit("_", 1)[1]) for p in DATASETS_DIR.glob("snapshot_mempool_bloque_*.*json")
+        if (DATASETS_DIR / f"mempool_datos_bloque_{p.stem.rsplit('_', 1)[1]}.csv").exists()
+    )
+
+
+def _hashes_bloque_siguiente(numero):
+    for n in range(numero + 1, numero + 4):
+        path = DATASETS_DIR / f"bloque_{n}.json"
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                blk = json.load(f)
+            return [m.group(1) for tx in blk["transactions"] for m in [HASH_EN_BLOQUE.search(str(tx))] if m]
+    return []
+
+
+def _validar(constructor):
+    bloque = constructor.bloque()
+    destinos = [t["to"] for t in bloque if t["to"]]
+    remitentes = [(t["from"], t["nonce"]) for t in bloque if t["from"] and t["nonce"] is not None]
+    assert len(destinos) == len(set(destinos)), "dos tx con el mismo 'to' en el bloque"
+    assert len(remitentes) == len(set(remitentes)), "dos tx con el mismo (from, nonce) en el bloque"
+    assert sum(t["gas"] for t in bloque) == constructor.gas_usado <= GAS_LIMIT
+    assert sum(t["fee"] for t in bloque) == constructor.fee_total
+    assert all(_sin_prefijo(t["hash"]) in constructor.txs for t in bloque), "tx desalojada en el bloque"
+
+
+async def _replay(constructor, fuente, por_hash):
+    """Alimenta al constructor con cada mensaje de la fuente, validando el bloque en cada paso."""
+    async for mensaje in fuente.mensajes():
+        data = json.loads(mensaje)
+        if data.get("evento") == "desalojo":
+            constructor.eliminar(_sin_prefijo(data["hash"]))
+        else:
+            # Stub de eth_getTransactionByHash: el CSV ya tiene las tx resueltas
+            tx = por_hash.get(_sin_prefijo(data["params"]["result"]))
+            if tx is not None:
+                constructor.agregar({**tx, "hash": _sin_prefijo(tx["hash"])})
+        _validar(constructor)
+
+
+@pytest.mark.parametrize("numero", _snapshots())
+def test_replay_snapshot_release3(numero):
+    ruta = DATASETS_DIR / f"snapshot_mempool_bloque_{numero}.ndjson"
+    if not ruta.exists():
+        ruta = ruta.with_suffix(".json")
+    snapshot = cargar_snapshot(ruta)
+    df = cargar_dataset(str(DATASETS_DIR / f"mempool_datos_bloque_{numero}.csv"), nrows=10**9,
+                        columnas=COLUMNAS_DATASET)
+    por_hash = {_sin_prefijo(tx["hash"]): tx for tx in df.to_dict("records")}
+
+    rng = random.Random(SEMILLA)
+    todos = [h for lista in snapshot["transactions"].values() for h in lista]
+    desalojos = {h for h in todos if rng.random() < FRACCION_DESALOJO}
+
+    constructor = ConstructorOnline(GAS_LIMIT)
+    asyncio.run(_replay(constructor, FuenteFalsa(snapshot, desalojos), por_hash))
+    assert constructor.bloque(), "el replay no dejó transacciones en el bloque"
+
+    # Offline sobre las mismas tx que siguen vivas
+    vivas = df[df["hash"].map(_sin_prefijo).isin(constructor.txs)]
+    resumen, _ = construir("greedy_clasico", vivas, int(df["timestamp_ms"].max()), gas_limit=GAS_LIMIT)
+    assert constructor.fee_total >= FRACCION_MINIMA_OFFLINE * resumen["utilidad_total"]
+
+    # Al minarse el bloque real siguiente se desalojan sus tx y el bloque se rellena sin romperse
+    for h in _hashes_bloque_siguiente(numero):
+        constructor.eliminar(_sin_prefijo(h))
+        _validar(constructor)
+
+
+def test_reemplazo_por_conflicto_y_relleno_al_eliminar():
+    constructor = ConstructorOnline(gas_limit=100_000)
+    constructor.agregar({"hash": "a", "from": "0x1", "to": "0xc", "gas": 50_000, "gas_fee_cap": 10, "nonce": 0})
+    constructor.agregar({"hash": "b", "from": "0x2", "to": "0xd", "gas": 50_000, "gas_fee_cap": 5, "nonce": 0})
+    # 'c' choca con 'a' por destino y vale más: la reemplaza
+    constructor.agregar({"hash": "c", "from": "0x3", "to": "0xc", "gas": 40_000, "gas_fee_cap": 30, "nonce": 0})
+    _validar(constructor)
+    assert set(constructor.en_bloque) == {"b", "c"}
+
+    # Al minarse 'c' el gas liberado se rellena con 'a', que ya no choca con nadie
+    constructor.eliminar("c")
+    _validar(constructor)
+    assert set(constructor.en_bloque) == {"a", "b"}
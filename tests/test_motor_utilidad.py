@@ -0,0 +1,65 @@
+import itertools
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from motor_utilidad import MotorUtilidad
+
+GAS_LIMIT = 30_000_000
+
+
+def _mempool(gas, gas_fee_cap, rng=None):
+    n = len(gas)
+    if rng is None:
+        remitentes, destinos, nonces = range(n), range(n), [0] * n
+    else:
+        remitentes, destinos, nonces = rng.integers(0, n, n), rng.integers(0, n, n), rng.integers(0, 3, n)
+    return pd.DataFrame({
+        "from": [f"0xf{x}" for x in remitentes],
+        "to": [f"0xd{x}" for x in destinos],
+        "gas": gas,
+        "gas_fee_cap": gas_fee_cap,
+        "nonce": nonces,
+    })
+
+
+def _top_fuerza_bruta(motor, gas, k):
+    """Sumas de los k mejores tríos factibles recorriendo C(n, 3)."""
+    factibles = [
+        (i, j, l) for i, j, l in itertools.combinations(range(len(gas)), 3)
+        if gas[i] + gas[j] + gas[l] <= GAS_LIMIT
+    ]
+    sumas = [int(motor.utilidad_trios([i], [j], [l])[0]) for i, j, l in factibles]
+    return sorted(sumas, reverse=True)[:k]
+
+
+def test_trios_top_con_lideres_pesados():
+    # Las 8 de mayor tarifa usan 16M de gas: ningún trío con dos de ellas es factible
+    n = 20
+    gas = [16_000_000 if t < 8 else 21_000 + 1_000 * t for t in range(n)]
+    motor = MotorUtilidad(_mempool(gas, [1000 - t for t in range(n)]), gas_limit=GAS_LIMIT)
+
+    trios = motor.trios_top(5)
+
+    assert [suma for _, _, _, suma in trios] == _top_fuerza_bruta(motor, gas, 5)
+    assert all(gas[i] + gas[j] + gas[l] <= GAS_LIMIT for i, j, l, _ in trios)
+
+
+def test_trios_top_igual_a_fuerza_bruta_con_gas_pesado():
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        n = int(rng.integers(3, 25))
+        pesadas = int(rng.integers(0, n + 1))
+        gas = np.where(
+            np.arange(n) < pesadas,
+            rng.integers(9_000_000, 20_000_000, n),
+            rng.integers(21_000, 2_000_000, n),
+        ).tolist()
+        gas_fee_cap = np.sort(rng.integers(1, 5_000, n))[::-1]
+        motor = MotorUtilidad(_mempool(gas, gas_fee_cap, rng), gas_limit=GAS_LIMIT)
+        k = int(rng.integers(1, 20))
+
+        assert [suma for _, _, _, suma in motor.trios_top(k)] == _top_fuerza_bruta(motor, gas, k)
@@ -0,0 +1,126 @@
+import asyncio
+import csv
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(RAIZ / "release3"))
+pytest.importorskip("aiohttp")
+import prepare_data_r3
+from cache_tx import CacheTx
+from servidor_rpc_falso import ServidorRPCFalso, tx_sintetica
+
+
+def _hashes(n):
+    return [f"0x{i:064x}" for i in range(n)]
+
+
+def _resolver(hashes, proveedores, **kwargs):
+    """Corre iterar_resueltas y devuelve (lotes entregados, resueltas, estadísticas)."""
+    async def correr():
+        lotes, estadisticas = [], {}
+        async for lote in prepare_data_r3.iterar_resueltas(hashes, proveedores, estadisticas=estadisticas,
+                                                           progreso=False, **kwargs):
+            lotes.append(lote)
+        return lotes, estadisticas
+
+    lotes, estadisticas = asyncio.run(correr())
+    resueltas = {h: tx for lote in lotes for h, tx in lote.items()}
+    return lotes, resueltas, estadisticas
+
+
+def test_batches_de_batch_size_hashes_por_post():
+    hashes = _hashes(120)
+    with ServidorRPCFalso() as servidor:
+        lotes, resueltas, estadisticas = _resolver(hashes, {"Local": servidor.url}, batch_size=50)
+        posts, pedidos = servidor.posts, servidor.pedidos
+
+    assert posts == 3 and pedidos == 120
+    assert sorted(len(lote) for lote in lotes) == [20, 50, 50]
+    assert resueltas == {h: tx_sintetica(h) for h in hashes}
+    assert estadisticas["Local"] == {"batches": 3, "resueltas": 120, "errores": 0}
+
+
+def test_failover_si_un_proveedor_responde_429():
+    hashes = _hashes(80)
+    with ServidorRPCFalso(tasa_429=1.0) as limitado, ServidorRPCFalso() as sano:
+        _, resueltas, estadisticas = _resolver(hashes, {"Limitado": limitado.url, "Sano": sano.url},
+                                               batch_size=10)
+
+    assert set(resueltas) == set(hashes)
+    # Los lotes rotan de proveedor inicial: la mitad empieza en el limitado y pasa al sano
+    assert estadisticas["Limitado"] == {"batches": 0, "resueltas": 0, "errores": 4}
+    assert estadisticas["Sano"]["resueltas"] == 80
+
+
+def test_hashes_en_null_se_piden_al_siguiente_proveedor():
+    hashes = _hashes(60)
+    with ServidorRPCFalso(cobertura=0.5, semilla=1) as parcial, ServidorRPCFalso() as completo:
+        _, resueltas, estadisticas = _resolver(hashes, {"Parcial": parcial.url, "Completo": completo.url},
+                                               batch_size=20)
+
+    assert set(resueltas) == set(hashes)
+    assert 0 < estadisticas["Parcial"]["resueltas"] < 60
+    assert estadisticas["Parcial"]["resueltas"] + estadisticas["Completo"]["resueltas"] == 60
+
+
+def test_sin_proveedores_disponibles_termina_sin_resolver():
+    hashes = _hashes(30)
+    with ServidorRPCFalso(tasa_429=1.0) as a, ServidorRPCFalso(cobertura=0.0) as b:
+        lotes, resueltas, estadisticas = _resolver(hashes, {"A": a.url, "B": b.url}, batch_size=10)
+
+    assert len(lotes) == 3 and resueltas == {}
+    assert estadisticas["A"]["errores"] == 3
+
+
+def test_timeout_pasa_al_siguiente_proveedor():
+    hashes = _hashes(20)
+    with ServidorRPCFalso(latencia_s=1.0) as lento, ServidorRPCFalso() as rapido:
+        inicio = time.perf_counter()
+        _, resueltas, estadisticas = _resolver(hashes, {"Lento": lento.url, "Rapido": rapido.url},
+                                               batch_size=20, timeout_s=0.2, espera_cobertura_s=5.0)
+        duracion = time.perf_counter() - inicio
+
+    assert set(resueltas) == set(hashes)
+    assert estadisticas["Lento"]["errores"] == 1
+    assert duracion < 1.0
+
+
+def test_proveedor_lento_se_cubre_con_el_siguiente():
+    hashes = _hashes(20)
+    with ServidorRPCFalso(latencia_s=1.0) as lento, ServidorRPCFalso() as rapido:
+        inicio = time.perf_counter()
+        _, resueltas, estadisticas = _resolver(hashes, {"Lento": lento.url, "Rapido": rapido.url},
+                                               batch_size=20, espera_cobertura_s=0.1)
+        duracion = time.perf_counter() - inicio
+
+    assert set(resueltas) == set(hashes)
+    assert estadisticas["Rapido"]["resueltas"] == 20 and estadisticas["Lento"]["batches"] == 0
+    assert duracion < 1.0
+
+
+def test_enriquecer_a_csv_usa_la_cache_y_pide_el_resto(tmp_path):
+    hashes = _hashes(40)
+    tx_seen_by = {h: {"Local"} for h in hashes}
+    salida = tmp_path / "mempool_datos.csv"
+
+    with CacheTx(tmp_path / "cache.sqlite3") as cache, ServidorRPCFalso() as servidor:
+        cache.guardar([tx_sintetica(h) for h in hashes[:15]])
+        escritas, _ = asyncio.run(prepare_data_r3.enriquecer_a_csv(
+            tx_seen_by, 1_700_000_000_000, salida, cache, {"Local": servidor.url}))
+        assert servidor.pedidos == 25
+
+        # Segunda corrida: todo sale de la caché, sin RPC
+        asyncio.run(prepare_data_r3.enriquecer_a_csv(
+            tx_seen_by, 1_700_000_000_000, salida, cache, {"Local": servidor.url}))
+        assert servidor.pedidos == 25
+
+    with open(salida, newline="") as f:
+        filas = list(csv.DictReader(f))
+    assert escritas == 40
+    assert list(filas[0]) == prepare_data_r3.HEADER
+    assert sorted(fila["hash"] for fila in filas) == sorted(h[2:] for h in hashes)
@@ -0,0 +1,231 @@
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+import pandas as pd
+
+from perfilado import fase
+
+# Por debajo de este valor gas * gas_fee_cap (y la suma de dos tarifas) entra en int64
+_LIMITE_TARIFA_INT64 = 2**62
+
+
+def _columna_tarifa(gas, gas_fee_cap):
+    """
+    Calcula gas * gas_fee_cap por transacción sin perder precisión.
+
+    Usa int64 cuando los productos caben; si hay flotantes usa float64 y si los
+    enteros desbordan cae a enteros de Python (dtype object).
+    """
+    if gas.dtype.kind in "iu" and gas_fee_cap.dtype.kind in "iu":
+        maximo = int(gas.max(initial=0)) * int(gas_fee_cap.max(initial=0))
+        if maximo < _LIMITE_TARIFA_INT64:
+            return gas.astype(np.int64) * gas_fee_cap.astype(np.int64)
+        return np.array([int(g) * int(c) for g, c in zip(gas, gas_fee_cap)], dtype=object)
+    if gas.dtype == object or gas_fee_cap.dtype == object:
+        return np.array([g * c for g, c in zip(gas.tolist(), gas_fee_cap.tolist())], dtype=object)
+    return gas.astype(np.float64) * gas_fee_cap.astype(np.float64)
+
+
+def _parsear_entero(texto):
+    """
+    Entero exacto desde un texto decimal o hex ('0x...'); None si falta o es inválido.
+
+    Los decimales con parte fraccionaria nula o en notación científica ('1.0', '1e18')
+    se parsean con Decimal, nunca con float64; los no enteros cuentan como inválidos.
+    """
+    if texto is None or texto != texto or texto == "":
+        return None
+    try:
+        return int(texto, 16) if texto.startswith("0x") else int(texto)
+    except ValueError:
+        pass
+    try:
+        numero = Decimal(texto)
+    except InvalidOperation:
+        return None
+    if not numero.is_finite() or numero != numero.to_integral_value():
+        return None
+    return int(numero)
+
+
+def _a_entero(valor):
+    """Entero exacto desde int/float/str decimal o hex; faltantes o inválidos -> 0."""
+    if isinstance(valor, (int, np.integer)):
+        return int(valor)
+    if isinstance(valor, str):
+        entero = _parsear_entero(valor)
+        return 0 if entero is None else entero
+    try:
+        return 0 if pd.isna(valor) else int(valor)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _columna_entera(serie):
+    """
+    Convierte una columna a enteros no negativos (faltantes -> 0).
+
+    Queda en int64 si los valores caben; los enteros grandes (uint256) se
+    conservan exactos como enteros de Python en un array object.
+    """
+    if serie.dtype == object:
+        valores = [max(_a_entero(v), 0) for v in serie]
+        if max(valores, default=0) < _LIMITE_TARIFA_INT64:
+            return np.array(valores, dtype=np.int64)
+        return np.array(valores, dtype=object)
+    numerica = pd.to_numeric(serie, errors="coerce")
+    if numerica.dtype.kind == "u" and len(numerica) and numerica.max() > np.iinfo(np.int64).max:
+        # uint64 por encima de int64: pasarlo a int64 lo daría vuelta a negativo
+        return np.array([int(v) for v in numerica], dtype=object)
+    if numerica.dtype.kind in "iu":
+        return numerica.fillna(0).clip(lower=0).to_numpy(dtype=np.int64)
+    numerica = numerica.fillna(0).clip(lower=0)
+    if (numerica % 1 == 0).all() and numerica.max() < 2**53:
+        return numerica.to_numpy(dtype=np.int64)
+    return numerica.to_numpy(dtype=np.float64)
+
+
+class TxBatch:
+    """
+    Almacén columnar de transacciones para los constructores de bloques.
+
+    En lugar de listas de dicts ('to_dict("records")') guarda un array por campo:
+    gas, gas_fee_cap y fee en int64 (u object si no caben), 'from'/'to' como ids
+    enteros internados (misma tabla para ambos, -1 si falta) y nonce en int64
+    (-1 si falta; 0 para todas si el dataset no trae la columna, lo que reproduce
+    la comparación None == None de calcular_utilidad).
+
+    El DataFrame original se conserva solo para materializar las filas del bloque final.
+    """
+
+    __slots__ = (
+        "hash", "from_id", "to_id", "nonce", "tiene_nonce", "gas", "gas_fee_cap",
+        "fee", "timestamp_ms", "direcciones", "_df", "_pos",
+    )
+
+    def __init__(self, hash, from_id, to_id, nonce, tiene_nonce, gas, gas_fee_cap,
+                 fee, timestamp_ms, direcciones, df, pos):
+        self.hash = hash
+        self.from_id = from_id
+        self.to_id = to_id
+        self.nonce = nonce
+        self.tiene_nonce = tiene_nonce
+        self.gas = gas
+        self.gas_fee_cap = gas_fee_cap
+        self.fee = fee
+        self.timestamp_ms = timestamp_ms
+        self.direcciones = direcciones
+        self._df = df
+        self._pos = pos
+
+    @classmethod
+    def desde_df(cls, df):
+        """
+        Construye el batch desde un DataFrame de mempool (formato Flashbots).
+
+        Parámetros:
+            df (pd.DataFrame): Con columnas 'from', 'to', 'gas', 'gas_fee_cap' y
+                opcionalmente 'hash', 'nonce', 'timestamp_ms'.
+
+        Retorna:
+            TxBatch
+        """
+        n = len(df)
+
+        def columna(nombre):
+            # Columnas faltantes se tratan como vacías en lugar de romper la construcción
+            return df[nombre] if nombre in df.columns else pd.Series([np.nan] * n, index=df.index, dtype=object)
+
+        gas = _columna_entera(columna("gas"))
+        gas_fee_cap = _columna_entera(columna("gas_fee_cap"))
+
+        # Una sola tabla de direcciones para 'from' y 'to'
+        codigos, direcciones = pd.factorize(
+            pd.concat([columna("from"), columna("to")], ignore_index=True).astype(object),
+            use_na_sentinel=True,
+        )
+        codigos = codigos.astype(np.int32)
+
+        tiene_nonce = "nonce" in df.columns
+        if tiene_nonce:
+            nonce = pd.to_numeric(df["nonce"], errors="coerce").fillna(-1).to_numpy(dtype=np.int64)
+        else:
+            nonce = np.zeros(n, dtype=np.int64)
+
+        if "timestamp_ms" in df.columns:
+            ts = pd.to_numeric(df["timestamp_ms"], errors="coerce")
+            timestamp_ms = ts.to_numpy(dtype=np.int64) if ts.notna().all() else ts.to_numpy(dtype=np.float64)
+        else:
+            timestamp_ms = np.full(n, np.nan)
+
+        hashes = df["hash"].to_numpy(dtype=object) if "hash" in df.columns else np.arange(n).astype(object)
+
+        return cls(
+            hash=hashes,
+            from_id=codigos[:n],
+            to_id=codigos[n:],
+            nonce=nonce,
+            tiene_nonce=tiene_nonce,
+            gas=gas,
+            gas_fee_cap=gas_fee_cap,
+            fee=_columna_tarifa(gas, gas_fee_cap),
+            timestamp_ms=timestamp_ms,
+            direcciones=list(direcciones),
+            df=df,
+            pos=np.arange(n),
+        )
+
+    def __len__(self):
+        return len(self.gas)
+
+    def subconjunto(self, idx):
+        """Nuevo TxBatch con las posiciones 'idx' (comparte la tabla de direcciones)."""
+        idx = np.asarray(idx, dtype=np.int64)
+        return TxBatch(
+            hash=self.hash[idx],
+            from_id=self.from_id[idx],
+            to_id=self.to_id[idx],
+            nonce=self.nonce[idx],
+            tiene_nonce=self.tiene_nonce,
+            gas=self.gas[idx],
+            gas_fee_cap=self.gas_fee_cap[idx],
+            fee=self.fee[idx],
+            timestamp_ms=self.timestamp_ms[idx],
+            direcciones=self.direcciones,
+            df=self._df,
+            pos=self._pos[idx],
+        )
+
+    def ampliado(self, top_n, limite=1000):
+        """
+        Top-N por fee más las transacciones relacionadas (mismo 'from' o 'to' que
+        alguna del top), sin hashes repetidos y recortado a 'limite' filas.
+        Es la selección de candidatas de los algoritmos extendidos.
+        """
+        with fase("top_n"):
+            top = np.argsort(-self.fee, kind="stable")[:top_n]
+        with fase("relacionadas"):
+            hashes = pd.Series(self.hash)
+            relacionadas = np.flatnonzero(
+                ~hashes.isin(set(self.hash[top])).to_numpy()
+                & (np.isin(self.from_id, self.from_id[top]) | np.isin(self.to_id, self.to_id[top]))
+            )
+            pos = np.concatenate([top, relacionadas])
+            pos = pos[~hashes.iloc[pos].duplicated().to_numpy()][:limite]
+            return self.subconjunto(pos)
+
+    def a_dataframe(self, idx=None):
+        """
+        Filas originales de las posiciones 'idx' (todas si es None) con la columna 'fee'.
+        """
+        idx = np.arange(len(self)) if idx is None else np.asarray(list(idx), dtype=np.int64)
+        filas = self._df.iloc[self._pos[idx]].copy()
+        filas["fee"] = self.fee[idx]
+        return filas
+
+    def suma(self, campo, idx):
+        """Suma exacta (entero de Python) de un campo en las posiciones 'idx'."""
+        valores = getattr(self, campo)[np.asarray(list(idx), dtype=np.int64)]
+        if valores.dtype.kind == "f":
+            return int(np.nansum(valores))
+        return int(sum(valores.tolist()))
@@ -1,29 +1,131 @@
+import numpy as np
 import pandas as pd
-import os 
 
-def cargar_dataset(path, nrows=1000):
+from tx_batch import TxBatch, _parsear_entero
+from registro_resultados import RegistroResultados
+
+PENALIZACIONES_DEFAULT = {
+    "conflicto": 999,
+    "dependencia_mal_ordenada": 100,
+    "gas_alto": 10
+}
+BONIFICACIONES_DEFAULT = {
+    "contrato_comun": 50,
+    "orden_correcto": 30,
+    "mev_detectado": 100
+}
+
+COLUMNAS_DATASET = ["hash", "from", "to", "gas", "gas_fee_cap", "timestamp_ms", "nonce"]
+# Columnas que se cargan si están en el CSV pero cuya falta no es un error
+_COLUMNAS_OPCIONALES = ["nonce"]
+
+# Todo se lee como texto: los enteros se parsean después sin pasar por float64
+_COLUMNAS_TEXTO = ["hash", "from", "to"]
+_COLUMNAS_ENTERAS = ["gas", "gas_fee_cap", "timestamp_ms", "nonce", "value", "gas_price", "gas_tip_cap"]
+_MAXIMO_INT64 = 2**63 - 1
+
+def _columna_entera(serie):
+    """
+    Convierte una columna de texto a enteros exactos.
+
+    Usa int64 si todos los valores están y caben, Int64 (nullable) si faltan valores,
+    y enteros de Python (dtype object) si alguno excede int64 (p.ej. 'value' en wei).
+    Las celdas inválidas quedan como faltantes, igual que en TxBatch (que las toma como 0).
+    """
+    try:
+        # Camino rápido (vectorizado) para decimales que caben en int64
+        enteros = serie.astype("Int64")
+        return enteros.astype("int64") if not enteros.isna().any() else enteros
+    except (ValueError, TypeError, OverflowError):
+        pass
+    valores = [_parsear_entero(v) for v in serie]
+    presentes = [v for v in valores if v is not None]
+    if any(v > _MAXIMO_INT64 or v < -_MAXIMO_INT64 for v in presentes):
+        return pd.Series(valores, index=serie.index, dtype=object)
+    if len(presentes) == len(valores):
+        return pd.Series(valores, index=serie.index, dtype="int64")
+    return pd.Series(valores, index=serie.index, dtype="Int64")
+
+def _tipar(df, columnas):
+    for c in columnas:
+        if c in _COLUMNAS_ENTERAS and c in df.columns:
+            df[c] = _columna_entera(df[c])
+    faltantes = [c for c in columnas if c not in df.columns and c not in _COLUMNAS_OPCIONALES]
+    if faltantes:
+        raise KeyError(f"Faltan columnas en el dataset: {faltantes}")
+    return df[[c for c in columnas if c in df.columns]]
+
+def _opciones_lectura(columnas):
+    return dict(
+        usecols=lambda c: c in columnas,
+        dtype={c: str for c in columnas},
+        keep_default_na=False,
+        na_values=[""],
+    )
+
+def cargar_dataset(path, nrows=1000, columnas=None):
     """
     Carga un subconjunto del dataset de mempool y selecciona únicamente
     las columnas necesarias para la simulación de construcción de bloques.
 
+    Lee solo esas columnas (usecols) como texto y parsea los enteros de forma
+    exacta: gas_fee_cap, value, etc. nunca pasan por float64.
+
     Parámetros:
         path (str): Ruta al archivo .csv de mempool (formato Flashbots).
         nrows (int): Número de filas a cargar (default: 1000).
+        columnas (list[str]): Columnas a cargar (default: COLUMNAS_DATASET).
 
     Retorna:
-        pd.DataFrame: Con columnas ['hash', 'from', 'to', 'gas', 'gas_fee_cap', 'timestamp_ms']
+        pd.DataFrame: Con columnas ['hash', 'from', 'to', 'gas', 'gas_fee_cap', 'timestamp_ms', 'nonce']
+            ('nonce' solo si el CSV la trae).
     """
-    df = pd.read_csv(path, nrows=nrows)
-    columnas_necesarias = ["hash", "from", "to", "gas", "gas_fee_cap", "timestamp_ms"]
-    return df[columnas_necesarias].copy()
+    columnas = columnas or COLUMNAS_DATASET
+    df = pd.read_csv(path, nrows=nrows, **_opciones_lectura(columnas))
+    return _tipar(df, columnas)
 
-def guardar_log_csv(resumen, path="logs/logs.csv"):
-    df_log = pd.DataFrame([resumen])
+def cargar_dataset_por_chunks(path, chunksize=100_000, columnas=None, filtro=None):
+    """
+    Igual que cargar_dataset pero como generador de bloques de 'chunksize' filas,
+    para recorrer dumps de varios GB con memoria acotada.
+
+    Parámetros:
+        filtro (callable): Opcional, recibe cada chunk tipado y devuelve el chunk filtrado.
+
+    Retorna:
+        Iterator[pd.DataFrame]
+    """
+    columnas = columnas or COLUMNAS_DATASET
+    with pd.read_csv(path, chunksize=chunksize, **_opciones_lectura(columnas)) as lector:
+        for chunk in lector:
+            chunk = _tipar(chunk, columnas)
+            yield filtro(chunk) if filtro is not None else chunk
+
+def cargar_top_n(path, top_n=1000, chunksize=100_000, columnas=None, filtro=None):
+    """
+    Recorre el dataset por chunks y conserva solo las top_n transacciones por
+    fee = gas * gas_fee_cap (calculado en enteros exactos). La memoria queda
+    acotada a top_n + chunksize filas sin importar el tamaño del archivo.
+
+    Retorna:
+        pd.DataFrame: Las top_n filas ordenadas por fee descendente.
+    """
+    mejores = None
+    for chunk in cargar_dataset_por_chunks(path, chunksize, columnas, filtro):
+        candidatos = chunk if mejores is None else pd.concat([mejores, chunk])
+        fee = TxBatch.desde_df(candidatos).fee
+        mejores = candidatos.iloc[np.argsort(-fee, kind="stable")[:top_n]]
+    if mejores is None:
+        return _tipar(pd.DataFrame(columns=columnas or COLUMNAS_DATASET), columnas or COLUMNAS_DATASET)
+    return mejores.reset_index(drop=True)
 
-    if os.path.exists(path):
-        df_log.to_csv(path, mode='a', header=False, index=False)
-    else:
-        df_log.to_csv(path, mode='w', header=True, index=False)
+def guardar_log_csv(resumen, path="logs/logs.csv"):
+    """
+    Agrega un resumen suelto al CSV de logs. Para varios resultados conviene usar
+    registro_resultados.RegistroResultados, que los escribe en bloque.
+    """
+    with RegistroResultados(path) as registro:
+        registro.registrar(resumen)
 
 def calcular_T_simulado(df, delay_ms=6000):
     """
@@ -39,16 +141,8 @@ def calcular_T_simulado(df, delay_ms=6000):
     return int(df["timestamp_ms"].mean()) + delay_ms
 
 def calcular_utilidad(ti, tj, gas_limit=30_000_000, penalties=None, bonuses=None):
-    penalties = penalties or {
-        "conflicto": 999,
-        "dependencia_mal_ordenada": 100,
-        "gas_alto": 10
-    }
-    bonuses = bonuses or {
-        "contrato_comun": 50,
-        "orden_correcto": 30,
-        "mev_detectado": 100
-    }
+    penalties = penalties or PENALIZACIONES_DEFAULT
+    bonuses = bonuses or BONIFICACIONES_DEFAULT
 
     tarifa_ti = ti["gas"] * ti["gas_fee_cap"]
     tarifa_tj = tj["gas"] * tj["gas_fee_cap"]